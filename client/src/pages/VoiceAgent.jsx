@@ -71,6 +71,19 @@ const VoiceAgent = () => {
     confirmation: `Based on your availability, we've scheduled your interview on [DATE_PLACEHOLDER]. Is that correct?`
   };
 
+  // questionContext sent with each step's answer. Only the full-conversation
+  // profile extracts interest, so that step uses it; the targeted answers
+  // outrank it when the server merges the candidate's session
+  const questionContextByStep = {
+    interest: 'full conversation',
+    noticePeriod: 'notice period',
+    compensation: 'compensation',
+    availability: 'availability'
+  };
+
+  // Attempts for an upload the server turned away as busy (429/503)
+  const MAX_UPLOAD_ATTEMPTS = 3;
+
   // Fetch jobs from the API
   const fetchJobs = async () => {
     setLoadingJobs(true);
@@ -145,9 +158,11 @@ const VoiceAgent = () => {
         audioChunksRef.current.push(event.data);
       };
 
+      // The step being answered when recording started
+      const step = conversationSteps[activeStep];
       mediaRecorder.onstop = async () => {
         const audioBlob = new Blob(audioChunksRef.current, { type: 'audio/webm;codecs=opus' });
-        await processAudio(audioBlob);
+        await processAudio(audioBlob, step);
       };
 
       mediaRecorder.start();
@@ -167,7 +182,7 @@ const VoiceAgent = () => {
     }
   };
 
-  const processAudio = async (audioBlob) => {
+  const processAudio = async (audioBlob, step) => {
     if (!currentUser) {
       setError('You must be logged in to use the voice agent');
       return;
@@ -179,24 +194,34 @@ const VoiceAgent = () => {
       const formData = new FormData();
       formData.append('audio', audioBlob);
       formData.append('candidateId', currentUser.id.toString());
-
-      // Process the entire conversation in one go
-      // We'll extract all entities from a single response
-      formData.append('questionContext', 'full conversation');
-
-      // Call Flask server through proxy
-      const response = await fetch('http://localhost:3000/api/flaskserver/process-speech', {
-        method: 'POST',
-        body: formData
-      });
+      formData.append('questionContext', questionContextByStep[step] || 'full conversation');
+      // Identifies this answer, so a retried upload is merged into the session once
+      formData.append('turnId', `${currentUser.id}-${step}-${Date.now()}`);
+
+      // Call Flask server through proxy, retrying while it is busy
+      let response;
+      for (let attempt = 1; attempt <= MAX_UPLOAD_ATTEMPTS; attempt++) {
+        response = await fetch('http://localhost:3000/api/flaskserver/process-speech', {
+          method: 'POST',
+          body: formData
+        });
+        if (![429, 503].includes(response.status) || attempt === MAX_UPLOAD_ATTEMPTS) {
+          break;
+        }
+        const retryAfter = Number(response.headers.get('Retry-After')) || 1;
+        await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+      }
 
       if (!response.ok) {
         throw new Error('Speech processing failed');
       }
 
       const data = await response.json();
+      // The server merges each answer into the candidate's session; fall back
+      // to this answer's entities when sessions are disabled
+      const mergedEntities = data.session ? data.session.entities : data.entities;
       setTranscript(data.text);
-      setEntities(data.entities);
+      setEntities(mergedEntities);
 
       // Record candidate's response in conversation history
       await conversationService.createConversation({
@@ -210,8 +235,8 @@ const VoiceAgent = () => {
       const text = data.text.toLowerCase();
 
       // Extract interest
-      if (data.entities && data.entities.interested) {
-        updatedResponses.interested = data.entities.interested;
+      if (mergedEntities && mergedEntities.interested) {
+        updatedResponses.interested = mergedEntities.interested;
       } else if (text.includes('yes') || text.includes('interested') || text.includes('sure') || text.includes('definitely')) {
         updatedResponses.interested = 'Yes';
       } else if (text.includes('no') || text.includes('not interested') || text.includes('don\'t think')) {
@@ -219,8 +244,8 @@ const VoiceAgent = () => {
       }
 
       // Extract notice period
-      if (data.entities && data.entities.notice_period) {
-        updatedResponses.noticePeriod = data.entities.notice_period;
+      if (mergedEntities && mergedEntities.notice_period) {
+        updatedResponses.noticePeriod = mergedEntities.notice_period;
       } else {
         const noticePeriodRegex = /\b(\d+)\s*(day|days|week|weeks|month|months)\b/i;
         const match = text.match(noticePeriodRegex);
@@ -231,11 +256,11 @@ const VoiceAgent = () => {
       }
 
       // Extract CTC
-      if (data.entities && data.entities.current_ctc) {
-        updatedResponses.currentCtc = data.entities.current_ctc;
+      if (mergedEntities && mergedEntities.current_ctc) {
+        updatedResponses.currentCtc = mergedEntities.current_ctc;
       }
-      if (data.entities && data.entities.expected_ctc) {
-        updatedResponses.expectedCtc = data.entities.expected_ctc;
+      if (mergedEntities && mergedEntities.expected_ctc) {
+        updatedResponses.expectedCtc = mergedEntities.expected_ctc;
       } else {
         const ctcRegex = /\b(\d+(\.\d+)?)\s*(lakh|lakhs|lpa|k|L)\b/gi;
         const matches = [...text.matchAll(ctcRegex)];
@@ -248,8 +273,8 @@ const VoiceAgent = () => {
       }
 
       // Extract availability
-      if (data.entities && data.entities.availability) {
-        updatedResponses.availability = data.entities.availability;
+      if (mergedEntities && mergedEntities.availability) {
+        updatedResponses.availability = mergedEntities.availability;
       } else {
         const dateRegex = /\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday|tomorrow|next week)\b/i;
         const timeRegex = /\b(\d{1,2})(:\d{2})?(\s*[ap]m)?\b/i;
@@ -266,7 +291,22 @@ const VoiceAgent = () => {
         }
       }
 
-      // Set confirmation to true since we're processing everything at once
+      // Ask the next question until every step has been answered
+      const nextIndex = conversationSteps.indexOf(step) + 1;
+      const nextStep = conversationSteps[nextIndex];
+      if (nextStep && nextStep !== 'confirmation') {
+        setCandidateResponses(updatedResponses);
+        setAgentResponse(questionsByStep[nextStep]);
+        setActiveStep(nextIndex);
+        await conversationService.createConversation({
+          candidateId: currentUser.id,
+          message: questionsByStep[nextStep],
+          sender: 'agent'
+        });
+        return;
+      }
+
+      // Every question has been answered
       updatedResponses.confirmed = true;
 
       // Update candidate responses
@@ -276,7 +316,7 @@ const VoiceAgent = () => {
       await processingService.processCandidateData({
         candidateId: currentUser.id,
         text: data.text,
-        entities: data.entities || {}
+        entities: mergedEntities || {}
       });
 
       // Find recommended jobs based on candidate profile
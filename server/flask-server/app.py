@@ -1,564 +1,770 @@
 import os
+import io
+import hashlib
 import json
+import logging
+import time
+import wave
 import tempfile
-import subprocess
-import traceback
-import re
-import requests
-from flask import Flask, request, jsonify
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from flask import Flask, Response, g, request, jsonify, send_file
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
+from flask_sock import Sock, ConnectionClosed
 import speech_recognition as sr
 from dotenv import load_dotenv
 from datetime import datetime
+from entity_engine import ENTITY_ENGINE
+from entity_engine import get_engine as get_entity_engine
+from asr import ASR_ENGINE, engine_identity, get_engine, load_engine, transcribe_audio, transcribe_pcm
+from audio_decode import (SAMPLE_RATE, SAMPLE_WIDTH, CHANNELS, EXTENSIONS, FFMPEG_MISSING, UNDECODABLE_AUDIO,
+                          FFmpegMissing, UndecodableAudio, get_decoder, iter_bytes_chunks, sniff_file, sniff_format)
+from vad import trim_silence
+import metrics
+import structured_log
+from streaming import SpeechStream
+from jobs import JobQueue, QueueFull
+from process_pool import WorkerPool, PoolOverloaded, PoolTimeout
+from node_forwarder import NodeForwarder
+from speech_cache import TranscriptCache, EntityMemo
+from batch_upload import BatchError, BatchRun, items_from_archive, items_from_form
+from tts import TTS_CACHE_DIR, AudioCache, SpeechSynthesizer, load_prompts
+from sessions import SessionStore
 
 # Initialize Flask app
 load_dotenv()
+structured_log.configure()
+log = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
+sock = Sock(app)
 
 # FFmpeg configuration
 def configure_ffmpeg():
-    """Configure FFmpeg path and verify it works"""
-    try:
-        # Check if FFmpeg is in PATH
-        subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=True)
-        print("FFmpeg found in PATH")
+    """Locate FFmpeg on the PATH or in FFMPEG_PATH (without spawning it)"""
+    if shutil.which('ffmpeg'):
+        log.info("FFmpeg found in PATH")
         return True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        # Add your custom FFmpeg path here
-        ffmpeg_path = r"C:\Users\91878\Desktop\ffmpeg\bin"  # Modify this path as needed
-        if os.path.exists(os.path.join(ffmpeg_path, 'ffmpeg.exe')):
-            os.environ["PATH"] = os.pathsep.join([os.environ["PATH"], ffmpeg_path])
-            try:
-                subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=True)
-                print(f"FFmpeg configured at: {ffmpeg_path}")
-                return True
-            except (subprocess.SubprocessError, FileNotFoundError):
-                print(f"FFmpeg found at {ffmpeg_path} but failed to execute")
-                return False
-        print("WARNING: FFmpeg not found. Audio processing will fail.")
-        return False
+    # Add your custom FFmpeg path here (or set FFMPEG_PATH)
+    ffmpeg_path = os.getenv('FFMPEG_PATH', r"C:\Users\91878\Desktop\ffmpeg\bin")
+    if shutil.which('ffmpeg', path=ffmpeg_path):
+        os.environ["PATH"] = os.pathsep.join([os.environ["PATH"], ffmpeg_path])
+        log.info(f"FFmpeg configured at: {ffmpeg_path}")
+        return True
+    log.warning("FFmpeg not found. Compressed audio needs it unless PyAV is installed (AUDIO_DECODER).")
+    return False
 
 # Check FFmpeg availability at startup
 ffmpeg_available = configure_ffmpeg()
 
-def extract_text_from_audio(audio_path, output_wav_path):
-    """Convert audio to WAV and extract text using speech recognition"""
-    if not ffmpeg_available:
-        raise Exception("FFmpeg not configured properly - please install FFmpeg")
-
-    # Convert audio to WAV format
-    try:
-        subprocess.run([
-            'ffmpeg',
-            '-i', audio_path,
-            '-ar', '16000',  # 16kHz sample rate
-            '-ac', '1',      # Mono channel
-            '-y',            # Overwrite output
-            output_wav_path
-        ], capture_output=True, text=True, check=True)
-        print(f"Successfully converted audio to WAV: {output_wav_path}")
-    except subprocess.SubprocessError as e:
-        raise Exception(f"Audio conversion failed: {str(e.stderr) if hasattr(e, 'stderr') else str(e)}")
-
-    # Perform speech recognition
-    recognizer = sr.Recognizer()
+# Decoder for compressed uploads (AUDIO_DECODER): in-process PyAV or one FFmpeg process per upload
+audio_decoder = get_decoder()
+decoder_available = audio_decoder.name == 'pyav' or ffmpeg_available
+
+# Audio pipeline mode: 'tempfile' saves the upload and WAV to disk,
+# 'pipe' streams the upload through FFmpeg stdin/stdout entirely in memory
+AUDIO_PIPELINE = os.getenv('AUDIO_PIPELINE', 'tempfile').lower()
+
+# Load the speech recognition engine (and its model) once per process
+asr_available = load_engine(ASR_ENGINE)
+
+# Where decoding and recognition run: 'inline' in the request thread, or
+# 'process' in a pool of warm worker processes (default: one per core)
+ASR_EXECUTION = os.getenv('ASR_EXECUTION', 'inline').lower()
+asr_pool = None
+if ASR_EXECUTION == 'process':
+    asr_pool = WorkerPool(
+        workers=int(os.getenv('ASR_POOL_WORKERS', 0)) or None,
+        max_pending=int(os.getenv('ASR_POOL_MAX_PENDING', 0)) or None,
+        timeout=float(os.getenv('ASR_TIMEOUT', 60)),
+        initializer=load_engine,
+        initargs=(ASR_ENGINE,)
+    )
+
+# Background delivery to the Node.js server: pooled session, retries with
+# backoff, and a local spool file for payloads that could not be delivered
+node_forwarder = NodeForwarder(
+    os.getenv('NODE_URL', 'http://localhost:3001'),
+    os.getenv('NODE_SPOOL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spool', 'node_forward.jsonl')),
+    batch_size=int(os.getenv('NODE_FORWARD_BATCH_SIZE', 1)),
+    batch_wait=float(os.getenv('NODE_FORWARD_BATCH_WAIT', 0.2)),
+    max_retries=int(os.getenv('NODE_FORWARD_RETRIES', 4))
+)
+
+# Asynchronous /process-speech jobs: bounded FIFO queue and worker pool
+PROCESS_SPEECH_ASYNC = os.getenv('PROCESS_SPEECH_ASYNC', 'false').lower() in ('1', 'true', 'yes')
+speech_jobs = JobQueue(
+    workers=int(os.getenv('SPEECH_JOB_WORKERS', 2)),
+    max_queued=int(os.getenv('SPEECH_JOB_QUEUE_SIZE', 32)),
+    ttl=int(os.getenv('SPEECH_JOB_TTL', 3600))
+)
+
+# /process-speech/batch: shared executor for batch items (threads hand work to
+# the recognition pool when ASR_EXECUTION=process, so stay within its cap)
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+if asr_pool is not None:
+    BATCH_WORKERS = min(BATCH_WORKERS, asr_pool.max_pending)
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 500))
+BATCH_MAX_MB = float(os.getenv('BATCH_MAX_MB', 500))
+BATCH_MAX_FILE_MB = float(os.getenv('BATCH_MAX_FILE_MB', 50))
+# Request bodies beyond the batch budget are refused (413) before being read
+app.config['MAX_CONTENT_LENGTH'] = int(BATCH_MAX_MB * 1024 * 1024)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='speech-batch')
+
+# /extract-entities: records handled per chunk (one streamed write per chunk)
+EXTRACT_CHUNK_SIZE = int(os.getenv('EXTRACT_CHUNK_SIZE', 1000))
+
+# Transcripts of previously seen recordings, keyed on the audio hash and ASR
+# model (TRANSCRIPT_CACHE_MB=0 disables), with an optional on-disk tier
+TRANSCRIPT_CACHE_MB = float(os.getenv('TRANSCRIPT_CACHE_MB', 32))
+transcript_cache = None
+if TRANSCRIPT_CACHE_MB > 0:
+    transcript_cache = TranscriptCache(
+        max_bytes=int(TRANSCRIPT_CACHE_MB * 1024 * 1024),
+        disk_dir=os.getenv('TRANSCRIPT_CACHE_DIR') or None
+    )
+
+# Entity extraction engine (ENTITY_ENGINE: 'regex' or 'spacy'); the regex
+# rules are used if the selected engine cannot be loaded
+try:
+    entity_extractor = get_entity_engine(ENTITY_ENGINE)
+except Exception as e:
+    log.warning(f"Could not load entity engine '{ENTITY_ENGINE}', using regex: {str(e)}")
+    entity_extractor = get_entity_engine('regex')
+
+# Entity extraction results memoized on (transcript, question context)
+cached_extract_entities = EntityMemo(maxsize=int(os.getenv('ENTITY_CACHE_SIZE', 4096)),
+                                     extract=entity_extractor.extract)
+
+# Per-candidate conversation sessions: every upload is a turn whose entities
+# are merged into the candidate's running state (SESSIONS_ENABLED=false
+# disables), kept for SESSION_TTL seconds after the last turn and optionally
+# persisted to SESSION_DIR
+SESSIONS_ENABLED = os.getenv('SESSIONS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+conversation_sessions = None
+if SESSIONS_ENABLED:
+    conversation_sessions = SessionStore(
+        ttl=int(os.getenv('SESSION_TTL', 3600)),
+        max_sessions=int(os.getenv('SESSION_MAX_SESSIONS', 10000)),
+        max_turns=int(os.getenv('SESSION_MAX_TURNS', 50)),
+        disk_dir=os.getenv('SESSION_DIR') or None
+    )
+
+# /tts: rendered audio keyed on the text and voice, in a memory LRU (TTS_CACHE_MB)
+# and an on-disk tier (TTS_CACHE_DIR, by default in the user's cache directory,
+# empty disables); the standard prompts are rendered during warm-up unless
+# TTS_PRERENDER=false
+speech_synthesizer = SpeechSynthesizer(AudioCache(
+    max_bytes=int(float(os.getenv('TTS_CACHE_MB', 64)) * 1024 * 1024),
+    disk_dir=os.path.expanduser(os.getenv('TTS_CACHE_DIR', TTS_CACHE_DIR)) or None
+))
+TTS_PRERENDER = os.getenv('TTS_PRERENDER', 'true').lower() in ('1', 'true', 'yes')
+
+# Readiness: set by warm_up() once a silent clip went through the pipeline
+warmup_state = {'ready': False, 'seconds': None, 'error': None}
+
+def silent_clip(seconds=0.5):
+    """Return a short 16kHz mono WAV of silence"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(CHANNELS)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(b'\x00' * int(seconds * SAMPLE_RATE) * SAMPLE_WIDTH)
+    return buffer.getvalue()
+
+def warm_up():
+    """Push a silent clip through decoding, VAD, recognition and entity extraction,
+    then pre-render the standard TTS prompts
+
+    Runs in this process, never through the worker pool, so under gunicorn
+    with preload_app the master warms up once before forking. Remote
+    engines (Google) are skipped to avoid a network call on every start.
+    """
+    start = time.monotonic()
     try:
-        with sr.AudioFile(output_wav_path) as source:
-            audio_data = recognizer.record(source)
-            text = recognizer.recognize_google(audio_data)
-            print(f"Recognized text: {text}")
-            return text.strip()
-    except sr.UnknownValueError:
-        print("Could not understand audio")
-        return ""
-    except sr.RequestError as e:
-        raise Exception(f"Speech recognition API error: {str(e)}")
-
-def extract_entities(text, question_context):
-    """Extract entities from recognized text based on question context"""
-    entities = {}
-
-    text = text.lower()
-    question_context = question_context.lower()
-
-    # Process based on question context
-    # For full conversation mode, extract all entities at once
-    if "full conversation" in question_context:
-        # Extract all possible entities from the text
-
-        # 1. Extract interest level
-        positive_keywords = ["yes", "interested", "definitely", "absolutely", "sure", "of course", "certainly", "yeah", "yep", "positive"]
-        negative_keywords = ["no", "not interested", "don't think", "cannot", "nope", "negative", "pass", "decline"]
-
-        if any(word in text for word in positive_keywords):
-            entities["interested"] = "Yes"
-        elif any(word in text for word in negative_keywords):
-            entities["interested"] = "No"
+        if not decoder_available:
+            raise FFmpegMissing()
+        pcm = audio_decoder.decode(silent_clip())
+        trim_silence(pcm)
+        engine = get_engine()
+        if engine.local:
+            try:
+                engine.transcribe(iter_bytes_chunks(pcm))
+            except sr.UnknownValueError:
+                pass  # Expected for silence
+        for context in ('interest', 'compensation', 'available', 'full conversation'):
+            entity_extractor.extract('', context)
+        warmup_state.update(ready=True, error=None)
+    except Exception as e:
+        warmup_state.update(ready=False, error=str(e))
+        log.warning(f"Warm-up failed: {str(e)}")
+    if TTS_PRERENDER:
+        # Text-to-speech is optional: a missing engine leaves /tts unavailable, not the server unready
+        try:
+            warmup_state['ttsPrompts'] = speech_synthesizer.prerender(load_prompts())
+        except Exception as e:
+            warmup_state['ttsPrompts'] = 0
+            log.warning(f"Could not pre-render TTS prompts: {str(e)}")
+    warmup_state['seconds'] = round(time.monotonic() - start, 3)
+    log.info(f"Warm-up finished in {warmup_state['seconds']}s (pid {os.getpid()})")
+    return warmup_state['ready']
+
+def extract_text_from_audio(audio, output_wav_path=None, engine=None, with_stats=False, question_context=None):
+    """Convert audio to 16kHz mono and extract text using speech recognition
+
+    `audio` is a path to the uploaded file (converted via a WAV file at
+    `output_wav_path`) or the raw upload bytes (decoded in memory). WAV
+    uploads are decoded in-process either way, everything else with FFmpeg.
+    `engine` selects the ASR backend ('google' or 'vosk'), defaulting to ASR_ENGINE.
+    With ASR_EXECUTION=process the work runs in the recognition worker pool.
+    `with_stats=True` returns (text, speech stats) as in asr.transcribe_audio.
+    `question_context` selects the Vosk grammar (VOSK_GRAMMARS).
+    """
+    # WAV uploads are decoded without FFmpeg
+    audio_format = sniff_format(audio[:12]) if isinstance(audio, (bytes, bytearray)) else sniff_file(audio)
+    if audio_format != 'wav' and not decoder_available:
+        raise FFmpegMissing()
+
+    return run_recognition(transcribe_audio, audio, output_wav_path, engine, with_stats, question_context)
+
+def recognize_pcm(pcm, engine=None, with_stats=False, question_context=None):
+    """extract_text_from_audio for audio already decoded to 16kHz mono PCM"""
+    return run_recognition(transcribe_pcm, pcm, engine, with_stats, question_context)
+
+def run_recognition(func, *args):
+    """Call an asr.transcribe_* function inline or, with ASR_EXECUTION=process, in the worker pool"""
+    if asr_pool is not None:
+        # Stage timings recorded in the worker come back with the result
+        result, error, updates = asr_pool.run(structured_log.run_with_context, structured_log.current(),
+                                              metrics.run_captured, func, *args)
+        metrics.replay(updates)
+        if error is not None:
+            if error.startswith(UNDECODABLE_AUDIO):
+                raise UndecodableAudio(error[len(UNDECODABLE_AUDIO) + 2:] or None)
+            raise Exception(error)
+        return result
+    return func(*args)
+
+def node_payload(candidate_id, text, entities):
+    """Build the /process-candidate-data payload for a processed answer"""
+    return {
+        'candidateId': candidate_id,
+        'text': text,
+        'entities': entities,
+        'processedAt': datetime.now().isoformat()
+    }
+
+def forward_to_node(candidate_id, text, entities):
+    """Queue processed candidate data for background delivery to the Node.js server"""
+    node_forwarder.send(node_payload(candidate_id, text, entities))
+
+def turn_key(audio_bytes, turn_id=None):
+    """Session turn id of an upload: the client's turnId, else a hash of the audio (so retries dedupe)"""
+    return turn_id or hashlib.sha256(audio_bytes).hexdigest()
+
+def batch_turn_key(item):
+    """Session turn id of a batch item: its position, file name and audio
+
+    Identical recordings within one batch stay separate turns, while the
+    same batch sent again is merged once.
+    """
+    return f"{item['index']}:{item['file']}:{turn_key(item['audio'])}"
+
+def record_turn(candidate_id, question_context, text, entities, turn_id=None):
+    """Merge an answer into the candidate's conversation session; return its summary, or None"""
+    if conversation_sessions is None:
+        return None
+    with metrics.stage('session'):
+        return conversation_sessions.record(candidate_id, question_context, text, entities, turn_id)
+
+def merged_entities(result):
+    """Entities to send to Node for a result: the session's merged state when sessions are on"""
+    return result['session']['entities'] if 'session' in result else result['entities']
+
+def is_duplicate(result):
+    """Whether the session had already recorded this turn, so Node already has it"""
+    return result.get('session', {}).get('duplicate', False)
+
+def speech_result(text, entities, candidate_id, speech=None, session=None):
+    """Build the /process-speech response body"""
+    result = {
+        'text': text,
+        'entities': entities,
+        'candidateId': candidate_id,
+        'status': 'processed'
+    }
+    if speech:
+        # Voice activity stats (VAD_ENABLED, not on transcript cache hits)
+        result['speech'] = speech
+    if session is not None:
+        # Merged entities of all the candidate's turns and what this one changed
+        result['session'] = session
+    return result
+
+def process_audio(audio_bytes, candidate_id, question_context, request_tag=None, forward=True, turn_id=None):
+    """Run an upload through recognition, entity extraction and the Node forward
+
+    Returns the /process-speech response body. `request_tag` makes temporary
+    file names unique when several uploads from one candidate are in flight.
+    With `forward=False` the caller is responsible for sending the result to Node.
+    `turn_id` identifies the session turn (see turn_key).
+    """
+    # Sniffed from the header; WAV uploads are decoded in memory without FFmpeg
+    audio_format = sniff_format(audio_bytes[:12])
+    in_memory = AUDIO_PIPELINE == 'pipe' or audio_format == 'wav'
+
+    # Create temporary files (tempfile mode only)
+    temp_paths = []
+    if not in_memory:
+        temp_dir = tempfile.gettempdir()
+        file_tag = candidate_id if request_tag is None else f"{candidate_id}_{request_tag}"
+        input_path = os.path.join(temp_dir, f"input_{file_tag}{EXTENSIONS.get(audio_format, '')}")
+        wav_path = os.path.join(temp_dir, f"output_{file_tag}.wav")
+        temp_paths = [input_path, wav_path]
+
+    speech = {}
+
+    def recognize():
+        if in_memory:
+            # Decode the upload in memory
+            text, stats = extract_text_from_audio(audio_bytes, with_stats=True, question_context=question_context)
         else:
-            # Look for sentiment indicators
-            positive_phrases = ["sounds good", "like to", "would love", "great opportunity"]
-            negative_phrases = ["not for me", "looking elsewhere", "other opportunities", "not at this time"]
-
-            if any(phrase in text for phrase in positive_phrases):
-                entities["interested"] = "Yes"
-            elif any(phrase in text for phrase in negative_phrases):
-                entities["interested"] = "No"
-
-        # 2. Extract notice period
-        notice_patterns = [
-            r'(\d+)\s*(day|days|week|weeks|month|months)',  # e.g., "2 months", "30 days"
-            r'(one|two|three|four|five|six)\s*(day|days|week|weeks|month|months)',  # e.g., "two weeks"
-            r'(immediate|immediately)',  # Immediate joining
-            r'(\d+)\s*to\s*(\d+)\s*(day|days|week|weeks|month|months)'  # e.g., "2 to 3 months"
-        ]
-
-        for pattern in notice_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                if pattern == r'(immediate|immediately)':
-                    entities["notice_period"] = "Immediate"
-                    break
-                elif 'to' in pattern:
-                    # Range pattern (e.g., "2 to 3 months")
-                    start, end, unit = matches[0]
-                    entities["notice_period"] = f"{start}-{end} {unit}"
-                    break
-                else:
-                    # Standard pattern
-                    number, unit = matches[0]
+            # Save uploaded audio
+            with metrics.stage('upload_save'):
+                with open(input_path, 'wb') as f:
+                    f.write(audio_bytes)
+            log.debug(f"Saved audio to: {input_path}")
+
+            # Extract text
+            text, stats = extract_text_from_audio(input_path, wav_path, with_stats=True,
+                                                  question_context=question_context)
+        speech.update(stats or {})
+        return text
 
-                    # Convert text numbers to digits if needed
-                    number_map = {"one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6"}
-                    if number.lower() in number_map:
-                        number = number_map[number.lower()]
+    try:
+        with metrics.stage('total'):
+            if transcript_cache is not None:
+                # Re-sent recordings skip decoding and recognition entirely
+                text = transcript_cache.get_or_compute(audio_bytes, engine_identity(question_context=question_context),
+                                                       recognize)
+            else:
+                text = recognize()
 
-                    entities["notice_period"] = f"{number} {unit}"
-                    break
+            # Extract entities
+            with metrics.stage('entities'):
+                entities = cached_extract_entities(text, question_context)
 
-        # 3. Extract CTC information
-        ctc_patterns = [
-            # Current CTC patterns
-            r'current(?:\s*ctc)?\s*(?:is|of)?\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'(?:i\s*(?:am|m)\s*(?:getting|earning|making))\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?\s*(?:per\s*annum|p\.?a\.?)?\s*(?:current|right now|at present)',
-
-            # Expected CTC patterns
-            r'expect(?:ed|ing)?(?:\s*ctc)?\s*(?:is|of)?\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'looking\s*for\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?\s*(?:per\s*annum|p\.?a\.?)?\s*(?:expect|want|desired)'
-        ]
-
-        # Try to find current CTC
-        for pattern in ctc_patterns[:3]:  # First 3 patterns are for current CTC
-            matches = re.findall(pattern, text)
-            if matches:
-                value, unit = matches[0] if len(matches[0]) == 2 else (matches[0][0], '')
-                entities["current_ctc"] = standardize_ctc_value(value, unit)
-                break
-
-        # Try to find expected CTC
-        for pattern in ctc_patterns[3:]:  # Last 3 patterns are for expected CTC
-            matches = re.findall(pattern, text)
-            if matches:
-                value, unit = matches[0] if len(matches[0]) == 2 else (matches[0][0], '')
-                entities["expected_ctc"] = standardize_ctc_value(value, unit)
-                break
-
-        # If specific patterns don't match, try general approaches
-        if "current_ctc" not in entities or "expected_ctc" not in entities:
-            # Look for patterns like "X to Y" or "X and Y"
-            range_pattern = r'(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(?:lakh|lakhs|lpa|k|L)?\s*(?:to|and)\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(?:lakh|lakhs|lpa|k|L)?'
-            range_matches = re.findall(range_pattern, text)
-
-            if range_matches:
-                if "current_ctc" not in entities:
-                    entities["current_ctc"] = standardize_ctc_value(range_matches[0][0], '')
-                if "expected_ctc" not in entities:
-                    entities["expected_ctc"] = standardize_ctc_value(range_matches[0][1], '')
-            else:
-                # Just find all numbers and make an educated guess
-                all_numbers = re.findall(r'(\d+(?:\.\d+)?)', text)
-                if len(all_numbers) >= 2:
-                    if "current_ctc" not in entities:
-                        entities["current_ctc"] = standardize_ctc_value(all_numbers[0], '')
-                    if "expected_ctc" not in entities:
-                        entities["expected_ctc"] = standardize_ctc_value(all_numbers[1], '')
-                elif len(all_numbers) == 1 and "current_ctc" not in entities:
-                    # If only one number, assume it's current CTC
-                    entities["current_ctc"] = standardize_ctc_value(all_numbers[0], '')
-
-        # 4. Extract availability information
-        # Day patterns
-        day_patterns = [
-            r'\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b',
-            r'\b(mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)\b',
-            r'\b(tomorrow|day after tomorrow|next week)\b',
-            r'\b(\d{1,2})(?:st|nd|rd|th)?\s*(?:of)?\s*(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b'
-        ]
-
-        # Time patterns
-        time_patterns = [
-            r'\b(\d{1,2})\s*(?::|\.)\s*(\d{2})\s*(?:hours|hrs|h)?\b',  # 14:30, 2.30
-            r'\b(\d{1,2})\s*(?::|\.)\s*(\d{2})\s*(am|pm)\b',  # 2:30 pm
-            r'\b(\d{1,2})\s*(am|pm)\b',  # 2pm
-            r'\b(morning|afternoon|evening)\b',  # morning, afternoon
-            r'\b(\d{1,2})\s*o\'?clock\b'  # 2 o'clock
-        ]
-
-        # Extract days
-        days = []
-        for pattern in day_patterns:
-            matches = re.findall(pattern, text.lower())
-            if matches:
-                if pattern == r'\b(\d{1,2})(?:st|nd|rd|th)?\s*(?:of)?\s*(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b':
-                    # Format date properly
-                    for match in matches:
-                        day, month = match
-                        days.append(f"{day} {month}")
-                else:
-                    days.extend(matches)
-
-        # Extract times
-        times = []
-        for pattern in time_patterns:
-            matches = re.findall(pattern, text.lower())
-            if matches:
-                if pattern == r'\b(morning|afternoon|evening)\b':
-                    # Convert time of day to representative hours
-                    time_map = {"morning": "9:00 AM", "afternoon": "2:00 PM", "evening": "6:00 PM"}
-                    times.extend([time_map[m] for m in matches])
-                elif pattern == r'\b(\d{1,2})\s*o\'?clock\b':
-                    # Format o'clock times
-                    for match in matches:
-                        hour = match
-                        # Assume AM for 8-11, PM for 12-7
-                        ampm = "AM" if 8 <= int(hour) <= 11 else "PM"
-                        times.append(f"{hour}:00 {ampm}")
-                elif pattern == r'\b(\d{1,2})\s*(am|pm)\b':
-                    # Format hour only times
-                    for match in matches:
-                        hour, ampm = match
-                        times.append(f"{hour}:00 {ampm.upper()}")
-                elif pattern == r'\b(\d{1,2})\s*(?::|\.)\s*(\d{2})\s*(am|pm)\b':
-                    # Format standard times with AM/PM
-                    for match in matches:
-                        hour, minute, ampm = match
-                        times.append(f"{hour}:{minute} {ampm.upper()}")
-                else:
-                    # Format 24-hour times
-                    for match in matches:
-                        hour, minute = match[0], match[1]
-                        # Convert to 12-hour format
-                        ampm = "AM" if int(hour) < 12 else "PM"
-                        hour12 = str(int(hour) % 12)
-                        hour12 = "12" if hour12 == "0" else hour12
-                        times.append(f"{hour12}:{minute} {ampm}")
-
-        # Combine into availability object
-        availability = {}
-        if days:
-            availability["day"] = days[0]  # Take the first day mentioned
-        if times:
-            availability["time"] = times[0]  # Take the first time mentioned
-
-        if availability:
-            entities["availability"] = availability
-
-    elif "interest" in question_context:
-        # Enhanced notice period extraction with more patterns
-        notice_patterns = [
-            r'(\d+)\s*(day|days|week|weeks|month|months)',  # e.g., "2 months", "30 days"
-            r'(one|two|three|four|five|six)\s*(day|days|week|weeks|month|months)',  # e.g., "two weeks"
-            r'(immediate|immediately)',  # Immediate joining
-            r'(\d+)\s*to\s*(\d+)\s*(day|days|week|weeks|month|months)'  # e.g., "2 to 3 months"
-        ]
-
-        # Try each pattern
-        for pattern in notice_patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                if pattern == r'(immediate|immediately)':
-                    entities["notice_period"] = "Immediate"
-                    break
-                elif 'to' in pattern:
-                    # Range pattern (e.g., "2 to 3 months")
-                    start, end, unit = matches[0]
-                    entities["notice_period"] = f"{start}-{end} {unit}"
-                    break
-                else:
-                    # Standard pattern
-                    number, unit = matches[0]
+            # Only this answer was processed; merge it into the conversation so far
+            result = speech_result(text, entities, candidate_id, speech,
+                                   record_turn(candidate_id, question_context, text, entities,
+                                               turn_key(audio_bytes, turn_id)))
 
-                    # Convert text numbers to digits if needed
-                    number_map = {"one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6"}
-                    if number.lower() in number_map:
-                        number = number_map[number.lower()]
+            # Send to Node.js server (a retried turn was sent the first time)
+            if forward and not is_duplicate(result):
+                forward_to_node(candidate_id, text, merged_entities(result))
 
-                    entities["notice_period"] = f"{number} {unit}"
-                    break
+            return result
 
-    elif "ctc" in question_context or "compensation" in question_context or "salary" in question_context:
-        # Enhanced CTC extraction with currency and unit handling
-        # Patterns for different formats
-        ctc_patterns = [
-            # Current CTC patterns
-            r'current(?:\s*ctc)?\s*(?:is|of)?\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'(?:i\s*(?:am|m)\s*(?:getting|earning|making))\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?\s*(?:per\s*annum|p\.?a\.?)?\s*(?:current|right now|at present)',
-
-            # Expected CTC patterns
-            r'expect(?:ed|ing)?(?:\s*ctc)?\s*(?:is|of)?\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'looking\s*for\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?',
-            r'(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(lakh|lakhs|lpa|k|L)?\s*(?:per\s*annum|p\.?a\.?)?\s*(?:expect|want|desired)'
-        ]
-
-        # Try to find current CTC
-        current_ctc_found = False
-        for i, pattern in enumerate(ctc_patterns[:3]):  # First 3 patterns are for current CTC
-            matches = re.findall(pattern, text)
-            if matches:
-                value, unit = matches[0] if len(matches[0]) == 2 else (matches[0][0], '')
-                entities["current_ctc"] = standardize_ctc_value(value, unit)
-                current_ctc_found = True
-                break
-
-        # Try to find expected CTC
-        expected_ctc_found = False
-        for i, pattern in enumerate(ctc_patterns[3:]):  # Last 3 patterns are for expected CTC
-            matches = re.findall(pattern, text)
-            if matches:
-                value, unit = matches[0] if len(matches[0]) == 2 else (matches[0][0], '')
-                entities["expected_ctc"] = standardize_ctc_value(value, unit)
-                expected_ctc_found = True
-                break
-
-        # If specific patterns don't match, try general approaches
-        if not (current_ctc_found and expected_ctc_found):
-            # Look for patterns like "X to Y" or "X and Y"
-            range_pattern = r'(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(?:lakh|lakhs|lpa|k|L)?\s*(?:to|and)\s*(?:inr|rs|₹)?\s*(\d+(?:\.\d+)?)\s*(?:lakh|lakhs|lpa|k|L)?'
-            range_matches = re.findall(range_pattern, text)
-
-            if range_matches:
-                if not current_ctc_found:
-                    entities["current_ctc"] = standardize_ctc_value(range_matches[0][0], '')
-                if not expected_ctc_found:
-                    entities["expected_ctc"] = standardize_ctc_value(range_matches[0][1], '')
-            else:
-                # Just find all numbers and make an educated guess
-                all_numbers = re.findall(r'(\d+(?:\.\d+)?)', text)
-                if len(all_numbers) >= 2 and not (current_ctc_found or expected_ctc_found):
-                    if not current_ctc_found:
-                        entities["current_ctc"] = standardize_ctc_value(all_numbers[0], '')
-                    if not expected_ctc_found:
-                        entities["expected_ctc"] = standardize_ctc_value(all_numbers[1], '')
-                elif len(all_numbers) == 1 and not current_ctc_found:
-                    # If only one number, assume it's current CTC
-                    entities["current_ctc"] = standardize_ctc_value(all_numbers[0], '')
-
-    elif "available" in question_context or "interview" in question_context or "schedule" in question_context:
-        # Enhanced date and time extraction
-        # Day patterns
-        day_patterns = [
-            r'\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b',
-            r'\b(mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)\b',
-            r'\b(tomorrow|day after tomorrow|next week)\b',
-            r'\b(\d{1,2})(?:st|nd|rd|th)?\s*(?:of)?\s*(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b'
-        ]
-
-        # Time patterns
-        time_patterns = [
-            r'\b(\d{1,2})\s*(?::|\.)\s*(\d{2})\s*(?:hours|hrs|h)?\b',  # 14:30, 2.30
-            r'\b(\d{1,2})\s*(?::|\.)\s*(\d{2})\s*(am|pm)\b',  # 2:30 pm
-            r'\b(\d{1,2})\s*(am|pm)\b',  # 2pm
-            r'\b(morning|afternoon|evening)\b',  # morning, afternoon
-            r'\b(\d{1,2})\s*o\'?clock\b'  # 2 o'clock
-        ]
-
-        # Extract days
-        days = []
-        for pattern in day_patterns:
-            matches = re.findall(pattern, text.lower())
-            if matches:
-                if pattern == r'\b(\d{1,2})(?:st|nd|rd|th)?\s*(?:of)?\s*(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b':
-                    # Format date properly
-                    for match in matches:
-                        day, month = match
-                        days.append(f"{day} {month}")
-                else:
-                    days.extend(matches)
-
-        # Extract times
-        times = []
-        for pattern in time_patterns:
-            matches = re.findall(pattern, text.lower())
-            if matches:
-                if pattern == r'\b(morning|afternoon|evening)\b':
-                    # Convert time of day to representative hours
-                    time_map = {"morning": "9:00 AM", "afternoon": "2:00 PM", "evening": "6:00 PM"}
-                    times.extend([time_map[m] for m in matches])
-                elif pattern == r'\b(\d{1,2})\s*o\'?clock\b':
-                    # Format o'clock times
-                    for match in matches:
-                        hour = match
-                        # Assume AM for 8-11, PM for 12-7
-                        ampm = "AM" if 8 <= int(hour) <= 11 else "PM"
-                        times.append(f"{hour}:00 {ampm}")
-                elif pattern == r'\b(\d{1,2})\s*(am|pm)\b':
-                    # Format hour only times
-                    for match in matches:
-                        hour, ampm = match
-                        times.append(f"{hour}:00 {ampm.upper()}")
-                elif pattern == r'\b(\d{1,2})\s*(?::|\.)\s*(\d{2})\s*(am|pm)\b':
-                    # Format standard times with AM/PM
-                    for match in matches:
-                        hour, minute, ampm = match
-                        times.append(f"{hour}:{minute} {ampm.upper()}")
-                else:
-                    # Format 24-hour times
-                    for match in matches:
-                        hour, minute = match[0], match[1]
-                        # Convert to 12-hour format
-                        ampm = "AM" if int(hour) < 12 else "PM"
-                        hour12 = str(int(hour) % 12)
-                        hour12 = "12" if hour12 == "0" else hour12
-                        times.append(f"{hour12}:{minute} {ampm}")
-
-        # Combine into availability object
-        availability = {}
-        if days:
-            availability["day"] = days[0]  # Take the first day mentioned
-        if times:
-            availability["time"] = times[0]  # Take the first time mentioned
-
-        if availability:
-            entities["availability"] = availability
-
-    return entities
-
-def standardize_ctc_value(value, unit):
-    """Standardize CTC values to a consistent format"""
-    try:
-        value = float(value)
-
-        # Apply unit multiplier if needed
-        if unit and unit.lower() in ['lakh', 'lakhs', 'lpa', 'l']:
-            # Convert to lakhs format
-            return f"{value} LPA"
-        elif unit and unit.lower() in ['k']:
-            # Convert thousands to lakhs
-            return f"{value/100} LPA"
-        else:
-            # Assume it's already in lakhs if no unit
-            return f"{value} LPA"
-    except ValueError:
-        return value  # Return as is if conversion fails
+    finally:
+        # Clean up temporary files
+        for path in temp_paths:
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                    log.debug(f"Cleaned up: {path}")
+                except Exception as e:
+                    log.warning(f"Error cleaning up {path}: {str(e)}")
 
 @app.route('/process-speech', methods=['POST'])
 def process_speech():
-    """Process uploaded audio file, extract text and entities, and return results"""
+    """Process uploaded audio file, extract text and entities, and return results
+
+    With `async=true` (query or form field, default PROCESS_SPEECH_ASYNC) the
+    upload is queued and a 202 with a job id is returned immediately.
+    """
     # Validate request
     if 'audio' not in request.files:
-        print("No audio file in request")
+        log.info("No audio file in request")
         return jsonify({'error': 'No audio file provided'}), 400
 
     audio_file = request.files['audio']
     candidate_id = request.form.get('candidateId')
     question_context = request.form.get('questionContext', '')
+    # Sent again with a retried upload, so the session merges the answer once
+    turn_id = request.form.get('turnId') or None
+    run_async = request.values.get('async', str(PROCESS_SPEECH_ASYNC)).lower() in ('1', 'true', 'yes')
 
     if not candidate_id:
-        print("No candidate ID provided")
+        log.info("No candidate ID provided")
         return jsonify({'error': 'No candidate ID provided'}), 400
 
-    print(f"Processing audio for candidate: {candidate_id}")
-    print(f"Question context: {question_context}")
-    print(f"Audio file: {audio_file.filename if audio_file.filename else 'blob'}")
-    print(f"Content type: {audio_file.content_type}")
+    structured_log.set_candidate(candidate_id)
+    log.info("Processing audio", extra={
+        'questionContext': question_context,
+        'audioFile': audio_file.filename if audio_file.filename else 'blob',
+        'contentType': audio_file.content_type
+    })
 
-    # Create temporary files
-    temp_dir = tempfile.gettempdir()
-    input_path = os.path.join(temp_dir, f"input_{candidate_id}.webm")  # Assuming webm from browser
-    wav_path = os.path.join(temp_dir, f"output_{candidate_id}.wav")
+    if run_async:
+        try:
+            job = speech_jobs.submit(structured_log.propagate(process_audio), audio_file.read(), candidate_id, question_context,
+                                     uuid.uuid4().hex, True, turn_id, meta={'candidateId': candidate_id})
+        except QueueFull as e:
+            log.warning("Job queue full, rejecting request")
+            response = jsonify({'error': 'Server busy, please retry later', 'retryAfter': e.retry_after})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+
+        log.info(f"Queued job {job.id}")
+        response = jsonify({
+            'jobId': job.id,
+            'candidateId': candidate_id,
+            'status': job.status,
+            'statusUrl': f"/jobs/{job.id}",
+            'eventsUrl': f"/jobs/{job.id}/events"
+        })
+        response.headers['Location'] = f"/jobs/{job.id}"
+        return response, 202
 
     try:
-        # Save uploaded audio
-        audio_file.save(input_path)
-        print(f"Saved audio to: {input_path}")
+        # Tagged so concurrent uploads from one candidate never share temporary files
+        return jsonify(process_audio(audio_file.read(), candidate_id, question_context, uuid.uuid4().hex,
+                                     turn_id=turn_id)), 200
 
-        # Extract text
-        text = extract_text_from_audio(input_path, wav_path)
+    except PoolOverloaded as e:
+        log.warning("Recognition workers busy, rejecting request")
+        response = jsonify({'error': 'Server busy, please retry later', 'retryAfter': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
 
-        # Extract entities
-        entities = extract_entities(text, question_context)
+    except PoolTimeout as e:
+        log.error("Recognition timed out")
+        return jsonify({'error': f"Processing failed: {str(e)}"}), 504
 
-        # Prepare payload for Node.js server
-        node_url = 'http://localhost:3001/process-candidate-data'
-        payload = {
-            'candidateId': candidate_id,
-            'text': text,
-            'entities': entities,
-            'processedAt': datetime.now().isoformat()
-        }
-
-        # Send to Node.js server
-        print(f"Sending data to Node.js server: {node_url}")
-        try:
-            response = requests.post(node_url, json=payload, timeout=10)
-            response.raise_for_status()
-            print("Successfully sent data to Node.js server")
-        except requests.exceptions.RequestException as e:
-            print(f"Failed to send to Node.js server: {str(e)}")
-            # Continue even if Node.js server is unavailable
-
-        # Successful response
-        return jsonify({
-            'text': text,
-            'entities': entities,
-            'candidateId': candidate_id,
-            'status': 'processed'
-        }), 200
+    except UndecodableAudio as e:
+        log.info(f"Rejected upload: {str(e)}")
+        return jsonify({'error': UNDECODABLE_AUDIO}), 400
 
     except Exception as e:
-        print(f"Error processing audio: {str(e)}")
-        traceback.print_exc()
+        log.exception(f"Error processing audio: {str(e)}")
         return jsonify({'error': f"Processing failed: {str(e)}"}), 500
 
+@app.route('/process-speech/batch', methods=['POST'])
+def process_speech_batch():
+    """Process many recorded answers in one request, streaming NDJSON results
+
+    Accepts several `audio` parts (see batch_upload.items_from_form for how
+    candidateId/questionContext are matched to files) or a zip `archive`
+    (also as a raw application/zip body) containing manifest.json or
+    manifest.csv. One line is streamed per item as it finishes, followed by
+    a summary line; processed items are forwarded to Node as one group,
+    except turns the candidate's session already had (a re-sent batch).
+    """
+    try:
+        if 'archive' in request.files or request.mimetype == 'application/zip':
+            data = request.files['archive'].read() if 'archive' in request.files else request.get_data()
+            items = items_from_archive(data, BATCH_MAX_ITEMS, int(BATCH_MAX_MB * 1024 * 1024),
+                                       int(BATCH_MAX_FILE_MB * 1024 * 1024))
+        elif 'audio' in request.files:
+            items = items_from_form(request.files, request.form, BATCH_MAX_ITEMS)
+        else:
+            raise BatchError('No audio files or archive provided')
+        if not items:
+            raise BatchError('Batch is empty')
+    except BatchError as e:
+        log.info(f"Rejected batch: {str(e)}")
+        return jsonify({'error': str(e)}), e.status
+
+    request_id = g.request_id
+
+    def process_item(item):
+        with structured_log.context(request_id, item['candidateId']):
+            return process_audio(item['audio'], item['candidateId'], item['questionContext'],
+                                 uuid.uuid4().hex, forward=False, turn_id=batch_turn_key(item))
+
+    def forward_batch(lines):
+        lines = [line for line in lines if not is_duplicate(line)]
+        if lines:
+            node_forwarder.send_many([node_payload(line['candidateId'], line['text'], merged_entities(line))
+                                      for line in lines])
+
+    batch = BatchRun(items, process_item, batch_executor, on_complete=forward_batch).start()
+    log.info(f"Processing batch {batch.id} with {len(items)} item(s)")
+
+    def lines():
+        for line in batch.results():
+            yield json.dumps(line) + '\n'
+        yield json.dumps(batch.summary()) + '\n'
+
+    return Response(lines(), mimetype='application/x-ndjson', headers={'X-Batch-Id': batch.id})
+
+@app.route('/extract-entities', methods=['POST'])
+def extract_entities_endpoint():
+    """Extract entities from transcripts, without audio, streaming NDJSON results
+
+    The body is a JSON list of {text, questionContext} records (or
+    {"records": [...]}, or a single record), or NDJSON with one record per
+    line (Content-Type application/x-ndjson), which is read incrementally.
+    One line per record is returned in input order: {index, entities}, plus
+    the record's `id` if it had one, or {index, error} for invalid records.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        stream = request.stream
+
+        def parsed():
+            # Read in blocks; line-at-a-time reads from the request stream are slow
+            pending = b''
+            while True:
+                block = stream.read(65536)
+                lines = (pending + block).split(b'\n')
+                pending = lines.pop() if block else b''
+                for line in lines:
+                    if line.strip():
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            yield None
+                if not block:
+                    return
+        records = parsed()
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('records', [data])
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a list of {text, questionContext} records'}), 400
+        records = iter(data)
+
+    def lines():
+        index = 0
+        while True:
+            chunk = list(islice(records, EXTRACT_CHUNK_SIZE))
+            if not chunk:
+                return
+            valid = [record for record in chunk
+                     if isinstance(record, dict) and isinstance(record.get('text'), str)]
+            results = entity_extractor.extract_batch(valid)
+            out = []
+            for record in chunk:
+                if isinstance(record, dict) and isinstance(record.get('text'), str):
+                    line = {'index': index, 'entities': next(results)}
+                    if 'id' in record:
+                        line['id'] = record['id']
+                else:
+                    line = {'index': index, 'error': 'Record must be an object with a text string'}
+                out.append(json.dumps(line))
+                index += 1
+            yield '\n'.join(out) + '\n'
+
+    return Response(lines(), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return the status (and, once finished, the result) of an async speech job"""
+    job = speech_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream status changes of an async speech job as Server-Sent Events"""
+    job = speech_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def events():
+        status = None
+        while True:
+            new_status = job.wait_for_change(status, timeout=15)
+            if new_status == status:
+                yield ": keep-alive\n\n"
+                continue
+            status = new_status
+            yield f"event: {status}\ndata: {json.dumps(job.to_dict())}\n\n"
+            if job.finished:
+                return
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/sessions/<candidate_id>', methods=['GET'])
+def get_session(candidate_id):
+    """Return a candidate's conversation session: merged entities, their sources and the turns"""
+    session = conversation_sessions.get(candidate_id) if conversation_sessions is not None else None
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(session), 200
+
+@app.route('/sessions/<candidate_id>', methods=['DELETE'])
+def delete_session(candidate_id):
+    """Forget a candidate's conversation session, e.g. before a new interview"""
+    if conversation_sessions is None or not conversation_sessions.delete(candidate_id):
+        return jsonify({'error': 'Session not found'}), 404
+    return '', 204
+
+@sock.route('/process-speech/stream')
+def process_speech_stream(ws):
+    """Stream audio over a WebSocket, pushing partial transcripts and entity updates back
+
+    Query parameters: candidateId, questionContext, turnId and format ('pcm' for raw
+    16kHz mono 16-bit audio, otherwise any container FFmpeg can read from a
+    pipe, e.g. MediaRecorder WebM/Opus chunks). Binary messages carry audio;
+    the text message 'end' finishes the stream.
+    """
+    candidate_id = request.args.get('candidateId')
+    question_context = request.args.get('questionContext', '')
+    turn_id = request.args.get('turnId') or None
+    raw_pcm = request.args.get('format', '').lower() == 'pcm'
+
+    send_lock = threading.Lock()
+
+    def emit(event):
+        with send_lock:
+            ws.send(json.dumps(event))
+
+    if not candidate_id:
+        emit({'type': 'error', 'error': 'No candidate ID provided'})
+        return
+    if not raw_pcm and not ffmpeg_available:
+        emit({'type': 'error', 'error': FFMPEG_MISSING})
+        return
+
+    structured_log.set_candidate(candidate_id)
+    log.info("Streaming audio")
+    stream = None
+    try:
+        stream = SpeechStream(get_engine(), question_context, emit, raw_pcm=raw_pcm,
+                              extract=entity_extractor.extract)
+        while True:
+            message = ws.receive()
+            if isinstance(message, str):
+                if message.strip().lower() == 'end':
+                    break
+                continue
+            stream.feed(message)
+
+        text, entities = stream.finish()
+        result = speech_result(text, entities, candidate_id,
+                               session=record_turn(candidate_id, question_context, text, entities, turn_id))
+        emit({'type': 'final', **result})
+        if not is_duplicate(result):
+            forward_to_node(candidate_id, text, merged_entities(result))
+
+    except ConnectionClosed:
+        log.info("Stream closed by client")
+    except Exception as e:
+        log.exception(f"Error processing audio stream: {str(e)}")
+        emit({'type': 'error', 'error': f"Processing failed: {str(e)}"})
     finally:
-        # Clean up temporary files
-        for path in [input_path, wav_path]:
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                    print(f"Cleaned up: {path}")
-                except Exception as e:
-                    print(f"Error cleaning up {path}: {str(e)}")
+        if stream is not None:
+            stream.close()
 
-@app.route('/tts', methods=['POST'])
+@app.route('/tts', methods=['GET', 'POST'])
 def text_to_speech():
-    """Convert text to speech using the browser's built-in TTS or a fallback service"""
-    data = request.json
-    if not data or 'text' not in data:
+    """Convert text to WAV speech with the offline TTS engine
+
+    The ETag is the content hash of the text and voice, so a client that
+    repeats a prompt with If-None-Match gets a 304 without any synthesis;
+    otherwise cached audio is streamed straight from memory or disk.
+    """
+    data = request.get_json(silent=True) if request.method == 'POST' else request.args
+    if not data or not str(data.get('text') or '').strip():
         return jsonify({'error': 'No text provided'}), 400
 
-    text = data['text']
+    text = str(data['text']).strip()
+    try:
+        key = speech_synthesizer.key(text)
+    except Exception as e:
+        log.warning(f"TTS engine not available: {str(e)}")
+        return jsonify({'error': f"Text-to-speech not available: {str(e)}"}), 503
 
-    # For now, return a simple response - in a real implementation,
-    # you would integrate with a TTS service or use pyttsx3
-    return jsonify({
-        'success': True,
-        'message': 'Text-to-speech request received. Using browser TTS.'
-    }), 200
+    if request.if_none_match.contains(key):
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
+    try:
+        audio = speech_synthesizer.render(text, key)
+    except Exception as e:
+        log.exception(f"Error synthesizing speech: {str(e)}")
+        return jsonify({'error': f"Text-to-speech failed: {str(e)}"}), 500
+
+    # Streamed in blocks, with Range support for <audio> elements
+    response = send_file(io.BytesIO(audio), mimetype='audio/wav', etag=key, max_age=0, conditional=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({'error': f"Request exceeds {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+@app.before_request
+def track_request_start():
+    g.request_id = structured_log.start_request(request.headers.get('X-Request-ID'))
+    g.metrics_endpoint = request.endpoint or 'unknown'
+    metrics.HTTP_IN_FLIGHT.add(1, g.metrics_endpoint)
+
+@app.after_request
+def track_request_status(response):
+    metrics.HTTP_REQUESTS.inc(g.get('metrics_endpoint', 'unknown'), str(response.status_code))
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.teardown_request
+def track_request_end(exc):
+    if 'metrics_endpoint' in g:
+        metrics.HTTP_IN_FLIGHT.add(-1, g.metrics_endpoint)
+    structured_log.end_request()
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Pipeline stage latencies, error counters and in-flight gauges in Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: 503 until warm-up has finished (/health only reports liveness)"""
     return jsonify({
+        'ready': warmup_state['ready'],
+        'warmup': warmup_state,
+        'pid': os.getpid(),
+        'date': datetime.now().isoformat()
+    }), 200 if warmup_state['ready'] else 503
+
+def health_status():
+    """Body of the /health response"""
+    return {
         'status': 'healthy',
         'ffmpeg_available': ffmpeg_available,
+        'audio_decoder': audio_decoder.name,
+        'asr_engine': ASR_ENGINE,
+        'asr_available': asr_available,
+        'jobs': speech_jobs.stats(),
+        'asr_pool': asr_pool.stats() if asr_pool is not None else None,
+        'node_forwarder': node_forwarder.stats(),
+        'transcript_cache': transcript_cache.stats() if transcript_cache is not None else None,
+        'entity_engine': entity_extractor.name,
+        'entity_cache': cached_extract_entities.stats(),
+        'tts_cache': speech_synthesizer.cache.stats(),
+        'sessions': conversation_sessions.stats() if conversation_sessions is not None else None,
         'date': datetime.now().isoformat()
-    }), 200
+    }
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint"""
+    return jsonify(health_status()), 200
 
 if __name__ == '__main__':
     port = int(os.getenv('FLASK_PORT', 5000))
-    print(f"Starting server on port {port}")
+    log.info(f"Starting server on port {port}")
+    # Replay payloads spooled by a previous run
+    node_forwarder.start()
+    warm_up()
     app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,352 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_app
+import metrics
+import structured_log
+from asr import engine_identity
+from audio_decode import UNDECODABLE_AUDIO, FFmpegMissing, UndecodableAudio, load_pcm_async, sniff_format
+from jobs import QueueFull
+from node_forwarder import AsyncNodeForwarder
+from process_pool import PoolOverloaded, PoolTimeout
+from speech_cache import TranscriptCache
+
+# ASGI (asyncio) variant of the speech service
+#
+#     uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+#
+# /process-speech, /tts and /health are served natively with the same
+# request and response contracts as the Flask routes; an in-flight request
+# holds no thread while it waits. FFmpeg decoding runs as an asyncio
+# subprocess (PyAV and NumPy decoding in the default executor), recognition
+# runs in a bounded thread pool (which hands it to the worker pool with
+# ASR_EXECUTION=process), and results go to Node through an async pooled
+# HTTP client. Every other route (jobs, batch uploads, metrics, readiness...)
+# is the Flask app itself, mounted underneath and run in threads; the
+# WebSocket stream is only available from the Flask server.
+
+# Threads for recognition (and its wait on the worker pool); the number of
+# in-flight requests is not limited by it, only concurrent recognitions are
+ASGI_RECOGNITION_WORKERS = int(os.getenv('ASGI_RECOGNITION_WORKERS', 8))
+
+# Uploads decoded at once (FFmpeg processes or executor threads); without a
+# limit every in-flight request would start its own FFmpeg process at once
+ASGI_DECODE_CONCURRENCY = int(os.getenv('ASGI_DECODE_CONCURRENCY', 0)) or os.cpu_count() or 1
+
+# Chunk size of streamed /tts audio
+TTS_CHUNK_BYTES = 64 * 1024
+
+# Natively served routes, labelled like their Flask endpoints in the metrics
+ENDPOINTS = {'/process-speech': 'process_speech', '/tts': 'text_to_speech', '/health': 'health_check'}
+
+log = logging.getLogger(__name__)
+
+recognition_executor = None
+decode_slots = asyncio.Semaphore(ASGI_DECODE_CONCURRENCY)
+node_forwarder = AsyncNodeForwarder(
+    flask_app.node_forwarder.base_url,
+    flask_app.node_forwarder.spool_path,
+    batch_size=flask_app.node_forwarder.batch_size,
+    batch_wait=flask_app.node_forwarder.batch_wait,
+    max_retries=flask_app.node_forwarder.max_retries
+)
+# One forwarder per process: two on the same spool would both replay it.
+# The mounted Flask routes (batch uploads, async jobs) send through this one
+# too; their calls from WSGI threads are handed to the event loop.
+flask_app.node_forwarder = node_forwarder
+
+
+async def in_executor(func, *args):
+    """Run a blocking call on the recognition threads, keeping the request's log context"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(recognition_executor, functools.partial(structured_log.propagate(func), *args))
+
+
+async def in_thread(func, *args):
+    """Run a blocking call that may touch disk (caches, session files) off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(structured_log.propagate(func), *args))
+
+
+async def recognize(audio_bytes, question_context):
+    """Decode without holding a thread, then recognize on the recognition threads"""
+    if not flask_app.decoder_available and sniff_format(audio_bytes[:12]) != 'wav':
+        raise FFmpegMissing()
+    if flask_app.asr_pool is not None:
+        # Pool workers decode too, so the upload is not decoded twice over pipes
+        return await in_executor(flask_app.extract_text_from_audio, audio_bytes, None, None, True,
+                                 question_context)
+    async with decode_slots:
+        with metrics.stage('decode'):
+            pcm = await load_pcm_async(audio_bytes)
+    return await in_executor(flask_app.recognize_pcm, pcm, None, True, question_context)
+
+
+async def process_audio(audio_bytes, candidate_id, question_context, turn_id=None):
+    """Async app.process_audio: recognition, entity extraction, the session merge and the Node forward"""
+    speech = {}
+
+    async def transcribe():
+        text, stats = await recognize(audio_bytes, question_context)
+        speech.update(stats or {})
+        return text
+
+    with metrics.stage('total'):
+        cache = flask_app.transcript_cache
+        if cache is not None:
+            # Re-sent recordings skip decoding and recognition entirely
+            key = TranscriptCache.key(audio_bytes, engine_identity(question_context=question_context))
+            text = await in_thread(cache.get, key)
+            if text is None:
+                text = await transcribe()
+                await in_thread(cache.put, key, text)
+        else:
+            text = await transcribe()
+
+        with metrics.stage('entities'):
+            entities = flask_app.cached_extract_entities(text, question_context)
+        session = await in_thread(flask_app.record_turn, candidate_id, question_context, text, entities,
+                                  flask_app.turn_key(audio_bytes, turn_id))
+        result = flask_app.speech_result(text, entities, candidate_id, speech, session)
+        if not flask_app.is_duplicate(result):
+            node_forwarder.send(flask_app.node_payload(candidate_id, text, flask_app.merged_entities(result)))
+        return result
+
+
+async def process_speech(request):
+    """Process uploaded audio file, extract text and entities, and return results
+
+    Same contract as the Flask route, including `async=true` jobs (run by the
+    Flask app's job queue and polled through its /jobs routes).
+    """
+    form = await request.form()
+    audio_file = form.get('audio')
+    if audio_file is None or isinstance(audio_file, str):
+        log.info("No audio file in request")
+        return JSONResponse({'error': 'No audio file provided'}, 400)
+
+    candidate_id = form.get('candidateId')
+    question_context = form.get('questionContext', '')
+    turn_id = form.get('turnId') or None
+    run_async = str(request.query_params.get('async', form.get('async', flask_app.PROCESS_SPEECH_ASYNC))).lower() \
+        in ('1', 'true', 'yes')
+
+    if not candidate_id:
+        log.info("No candidate ID provided")
+        return JSONResponse({'error': 'No candidate ID provided'}, 400)
+
+    structured_log.set_candidate(candidate_id)
+    log.info("Processing audio", extra={
+        'questionContext': question_context,
+        'audioFile': audio_file.filename if audio_file.filename else 'blob',
+        'contentType': audio_file.content_type
+    })
+    audio_bytes = await audio_file.read()
+
+    if run_async:
+        try:
+            job = flask_app.speech_jobs.submit(structured_log.propagate(flask_app.process_audio), audio_bytes,
+                                               candidate_id, question_context, uuid.uuid4().hex, True, turn_id,
+                                               meta={'candidateId': candidate_id})
+        except QueueFull as e:
+            log.warning("Job queue full, rejecting request")
+            return JSONResponse({'error': 'Server busy, please retry later', 'retryAfter': e.retry_after}, 429,
+                                headers={'Retry-After': str(e.retry_after)})
+
+        log.info(f"Queued job {job.id}")
+        return JSONResponse({
+            'jobId': job.id,
+            'candidateId': candidate_id,
+            'status': job.status,
+            'statusUrl': f"/jobs/{job.id}",
+            'eventsUrl': f"/jobs/{job.id}/events"
+        }, 202, headers={'Location': f"/jobs/{job.id}"})
+
+    try:
+        return JSONResponse(await process_audio(audio_bytes, candidate_id, question_context, turn_id))
+
+    except PoolOverloaded as e:
+        log.warning("Recognition workers busy, rejecting request")
+        return JSONResponse({'error': 'Server busy, please retry later', 'retryAfter': e.retry_after}, 503,
+                            headers={'Retry-After': str(e.retry_after)})
+
+    except PoolTimeout as e:
+        log.error("Recognition timed out")
+        return JSONResponse({'error': f"Processing failed: {str(e)}"}, 504)
+
+    except UndecodableAudio as e:
+        log.info(f"Rejected upload: {str(e)}")
+        return JSONResponse({'error': UNDECODABLE_AUDIO}, 400)
+
+    except Exception as e:
+        log.exception(f"Error processing audio: {str(e)}")
+        return JSONResponse({'error': f"Processing failed: {str(e)}"}, 500)
+
+
+def byte_range(header, size):
+    """Parse a single `bytes=start-end` Range header; None if absent or unsatisfiable"""
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, _, end = header[6:].partition('-')
+    try:
+        if not start:
+            start, end = max(0, size - int(end)), size - 1
+        else:
+            start, end = int(start), min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    return (start, end) if start <= end else None
+
+
+async def text_to_speech(request):
+    """Convert text to WAV speech, as the Flask /tts route (ETag, 304, Range)"""
+    if request.method == 'POST':
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            data = None
+    else:
+        data = request.query_params
+    if not data or not str(data.get('text') or '').strip():
+        return JSONResponse({'error': 'No text provided'}, 400)
+
+    text = str(data['text']).strip()
+    synthesizer = flask_app.speech_synthesizer
+    try:
+        key = await asyncio.to_thread(synthesizer.key, text)
+    except Exception as e:
+        log.warning(f"TTS engine not available: {str(e)}")
+        return JSONResponse({'error': f"Text-to-speech not available: {str(e)}"}, 503)
+
+    etag = f'"{key}"'
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache', 'Accept-Ranges': 'bytes'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return Response(status_code=304, headers={'ETag': etag})
+
+    try:
+        # Cache hits return at once; synthesis itself blocks, so never on the event loop
+        audio = await asyncio.to_thread(synthesizer.render, text, key)
+    except Exception as e:
+        log.exception(f"Error synthesizing speech: {str(e)}")
+        return JSONResponse({'error': f"Text-to-speech failed: {str(e)}"}, 500)
+
+    status = 200
+    span = byte_range(request.headers.get('range'), len(audio))
+    if span is not None:
+        status = 206
+        headers['Content-Range'] = f"bytes {span[0]}-{span[1]}/{len(audio)}"
+        audio = audio[span[0]:span[1] + 1]
+    headers['Content-Length'] = str(len(audio))
+
+    async def chunks():
+        view = memoryview(audio)
+        for offset in range(0, len(view), TTS_CHUNK_BYTES):
+            yield bytes(view[offset:offset + TTS_CHUNK_BYTES])
+
+    return StreamingResponse(chunks(), status, headers=headers, media_type='audio/wav')
+
+
+async def health_check(request):
+    """Health check endpoint"""
+    status = flask_app.health_status()
+    status['node_forwarder'] = node_forwarder.stats()
+    status['server'] = 'asgi'
+    return JSONResponse(status)
+
+
+class RequestContextMiddleware:
+    """Request ids (X-Request-ID) and HTTP metrics, as the Flask request hooks do"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope['headers'])
+        request_id = structured_log.start_request(
+            headers[b'x-request-id'].decode('latin-1') if b'x-request-id' in headers else None)
+        if b'x-request-id' not in headers:
+            # The mounted Flask app picks up the same id
+            scope['headers'] = list(scope['headers']) + [(b'x-request-id', request_id.encode('latin-1'))]
+        endpoint = ENDPOINTS.get(scope['path'])
+        if endpoint is not None:
+            metrics.HTTP_IN_FLIGHT.add(1, endpoint)
+
+        async def send_with_context(message):
+            if message['type'] == 'http.response.start':
+                if endpoint is not None:
+                    metrics.HTTP_REQUESTS.inc(endpoint, str(message['status']))
+                response_headers = message.setdefault('headers', [])
+                if not any(name.lower() == b'x-request-id' for name, _ in response_headers):
+                    response_headers.append((b'x-request-id', request_id.encode('latin-1')))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_context)
+        finally:
+            if endpoint is not None:
+                metrics.HTTP_IN_FLIGHT.add(-1, endpoint)
+            structured_log.end_request()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global recognition_executor
+    if sys.version_info < (3, 12) and hasattr(os, 'pidfd_open'):
+        # Wait for FFmpeg processes through pidfds rather than a thread per process (the default from 3.12)
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(asyncio.get_running_loop())
+        asyncio.set_child_watcher(watcher)
+    recognition_executor = ThreadPoolExecutor(max_workers=ASGI_RECOGNITION_WORKERS,
+                                              thread_name_prefix='asgi-recognition')
+    if flask_app.asr_pool is not None:
+        flask_app.asr_pool.start()
+    node_forwarder.start()
+    if not flask_app.warmup_state['ready']:
+        await asyncio.to_thread(flask_app.warm_up)
+    yield
+    await node_forwarder.flush(timeout=5)
+    await node_forwarder.aclose()
+    recognition_executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/process-speech', process_speech, methods=['POST']),
+        Route('/tts', text_to_speech, methods=['GET', 'POST']),
+        Route('/health', health_check, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app.app)),
+    ],
+    middleware=[
+        Middleware(RequestContextMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                   expose_headers=['ETag', 'X-Request-ID']),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('FLASK_PORT', 5000))
+    log.info(f"Starting ASGI server on port {port}")
+    uvicorn.run(app, host='0.0.0.0', port=port, log_config=None)
@@ -0,0 +1,212 @@
+import os
+import itertools
+import logging
+import threading
+import speech_recognition as sr
+
+from audio_decode import SAMPLE_RATE, SAMPLE_WIDTH, iter_bytes_chunks, iter_pcm_chunks
+import metrics
+from structured_log import TRANSCRIPT_LOGGER
+from vad import VAD_ENABLED, trim_silence
+from chunked_asr import CHUNKED_ASR, CHUNK_MIN_AUDIO_SECONDS, transcribe_chunked
+from grammars import VOSK_GRAMMARS, ContextGrammars, decode, grammar_profile
+from spoken_numbers import digits_from_words
+
+# Speech recognition engines
+#
+# Every engine takes an iterable of 16kHz mono 16-bit PCM chunks and returns
+# the recognized text, raising sr.UnknownValueError when nothing was
+# understood and sr.RequestError when the backend itself failed. Engines that
+# can use the question context also have transcribe_in_context(). Vosk spells
+# numbers out, so its transcripts get them as digits (spoken_numbers.py)
+# like the Google engine's.
+
+ASR_ENGINE = os.getenv('ASR_ENGINE', 'google').lower()
+VOSK_MODEL_PATH = os.getenv('VOSK_MODEL_PATH', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'vosk-model-small-en-us', 'vosk-model-small-en-us-0.15'))
+
+log = logging.getLogger(__name__)
+transcript_log = logging.getLogger(TRANSCRIPT_LOGGER)
+
+
+class GoogleEngine:
+    """Google Web Speech API via SpeechRecognition (needs network access)"""
+
+    name = 'google'
+    model_id = 'google-web-speech'
+    local = False  # Every call goes over the network
+
+    def transcribe(self, pcm_chunks):
+        audio_data = sr.AudioData(b''.join(pcm_chunks), SAMPLE_RATE, SAMPLE_WIDTH)
+        return sr.Recognizer().recognize_google(audio_data)
+
+
+class VoskEngine:
+    """Offline Kaldi recognition with a Vosk model shared by all requests"""
+
+    name = 'vosk'
+    local = True
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        import vosk
+
+        vosk.SetLogLevel(-1)
+        if not os.path.isdir(model_path):
+            raise Exception(f"Vosk model not found at {model_path}")
+        self._vosk = vosk
+        self.model_path = model_path
+        # '+digits': cached transcripts from before numbers were converted are not reused
+        self.model_id = f"vosk:{os.path.basename(os.path.normpath(model_path))}+digits"
+        # Loading the model is the expensive part; it is read-only afterwards
+        # and safe to share between threads
+        self.model = vosk.Model(model_path)
+        # Vocabulary-constrained recognizers for targeted questions (VOSK_GRAMMARS)
+        self.grammars = None
+        if VOSK_GRAMMARS:
+            self.grammars = ContextGrammars(vosk, self.model, SAMPLE_RATE)
+            self.grammars.warm()
+
+    def recognizer(self):
+        """Create a cheap per-request recognizer on the shared model"""
+        return self._vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+
+    def grammar_profile(self, question_context):
+        """The grammar answers to this question are recognized with, or None"""
+        return grammar_profile(question_context) if self.grammars is not None else None
+
+    def transcribe(self, pcm_chunks):
+        text, _ = decode(self.recognizer(), pcm_chunks)
+        if not text:
+            raise sr.UnknownValueError()
+        return digits_from_words(text)
+
+    def transcribe_in_context(self, pcm_chunks, question_context):
+        """Recognize with the question context's grammar, falling back to the open vocabulary"""
+        profile = self.grammar_profile(question_context)
+        if profile is None:
+            return self.transcribe(pcm_chunks)
+        pcm_chunks = list(pcm_chunks)  # Kept for the fallback
+        text = self.grammars.transcribe(profile, pcm_chunks)
+        return digits_from_words(text) if text else self.transcribe(pcm_chunks)
+
+
+ENGINES = {
+    'google': GoogleEngine,
+    'vosk': VoskEngine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name=None):
+    """Return the process-wide instance of an ASR engine, creating it on first use"""
+    name = (name or ASR_ENGINE).lower()
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                if name not in ENGINES:
+                    raise Exception(f"Unknown ASR engine: {name}")
+                engine = ENGINES[name]()
+                _engines[name] = engine
+    return engine
+
+
+def engine_identity(name=None, question_context=None):
+    """Return the model id of an engine (its name if it cannot be loaded)
+
+    With a question context, the id also names the grammar the engine
+    recognizes it with, so transcripts are cached per grammar.
+    """
+    try:
+        engine = get_engine(name)
+    except Exception:
+        return (name or ASR_ENGINE).lower()
+    profile = engine.grammar_profile(question_context) if hasattr(engine, 'grammar_profile') else None
+    return f"{engine.model_id}+grammar:{profile}" if profile else engine.model_id
+
+
+def load_engine(name=None):
+    """Load an engine at startup, reporting (not raising) failures"""
+    try:
+        engine = get_engine(name)
+        log.info(f"ASR engine ready: {engine.model_id}")
+        return True
+    except Exception as e:
+        log.warning(f"Could not load ASR engine '{name or ASR_ENGINE}': {str(e)}")
+        return False
+
+
+def transcribe_audio(audio, output_wav_path=None, engine=None, with_stats=False, question_context=None):
+    """Decode an upload and recognize it in this process.
+
+    Returns the recognized text, or "" when nothing could be understood.
+    With VAD_ENABLED, non-speech audio is trimmed before recognition, and with
+    CHUNKED_ASR, long recordings are split and recognized in parallel. Pass
+    `with_stats=True` to get (text, speech stats) instead (stats are None
+    when VAD is off). `question_context` selects the recognizer's grammar
+    (see grammars.py) on engines that support it.
+    """
+    asr_engine = get_engine(engine)
+
+    # Convert audio to 16kHz mono PCM (decoding finishes before the first chunk)
+    with metrics.stage('decode'):
+        pcm_chunks = _started(iter_pcm_chunks(audio, output_wav_path))
+        pcm = b''.join(pcm_chunks) if VAD_ENABLED or CHUNKED_ASR else None
+    return _recognize(asr_engine, pcm_chunks, pcm, with_stats, question_context)
+
+
+def transcribe_pcm(pcm, engine=None, with_stats=False, question_context=None):
+    """transcribe_audio for audio that was already decoded to 16kHz mono PCM"""
+    return _recognize(get_engine(engine), iter_bytes_chunks(pcm), pcm, with_stats, question_context)
+
+
+def _recognize(asr_engine, pcm_chunks, pcm, with_stats, question_context=None):
+    # `pcm` is the joined audio, or None when neither VAD nor chunking needs it
+    stats = None
+    if VAD_ENABLED:
+        with metrics.stage('vad'):
+            pcm, stats = trim_silence(pcm)
+        log.info(f"Speech ratio: {stats['speechRatio']:.0%} "
+                 f"({stats['keptSeconds']}s of {stats['audioSeconds']}s sent to recognition)")
+    if pcm is not None:
+        pcm_chunks = iter_bytes_chunks(pcm)
+
+    # Long recordings are recognized as parallel segments
+    chunked = CHUNKED_ASR and len(pcm) > CHUNK_MIN_AUDIO_SECONDS * SAMPLE_RATE * SAMPLE_WIDTH
+
+    # Perform speech recognition (skipped when VAD found no speech at all)
+    try:
+        with metrics.stage('recognition'):
+            try:
+                if stats is not None and not stats['keptSeconds']:
+                    raise sr.UnknownValueError()
+                if chunked:
+                    text = transcribe_chunked(asr_engine, pcm)
+                elif question_context and hasattr(asr_engine, 'transcribe_in_context'):
+                    text = asr_engine.transcribe_in_context(pcm_chunks, question_context)
+                else:
+                    text = asr_engine.transcribe(pcm_chunks)
+            except sr.UnknownValueError:
+                text = None  # Not a failure of the stage
+    except sr.RequestError as e:
+        raise Exception(f"Speech recognition API error: {str(e)}")
+
+    if text is None:
+        log.info("Could not understand audio")
+        metrics.EMPTY_TRANSCRIPTS.inc()
+        text = ""
+    else:
+        text = text.strip()
+        # Separate logger so transcripts can be switched off (LOG_TRANSCRIPTS=false)
+        transcript_log.info("Recognized text", extra={'transcript': text})
+    return (text, stats) if with_stats else text
+
+
+def _started(pcm_chunks):
+    """Pull the first chunk now, so decoding happens here rather than during recognition"""
+    pcm_chunks = iter(pcm_chunks)
+    first = next(pcm_chunks, None)
+    return pcm_chunks if first is None else itertools.chain([first], pcm_chunks)
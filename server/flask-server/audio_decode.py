@@ -0,0 +1,379 @@
+import asyncio
+import io
+import logging
+import os
+import struct
+import subprocess
+import threading
+import wave
+
+import numpy as np
+
+import metrics
+
+# Recognizers expect 16kHz, mono, 16-bit PCM
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+# Size of the PCM chunks handed to recognizers (0.25s of audio)
+PCM_CHUNK_BYTES = SAMPLE_RATE * SAMPLE_WIDTH * CHANNELS // 4
+
+# Container signatures checked on the first bytes of an upload; only
+# compressed formats need FFmpeg, PCM WAV is decoded in-process
+EXTENSIONS = {'wav': '.wav', 'webm': '.webm', 'ogg': '.ogg', 'flac': '.flac', 'mp3': '.mp3', 'mp4': '.m4a'}
+
+# WAV format tags: integer PCM, IEEE float, and WAVE_FORMAT_EXTENSIBLE (whose
+# sub-format GUID starts with one of the other two)
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Decoder for compressed uploads: 'pyav' decodes in-process with libav
+# through PyAV, 'ffmpeg' spawns an FFmpeg process per upload, 'auto' uses
+# PyAV when it is installed. PyAV falls back to FFmpeg for uploads it cannot
+# decode.
+AUDIO_DECODER = os.getenv('AUDIO_DECODER', 'auto').lower()
+
+# Raised when an upload needs FFmpeg (compressed audio, or a WAV layout
+# wav_to_pcm cannot convert) and it is not installed
+FFMPEG_MISSING = "FFmpeg not configured properly - please install FFmpeg"
+
+# Raised when the decoders reject an upload (corrupt, truncated or not
+# audio at all): the client's fault, answered with 400. Errors from the ASR
+# worker pool arrive as messages, so the type is recognized by this prefix.
+UNDECODABLE_AUDIO = "Could not decode audio"
+
+log = logging.getLogger(__name__)
+
+
+class FFmpegMissing(Exception):
+    """The upload needed the ffmpeg binary and it is not installed"""
+
+    def __init__(self):
+        super().__init__(FFMPEG_MISSING)
+
+
+class UndecodableAudio(Exception):
+    """The decoders rejected the upload"""
+
+    def __init__(self, detail=None):
+        super().__init__(f"{UNDECODABLE_AUDIO}: {detail}" if detail else UNDECODABLE_AUDIO)
+
+
+def convert_to_wav(audio_path, output_wav_path):
+    """Convert an audio file on disk to a 16kHz mono WAV file with FFmpeg"""
+    try:
+        subprocess.run([
+            'ffmpeg',
+            '-i', audio_path,
+            '-ar', str(SAMPLE_RATE),  # 16kHz sample rate
+            '-ac', str(CHANNELS),     # Mono channel
+            '-y',                     # Overwrite output
+            output_wav_path
+        ], capture_output=True, text=True, check=True)
+        log.debug(f"Converted audio to WAV: {output_wav_path}")
+    except FileNotFoundError:
+        raise FFmpegMissing()
+    except subprocess.CalledProcessError as e:
+        raise UndecodableAudio(e.stderr.strip())
+    except subprocess.SubprocessError as e:
+        raise Exception(f"Audio conversion failed: {str(e.stderr) if hasattr(e, 'stderr') else str(e)}")
+
+
+# FFmpeg command decoding stdin to raw PCM on stdout
+PIPE_COMMAND = [
+    'ffmpeg',
+    '-loglevel', 'error',
+    '-i', 'pipe:0',           # Read the upload from stdin
+    '-f', 's16le',            # Raw signed 16-bit little-endian PCM
+    '-acodec', 'pcm_s16le',
+    '-ar', str(SAMPLE_RATE),
+    '-ac', str(CHANNELS),
+    'pipe:1'                  # Write samples to stdout
+]
+
+
+def decode_to_pcm(audio_bytes):
+    """Decode uploaded audio bytes to raw 16kHz mono PCM through FFmpeg pipes, without touching disk"""
+    try:
+        result = subprocess.run(PIPE_COMMAND, input=audio_bytes, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise FFmpegMissing()
+    except subprocess.CalledProcessError as e:
+        raise UndecodableAudio(e.stderr.decode(errors='replace').strip())
+    except subprocess.SubprocessError as e:
+        raise Exception(f"Audio conversion failed: {str(e)}")
+    return result.stdout
+
+
+async def decode_to_pcm_async(audio_bytes):
+    """decode_to_pcm for asyncio servers: waits on the FFmpeg process without holding a thread"""
+    try:
+        process = await asyncio.create_subprocess_exec(*PIPE_COMMAND, stdin=asyncio.subprocess.PIPE,
+                                                       stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except FileNotFoundError:
+        raise FFmpegMissing()
+    stdout, stderr = await process.communicate(audio_bytes)
+    if process.returncode != 0:
+        raise UndecodableAudio(stderr.decode(errors='replace').strip())
+    return stdout
+
+
+def sniff_format(header):
+    """Identify an upload's container from its first bytes ('unknown' if unrecognized)"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'  # EBML: WebM or Matroska
+    if header[:4] == b'OggS':
+        return 'ogg'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    if header[4:8] == b'ftyp':
+        return 'mp4'
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return 'unknown'
+
+
+def sniff_file(path):
+    """sniff_format for a file on disk"""
+    with open(path, 'rb') as f:
+        return sniff_format(f.read(12))
+
+
+def parse_wav(data):
+    """Return (format tag, channels, sample rate, bits per sample, PCM data) of a WAV file, or None"""
+    if sniff_format(data[:12]) != 'wav':
+        return None
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size, = struct.unpack_from('<I', data, offset + 4)
+        body = offset + 8
+        if chunk_id == b'fmt ' and size >= 16:
+            tag, channels, rate, _, _, bits = struct.unpack_from('<HHIIHH', data, body)
+            if tag == WAVE_FORMAT_EXTENSIBLE and size >= 40:
+                tag, = struct.unpack_from('<H', data, body + 24)
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b'data' and fmt is not None:
+            # Streaming recorders leave the size at 0 or 0xFFFFFFFF; never read past the upload
+            end = len(data) if size in (0, 0xFFFFFFFF) else min(body + size, len(data))
+            return fmt + (memoryview(data)[body:end],)
+        offset = body + size + (size & 1)  # Chunks are padded to even sizes
+    return None
+
+
+def _samples(tag, channels, bits, pcm):
+    """Decode interleaved PCM to float32 frames in [-1, 1], shape (frames, channels)"""
+    width = bits // 8
+    pcm = pcm[:len(pcm) - len(pcm) % (width * channels)]
+    if tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        samples = np.frombuffer(pcm, dtype=f'<f{width}').astype(np.float32)
+    elif tag != WAVE_FORMAT_PCM:
+        return None
+    elif bits == 8:
+        samples = (np.frombuffer(pcm, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif bits == 16:
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32) / 32768
+    elif bits == 24:
+        raw = np.frombuffer(pcm, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16) << 8 >> 8).astype(np.float32) / 8388608
+    elif bits == 32:
+        samples = np.frombuffer(pcm, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        return None
+    return samples.reshape(-1, channels)
+
+
+def resample(samples, rate, target_rate=SAMPLE_RATE):
+    """Band-limited resampling of a float signal by truncating or zero-padding its spectrum"""
+    if rate == target_rate or not len(samples):
+        return samples
+    count = int(round(len(samples) * target_rate / rate))
+    spectrum = np.fft.rfft(samples)
+    # irfft zero-pads when upsampling and drops the bins above the new Nyquist when downsampling
+    return np.fft.irfft(spectrum, count).astype(np.float32) * (count / len(samples))
+
+
+def wav_to_pcm(data):
+    """Convert an uncompressed WAV upload to 16kHz mono 16-bit PCM without FFmpeg.
+
+    Uploads already in that layout are passed through untouched; other mono
+    or stereo PCM and float layouts are downmixed and resampled with NumPy.
+    Returns None for anything that needs FFmpeg (compressed containers,
+    µ-law, ADPCM, surround...).
+    """
+    parsed = parse_wav(data)
+    if parsed is None:
+        return None
+    tag, channels, rate, bits, pcm = parsed
+    if channels not in (1, 2) or not rate:
+        return None  # Surround layouts need FFmpeg's channel-aware downmix
+    if (tag, channels, rate, bits) == (WAVE_FORMAT_PCM, CHANNELS, SAMPLE_RATE, SAMPLE_WIDTH * 8):
+        metrics.AUDIO_DECODES.inc('passthrough')
+        return bytes(pcm[:len(pcm) - len(pcm) % SAMPLE_WIDTH])
+    samples = _samples(tag, channels, bits, pcm)
+    if samples is None:
+        return None
+    mono = samples.mean(axis=1) if channels > 1 else samples[:, 0]
+    mono = resample(mono, rate)
+    metrics.AUDIO_DECODES.inc('numpy')
+    return (mono * 32768).round().clip(-32768, 32767).astype('<i2').tobytes()
+
+
+class FFmpegDecoder:
+    """One FFmpeg process per upload, through pipes or a temporary WAV file"""
+
+    name = 'ffmpeg'
+
+    def decode(self, audio_bytes):
+        return decode_to_pcm(audio_bytes)
+
+    def decode_file(self, audio_path, output_wav_path, chunk_bytes=PCM_CHUNK_BYTES):
+        convert_to_wav(audio_path, output_wav_path)
+        return iter_wav_chunks(output_wav_path, chunk_bytes)
+
+
+class PyAVDecoder:
+    """In-process decoding and resampling with libav (PyAV), no process per upload"""
+
+    name = 'pyav'
+
+    def __init__(self):
+        import av
+
+        self._av = av
+        self.fallback = FFmpegDecoder()
+
+    def decode(self, audio_bytes):
+        return self._decode_or_fallback(io.BytesIO(audio_bytes), lambda: self.fallback.decode(audio_bytes))
+
+    def decode_file(self, audio_path, output_wav_path, chunk_bytes=PCM_CHUNK_BYTES):
+        pcm = self._decode_or_fallback(audio_path, lambda: b''.join(
+            self.fallback.decode_file(audio_path, output_wav_path, chunk_bytes)))
+        return iter_bytes_chunks(pcm, chunk_bytes)
+
+    def _decode_or_fallback(self, source, fallback):
+        try:
+            return self._decode(source)
+        except Exception as e:
+            log.warning(f"PyAV could not decode the upload, falling back to FFmpeg: {str(e)}")
+            metrics.AUDIO_DECODES.inc('ffmpeg_fallback')
+            try:
+                return fallback()
+            except FFmpegMissing:
+                # FFmpeg was only a second opinion; PyAV's rejection stands
+                raise UndecodableAudio(str(e))
+
+    def _decode(self, source):
+        with self._av.open(source, mode='r') as container:
+            if not container.streams.audio:
+                raise Exception("no audio stream")
+            stream = container.streams.audio[0]
+            # Same conversion as `ffmpeg -ar 16000 -ac 1 -f s16le` (libswresample)
+            resampler = self._av.AudioResampler(format='s16', layout='mono', rate=SAMPLE_RATE)
+            parts = []
+            for frame in container.decode(stream):
+                parts.extend(out.to_ndarray().tobytes() for out in resampler.resample(frame))
+            parts.extend(out.to_ndarray().tobytes() for out in resampler.resample(None))
+        return b''.join(parts)
+
+
+DECODERS = {
+    'ffmpeg': FFmpegDecoder,
+    'pyav': PyAVDecoder,
+}
+
+_decoders = {}
+_decoders_lock = threading.Lock()
+
+
+def get_decoder(name=None):
+    """Return the process-wide decoder backend ('auto' picks PyAV when installed)"""
+    name = (name or AUDIO_DECODER).lower()
+    decoder = _decoders.get(name)
+    if decoder is None:
+        with _decoders_lock:
+            decoder = _decoders.get(name)
+            if decoder is None:
+                if name == 'auto':
+                    try:
+                        decoder = PyAVDecoder()
+                    except ImportError:
+                        decoder = FFmpegDecoder()
+                elif name in DECODERS:
+                    decoder = DECODERS[name]()
+                else:
+                    raise Exception(f"Unknown audio decoder: {name}")
+                log.info(f"Audio decoder: {decoder.name}")
+                _decoders[name] = decoder
+    return decoder
+
+
+def load_pcm(audio_bytes):
+    """Decode an upload to 16kHz mono PCM, in-process for WAV and with the decoder backend otherwise"""
+    pcm = wav_to_pcm(audio_bytes)
+    if pcm is not None:
+        return pcm
+    decoder = get_decoder()
+    log.debug(f"Decoding {sniff_format(audio_bytes[:12])} upload with {decoder.name}")
+    metrics.AUDIO_DECODES.inc(decoder.name)
+    return decoder.decode(audio_bytes)
+
+
+async def load_pcm_async(audio_bytes):
+    """load_pcm for asyncio servers: CPU-bound decoding runs in the default executor, FFmpeg as an asyncio subprocess"""
+    if sniff_format(audio_bytes[:12]) == 'wav':
+        pcm = await asyncio.to_thread(wav_to_pcm, audio_bytes)
+        if pcm is not None:
+            return pcm
+    decoder = get_decoder()
+    metrics.AUDIO_DECODES.inc(decoder.name)
+    if decoder.name == 'ffmpeg':
+        return await decode_to_pcm_async(audio_bytes)
+    return await asyncio.to_thread(decoder.decode, audio_bytes)
+
+
+def iter_bytes_chunks(pcm, chunk_bytes=PCM_CHUNK_BYTES):
+    """Yield in-memory PCM in fixed-size chunks"""
+    pcm = memoryview(pcm)
+    for offset in range(0, len(pcm), chunk_bytes):
+        yield bytes(pcm[offset:offset + chunk_bytes])
+
+
+def iter_wav_chunks(wav_path, chunk_bytes=PCM_CHUNK_BYTES):
+    """Yield the PCM frames of a WAV file in fixed-size chunks"""
+    with wave.open(wav_path, 'rb') as wav:
+        frames_per_chunk = max(1, chunk_bytes // (wav.getsampwidth() * wav.getnchannels()))
+        while True:
+            data = wav.readframes(frames_per_chunk)
+            if not data:
+                break
+            yield data
+
+
+def iter_pcm_chunks(audio, output_wav_path=None, chunk_bytes=PCM_CHUNK_BYTES):
+    """Yield 16kHz mono PCM for an upload in fixed-size chunks.
+
+    `audio` is either a path on disk, converted through the temporary WAV file
+    at `output_wav_path` (FFmpeg decoder only), or the raw upload bytes,
+    decoded entirely in memory. WAV uploads skip the decoder either way (see
+    wav_to_pcm).
+    """
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        yield from iter_bytes_chunks(load_pcm(bytes(audio)), chunk_bytes)
+        return
+
+    if sniff_file(audio) == 'wav':
+        with open(audio, 'rb') as f:
+            pcm = wav_to_pcm(f.read())
+        if pcm is not None:
+            yield from iter_bytes_chunks(pcm, chunk_bytes)
+            return
+
+    decoder = get_decoder()
+    metrics.AUDIO_DECODES.inc(decoder.name)
+    yield from decoder.decode_file(audio, output_wav_path, chunk_bytes)
@@ -0,0 +1,212 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zipfile
+
+# Bulk uploads for /process-speech/batch
+#
+# A batch is either several `audio` parts of one multipart request or a zip
+# archive with a manifest (manifest.json or manifest.csv) listing
+# file/candidateId/questionContext. Items run concurrently on a shared
+# executor; results are handed back in completion order so the endpoint can
+# stream them as NDJSON. Once every item has finished, the processed ones are
+# passed to on_complete together (e.g. one grouped Node forward), even if
+# the client stopped reading the stream.
+#
+# Limits are enforced before anything is read: the item count of both kinds
+# of upload, and for archives the manifest size and each entry's uncompressed
+# size (alone and summed) as recorded in the zip directory, so a small zip
+# that inflates to gigabytes is refused without being extracted.
+
+MANIFEST_NAMES = ('manifest.json', 'manifest.csv')
+MAX_MANIFEST_BYTES = 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+
+class BatchError(Exception):
+    """Raised for a batch request that cannot be processed at all"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _item(index, name, audio, candidate_id, question_context):
+    return {
+        'index': index,
+        'file': name,
+        'audio': audio,
+        'candidateId': candidate_id,
+        'questionContext': question_context or ''
+    }
+
+
+def _read_manifest(text, name):
+    if name.endswith('.csv'):
+        return list(csv.DictReader(io.StringIO(text)))
+    entries = json.loads(text)
+    if isinstance(entries, dict):
+        entries = entries.get('items', [])
+    return entries
+
+
+def items_from_form(files, form, max_items):
+    """Build batch items from multipart `audio` parts
+
+    Per-file metadata comes from a `manifest` field (JSON list of
+    {file, candidateId, questionContext}) matched by filename, otherwise from
+    repeated candidateId/questionContext fields in file order, falling back to
+    a single value shared by all files.
+    """
+    uploads = files.getlist('audio')
+    if len(uploads) > max_items:
+        raise BatchError(f"Batch exceeds {max_items} items", 413)
+    candidate_ids = form.getlist('candidateId')
+    contexts = form.getlist('questionContext')
+
+    by_name = {}
+    if form.get('manifest'):
+        try:
+            by_name = {entry.get('file'): entry for entry in _read_manifest(form['manifest'], 'manifest.json')}
+        except (ValueError, AttributeError):
+            raise BatchError('Invalid manifest')
+
+    items = []
+    for index, upload in enumerate(uploads):
+        name = upload.filename or f"blob{index}"
+        entry = by_name.get(name)
+        if entry is not None:
+            candidate_id, question_context = entry.get('candidateId'), entry.get('questionContext')
+        else:
+            candidate_id = candidate_ids[index] if index < len(candidate_ids) else (
+                candidate_ids[0] if len(candidate_ids) == 1 else None)
+            question_context = contexts[index] if index < len(contexts) else (
+                contexts[0] if len(contexts) == 1 else '')
+        items.append(_item(index, name, upload.read(), candidate_id, question_context))
+    return items
+
+
+def items_from_archive(data, max_items, max_bytes, max_file_bytes):
+    """Build batch items from a zip archive containing a manifest
+
+    Refused with a 413 BatchError when the manifest lists more than max_items
+    files, any listed file inflates past max_file_bytes or all of them past
+    max_bytes.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile:
+        raise BatchError('Archive is not a valid zip file')
+
+    with archive:
+        names = {os.path.basename(info.filename): info for info in archive.infolist() if not info.is_dir()}
+        manifest_name = next((name for name in MANIFEST_NAMES if name in names), None)
+        if manifest_name is None:
+            raise BatchError('Archive has no manifest.json or manifest.csv')
+        if names[manifest_name].file_size > MAX_MANIFEST_BYTES:
+            raise BatchError(f"Manifest exceeds {MAX_MANIFEST_BYTES} bytes", 413)
+        try:
+            entries = _read_manifest(archive.read(names[manifest_name]).decode('utf-8'), manifest_name)
+        except (ValueError, UnicodeDecodeError):
+            raise BatchError('Invalid manifest')
+
+        try:
+            infos = [names.get(os.path.basename(entry.get('file') or '')) for entry in entries]
+        except AttributeError:
+            raise BatchError('Invalid manifest')
+        if len(infos) > max_items:
+            raise BatchError(f"Batch exceeds {max_items} items", 413)
+        # Checked before extracting anything, against the sizes in the zip directory
+        if any(info.file_size > max_file_bytes for info in infos if info is not None):
+            raise BatchError(f"Archive file exceeds {max_file_bytes} bytes", 413)
+        if sum(info.file_size for info in infos if info is not None) > max_bytes:
+            raise BatchError(f"Archive audio exceeds {max_bytes} bytes", 413)
+
+        items = []
+        for index, (entry, info) in enumerate(zip(entries, infos)):
+            name = entry.get('file') or ''
+            audio = archive.read(info) if info is not None else None
+            items.append(_item(index, name, audio, entry.get('candidateId'), entry.get('questionContext')))
+        return items
+
+
+class BatchRun:
+    """One batch of uploads processed concurrently on a shared executor"""
+
+    def __init__(self, items, process, executor, on_complete=None):
+        self.id = uuid.uuid4().hex
+        self.items = items
+        self._process = process
+        self._executor = executor
+        self._on_complete = on_complete
+        self._results = []
+        self._remaining = len(items)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self.started_at = time.monotonic()
+
+    def start(self):
+        if not self.items:
+            self._finish()
+        for item in self.items:
+            self._executor.submit(self._run, item)
+        return self
+
+    def _run(self, item):
+        line = {'index': item['index'], 'file': item['file'], 'candidateId': item['candidateId']}
+        try:
+            if not item['candidateId']:
+                raise Exception('No candidate ID provided')
+            if item['audio'] is None:
+                raise Exception('File not found in archive')
+            result = self._process(item)
+            line.update(result)
+        except Exception as e:
+            log.warning(f"Batch {self.id} item {item['index']} failed: {str(e)}")
+            line.update({'status': 'failed', 'error': f"Processing failed: {str(e)}"})
+        finally:
+            item['audio'] = None  # Release the upload as soon as it is done
+
+        with self._ready:
+            self._results.append(line)
+            self._remaining -= 1
+            finished = self._remaining == 0
+            self._ready.notify_all()
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        if self._on_complete is not None:
+            try:
+                self._on_complete([line for line in self._results if line.get('status') == 'processed'])
+            except Exception as e:
+                log.error(f"Batch {self.id} completion handler failed: {str(e)}")
+
+    def results(self):
+        """Yield result lines as items finish, in completion order"""
+        sent = 0
+        while sent < len(self.items):
+            with self._ready:
+                while sent == len(self._results):
+                    self._ready.wait()
+                lines = self._results[sent:]
+            sent += len(lines)
+            yield from lines
+
+    def summary(self):
+        with self._lock:
+            failed = sum(1 for line in self._results if line.get('status') != 'processed')
+            return {
+                'batchId': self.id,
+                'status': 'complete' if self._remaining == 0 else 'running',
+                'total': len(self.items),
+                'processed': len(self._results) - failed,
+                'failed': failed,
+                'elapsed': round(time.monotonic() - self.started_at, 3)
+            }
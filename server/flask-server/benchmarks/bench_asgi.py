@@ -0,0 +1,213 @@
+"""Flask vs ASGI: concurrency and memory per connection.
+
+Starts each server in its own process: the Flask app under gunicorn with
+one gthread worker of --threads threads (the production profile; a request
+holds a thread from start to end) and asgi_app on uvicorn with one event
+loop and --threads recognition threads (a request only holds a thread while
+it is being recognized). Both use node_stub as the Node.js server and a
+recognizer that takes --rtf seconds per audio second; the transcript cache
+is off. /process-speech uploads are corpus fixtures in --format, so WebM
+uploads are decoded through FFmpeg (AUDIO_DECODER=ffmpeg unless --decoder):
+a blocking subprocess call in Flask, an asyncio subprocess in ASGI.
+
+For every --concurrency step, that many clients (asyncio + httpx, one
+connection each) send requests back to back for --duration seconds. The
+table shows throughput and latency, and the peak RSS and thread count of
+the server's process tree (including gunicorn's master and FFmpeg processes)
+sampled from /proc during the step; memory per connection is the peak RSS
+above the idle RSS divided by the number of connections.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_asgi [--concurrency 1,16,64,256] [--duration 10] [--rtf 0.1]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.corpus import generate, write_fixtures
+
+
+def serve(args):
+    """Child process: start one server with the simulated recognizer"""
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    import asr
+    from benchmarks.bench_chunked import SimulatedEngine
+    asr.ENGINES[asr.ASR_ENGINE] = lambda: SimulatedEngine(args.rtf)
+    asr._engines.pop(asr.ASR_ENGINE, None)
+
+    if args.serve == 'flask':
+        from gunicorn.app.base import BaseApplication
+        import app
+
+        class Server(BaseApplication):
+            def load_config(self):
+                for key, value in {'bind': f"127.0.0.1:{args.port}", 'workers': 1, 'worker_class': 'gthread',
+                                   'threads': args.threads, 'backlog': 4096, 'keepalive': 60,
+                                   'loglevel': 'critical'}.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return app.app
+
+        Server().run()
+    else:
+        import uvicorn
+        import asgi_app
+        uvicorn.run(asgi_app.app, host='127.0.0.1', port=args.port, log_level='critical',
+                    backlog=4096, timeout_keep_alive=60)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def proc_status(pid):
+    """(RSS in MB, threads) of a process and all its descendants (gunicorn worker, FFmpeg)"""
+    rss, threads = 0.0, 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) / 1024
+                elif line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (FileNotFoundError, ProcessLookupError):
+        return 0.0, 0  # Exited while being sampled
+    for child in children:
+        child_rss, child_threads = proc_status(child)
+        rss, threads = rss + child_rss, threads + child_threads
+    return rss, threads
+
+
+async def run_step(url, uploads, concurrency, duration, pid):
+    import httpx
+
+    latencies, statuses = [], {}
+    peak = [0.0, 0]
+    deadline = time.perf_counter() + duration
+
+    async def client(index):
+        limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+        async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as http:
+            sent = index
+            while time.perf_counter() < deadline:
+                record, filename, audio = uploads[sent % len(uploads)]
+                sent += concurrency
+                start = time.perf_counter()
+                try:
+                    response = await http.post('/process-speech', files={'audio': (filename, audio)}, data={
+                        'candidateId': record['id'], 'questionContext': record['questionContext']})
+                    outcome = response.status_code
+                except httpx.HTTPError as e:
+                    outcome = type(e).__name__
+                latencies.append(time.perf_counter() - start)
+                statuses[outcome] = statuses.get(outcome, 0) + 1
+
+    async def sample():
+        while time.perf_counter() < deadline:
+            rss, threads = proc_status(pid)
+            peak[0], peak[1] = max(peak[0], rss), max(peak[1], threads)
+            await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(sample(), *(client(index) for index in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - start, peak
+
+
+def wait_ready(url, process, timeout=120):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"Server exited with {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise Exception("Server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,16,64,256', help='comma-separated connection counts')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per step')
+    parser.add_argument('--rtf', type=float, default=0.1, help='real-time factor of the simulated recognizer')
+    parser.add_argument('--format', default='webm', help='corpus fixture format of the uploads')
+    parser.add_argument('--decoder', default='ffmpeg', help='AUDIO_DECODER for both servers')
+    parser.add_argument('--count', type=int, default=20, help='answers to generate')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='gunicorn threads (Flask) and recognition threads (ASGI)')
+    parser.add_argument('--servers', default='flask,asgi')
+    parser.add_argument('--serve', choices=['flask', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args)
+
+    from node_stub import NodeStub
+
+    fixture_dir = tempfile.mkdtemp(prefix='speech-fixtures-')
+    spool_dir = tempfile.mkdtemp()
+    stub = NodeStub(port=0).start()
+    try:
+        records = write_fixtures(generate(args.count), fixture_dir, [args.format])
+        uploads = []
+        for record in records:
+            with open(os.path.join(fixture_dir, record['audio'][args.format]), 'rb') as f:
+                uploads.append((record, record['audio'][args.format], f.read()))
+
+        env = dict(os.environ, NODE_URL=stub.url, NODE_SPOOL_PATH=os.path.join(spool_dir, 'spool.jsonl'),
+                   TRANSCRIPT_CACHE_MB='0', AUDIO_DECODER=args.decoder, TTS_PRERENDER='false',
+                   ASGI_RECOGNITION_WORKERS=str(args.threads))
+        print(f"{args.format} uploads, {args.decoder} decoder, recognizer rtf {args.rtf}, {args.threads} threads, "
+              f"{args.duration:g}s per step")
+        print(f"{'server':<6} {'conns':>6} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} "
+              f"{'RSS MB':>8} {'threads':>8} {'KB/conn':>8}")
+        for server in args.servers.split(','):
+            port = free_port()
+            process = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_asgi', '--serve', server,
+                                        '--port', str(port), '--rtf', str(args.rtf),
+                                        '--threads', str(args.threads)], env=env)
+            url = f"http://127.0.0.1:{port}"
+            try:
+                wait_ready(url, process)
+                # One request first, so lazily loaded code is part of the idle RSS
+                asyncio.run(run_step(url, uploads[:1], 1, 0.5, process.pid))
+                idle_rss, _ = proc_status(process.pid)
+                for concurrency in [int(value) for value in args.concurrency.split(',')]:
+                    latencies, statuses, elapsed, (rss, threads) = asyncio.run(
+                        run_step(url, uploads, concurrency, args.duration, process.pid))
+                    ms = np.array(latencies) * 1000
+                    errors = sum(count for outcome, count in statuses.items() if outcome != 200)
+                    print(f"{server:<6} {concurrency:>6} {len(latencies) / elapsed:>8.1f} "
+                          f"{np.percentile(ms, 50):>9.1f} {np.percentile(ms, 99):>9.1f} "
+                          f"{errors / len(latencies):>7.1%} {rss:>8.1f} {threads:>8} "
+                          f"{(rss - idle_rss) * 1024 / concurrency:>8.1f}")
+            finally:
+                process.terminate()
+                process.wait()
+    finally:
+        stub.stop()
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Throughput scaling of the recognition worker pool from 1 to N processes.
+
+Each step starts a WorkerPool with the given number of workers, fires
+--requests uploads at it from twice as many client threads as workers, and
+reports requests/sec and scaling relative to one worker.
+
+--task decode times FFmpeg decoding only; --task transcribe runs the full
+decode + recognition path with --engine (use vosk for an offline,
+CPU-bound measurement).
+
+Run from server/flask-server:
+    python -m benchmarks.bench_asr_pool [--input answer.webm] [--task transcribe --engine vosk]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from asr import load_engine, transcribe_audio
+from audio_decode import decode_to_pcm
+from process_pool import WorkerPool
+from benchmarks.bench_audio_pipeline import make_fixture
+
+
+def decode_task(audio_bytes):
+    return len(decode_to_pcm(audio_bytes))
+
+
+def transcribe_task(audio_bytes, engine):
+    return transcribe_audio(audio_bytes, None, engine)
+
+
+def measure(workers, task, args, requests, engine):
+    pool = WorkerPool(workers=workers, max_pending=requests, timeout=600,
+                      initializer=load_engine if task is transcribe_task else None,
+                      initargs=(engine,))
+    pool.start()
+    # Warm every worker before timing
+    warm = [threading.Thread(target=pool.run, args=(task, *args)) for _ in range(workers)]
+    [t.start() for t in warm]
+    [t.join() for t in warm]
+
+    remaining = [requests]
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            pool.run(task, *args)
+
+    clients = [threading.Thread(target=client) for _ in range(workers * 2)]
+    start = time.perf_counter()
+    [t.start() for t in clients]
+    [t.join() for t in clients]
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='audio file to replay (default: generated WebM/Opus clip)')
+    parser.add_argument('--task', choices=['decode', 'transcribe'], default='decode')
+    parser.add_argument('--engine', default='vosk')
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        input_path = args.input
+        if input_path is None:
+            input_path = os.path.join(fixture_dir, 'answer.webm')
+            make_fixture(input_path, 5)
+        with open(input_path, 'rb') as f:
+            audio_bytes = f.read()
+
+    if args.task == 'decode':
+        task, task_args = decode_task, (audio_bytes,)
+    else:
+        task, task_args = transcribe_task, (audio_bytes, args.engine)
+
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print(f"Task: {args.task}, {args.requests} requests per step, {os.cpu_count()} cores")
+    baseline = None
+    for workers in counts:
+        rate = measure(workers, task, task_args, args.requests, args.engine)
+        baseline = baseline or rate
+        print(f"{workers:>3} workers: {rate:8.2f} req/s  speedup {rate / baseline:5.2f}x  "
+              f"efficiency {rate / baseline / workers:6.1%}")
+
+
+if __name__ == '__main__':
+    main()
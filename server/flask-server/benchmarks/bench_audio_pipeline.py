@@ -0,0 +1,99 @@
+"""Compare the tempfile and pipe audio pipelines.
+
+Times the server-side work /process-speech does before recognition (save the
+upload, FFmpeg conversion, loading 16kHz mono PCM) and reports the I/O
+performed per request from /proc/self/io, which on Linux includes reaped
+FFmpeg children.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_audio_pipeline [--input answer.webm] [--requests 50]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+from audio_decode import iter_pcm_chunks
+
+IO_FIELDS = ('syscr', 'syscw', 'rchar', 'wchar', 'write_bytes')
+
+
+def read_proc_io():
+    """Return /proc/self/io counters, or None where unavailable"""
+    try:
+        with open('/proc/self/io') as f:
+            return {key: int(value) for key, value in (line.split(': ') for line in f)}
+    except OSError:
+        return None
+
+
+def make_fixture(path, seconds):
+    """Render a WebM/Opus clip like the ones VoiceAgent.jsx records"""
+    subprocess.run([
+        'ffmpeg', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:a', 'libopus', '-y', path
+    ], check=True)
+
+
+def tempfile_request(audio_bytes, request_id):
+    temp_dir = tempfile.gettempdir()
+    input_path = os.path.join(temp_dir, f"input_bench{request_id}.webm")
+    wav_path = os.path.join(temp_dir, f"output_bench{request_id}.wav")
+    try:
+        with open(input_path, 'wb') as f:
+            f.write(audio_bytes)
+        return b''.join(iter_pcm_chunks(input_path, wav_path))
+    finally:
+        for path in [input_path, wav_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def pipe_request(audio_bytes, request_id):
+    return b''.join(iter_pcm_chunks(audio_bytes))
+
+
+def run(mode, request_fn, audio_bytes, requests):
+    latencies = []
+    before = read_proc_io()
+    for i in range(requests):
+        start = time.perf_counter()
+        request_fn(audio_bytes, i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    after = read_proc_io()
+
+    print(f"{mode:>9}: median {statistics.median(latencies):7.2f} ms  "
+          f"mean {statistics.mean(latencies):7.2f} ms  max {max(latencies):7.2f} ms")
+    if before and after:
+        per_request = {key: (after[key] - before[key]) / requests for key in IO_FIELDS}
+        print(' ' * 11 + '  '.join(f"{key} {value:,.0f}" for key, value in per_request.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='audio file to replay (default: generated WebM/Opus clip)')
+    parser.add_argument('--seconds', type=float, default=5.0, help='length of the generated clip')
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        input_path = args.input
+        if input_path is None:
+            input_path = os.path.join(fixture_dir, 'answer.webm')
+            make_fixture(input_path, args.seconds)
+        with open(input_path, 'rb') as f:
+            audio_bytes = f.read()
+
+        print(f"Input: {input_path} ({len(audio_bytes):,} bytes), {args.requests} requests per mode")
+        print("Per request, tempfile mode also creates 2 files and unlinks 2; pipe mode touches none.")
+        # Warm up the page cache and FFmpeg binary
+        pipe_request(audio_bytes, 0)
+        run('tempfile', tempfile_request, audio_bytes, args.requests)
+        run('pipe', pipe_request, audio_bytes, args.requests)
+
+
+if __name__ == '__main__':
+    main()
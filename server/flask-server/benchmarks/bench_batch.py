@@ -0,0 +1,97 @@
+"""Throughput of /process-speech/batch vs looping over /process-speech.
+
+Both modes go through the Flask app in-process (test client) with a stub
+Node.js server, so the numbers cover upload handling, decoding, recognition,
+entity extraction and Node forwarding, and the stub counts how many Node
+requests each mode makes. The transcript cache is disabled so every item is
+decoded and recognized.
+
+--engine decode-only (default) replaces recognition with a no-op so the
+benchmark runs offline; use --engine vosk for a CPU-bound recognizer.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_batch [--files 32] [--workers 4] [--engine vosk]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.bench_audio_pipeline import make_fixture
+
+
+class DecodeOnlyEngine:
+    """Consumes the decoded PCM without recognizing it"""
+    name = 'decode-only'
+    model_id = 'decode-only'
+
+    def transcribe(self, pcm_chunks):
+        size = sum(len(chunk) for chunk in pcm_chunks)
+        return f"I am interested and my notice period is {size % 90} days"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='audio file to replay (default: generated WebM/Opus clip)')
+    parser.add_argument('--files', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=4, help='BATCH_WORKERS')
+    parser.add_argument('--engine', default='decode-only')
+    parser.add_argument('--node-latency', type=float, default=0.02, help='seconds per stub Node request')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    os.environ.update({
+        'ASR_ENGINE': args.engine,
+        'BATCH_WORKERS': str(args.workers),
+        'TRANSCRIPT_CACHE_MB': '0',
+        'NODE_SPOOL_PATH': os.path.join(work_dir, 'spool.jsonl'),
+    })
+    import asr
+    asr.ENGINES['decode-only'] = DecodeOnlyEngine
+    from node_stub import NodeStub
+    stub = NodeStub(port=0, latency=args.node_latency).start()
+    os.environ['NODE_URL'] = stub.url
+    import app
+
+    input_path = args.input
+    if input_path is None:
+        input_path = os.path.join(work_dir, 'answer.webm')
+        make_fixture(input_path, 5)
+    with open(input_path, 'rb') as f:
+        audio_bytes = f.read()
+
+    client = app.app.test_client()
+    fields = {'questionContext': 'interest'}
+
+    def loop():
+        for i in range(args.files):
+            response = client.post('/process-speech', data=dict(
+                fields, candidateId=f"cand{i}", audio=(io.BytesIO(audio_bytes), 'answer.webm')))
+            assert response.status_code == 200, response.json
+
+    def batch():
+        response = client.post('/process-speech/batch', data=dict(
+            fields, candidateId=[f"cand{i}" for i in range(args.files)],
+            audio=[(io.BytesIO(audio_bytes), f"answer{i}.webm") for i in range(args.files)]))
+        summary = response.get_data(as_text=True).splitlines()[-1]
+        assert '"failed": 0' in summary, summary
+
+    print(f"{args.files} files of {len(audio_bytes):,} bytes, engine {args.engine}, "
+          f"{args.workers} batch workers, {os.cpu_count()} cores")
+    baseline = None
+    for label, func in [('single-file loop', loop), ('batch', batch)]:
+        before = stub.stats()['requests']
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        app.node_forwarder.flush(60)
+        node_requests = stub.stats()['requests'] - before
+        rate = args.files / elapsed
+        baseline = baseline or rate
+        print(f"{label:>16}: {rate:8.2f} files/s  ({rate / baseline:4.2f}x)  {node_requests} Node request(s)")
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Latency of /process-speech recognition and extraction on cache misses vs hits.
+
+A miss decodes the upload with FFmpeg and runs --engine on it (or decoding
+only with --engine none, for machines without a usable model or network).
+Hits are measured from the memory tier and from the disk tier (a fresh
+cache reading the same directory, as after a restart). Entity extraction is
+timed uncached and memoized.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_cache [--input answer.webm] [--engine vosk]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from asr import engine_identity, transcribe_audio
+from audio_decode import decode_to_pcm
+from entity_engine import extract_entities
+from speech_cache import TranscriptCache, EntityMemo
+from benchmarks.bench_audio_pipeline import make_fixture
+
+TRANSCRIPT = "I am currently earning 12 lakhs and expecting 18 lakhs, my notice period is 30 days"
+CONTEXT = "full conversation"
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='audio file to replay (default: generated WebM/Opus clip)')
+    parser.add_argument('--engine', default='none', help="ASR engine for misses, or 'none' to decode only")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = args.input
+        if input_path is None:
+            input_path = os.path.join(work_dir, 'answer.webm')
+            make_fixture(input_path, 5)
+        with open(input_path, 'rb') as f:
+            audio_bytes = f.read()
+
+        if args.engine == 'none':
+            model_id = 'decode-only'
+            recognize = lambda: str(len(decode_to_pcm(audio_bytes)))
+        else:
+            model_id = engine_identity(args.engine)
+            recognize = lambda: transcribe_audio(audio_bytes, None, args.engine)
+
+        disk_dir = os.path.join(work_dir, 'cache')
+
+        def miss():
+            # A new, empty memory tier per call; no disk tier
+            TranscriptCache().get_or_compute(audio_bytes, model_id, recognize)
+
+        warm = TranscriptCache(disk_dir=disk_dir)
+        warm.get_or_compute(audio_bytes, model_id, recognize)
+        memory_hit = lambda: warm.get_or_compute(audio_bytes, model_id, recognize)
+        disk_hit = lambda: TranscriptCache(disk_dir=disk_dir).get_or_compute(audio_bytes, model_id, recognize)
+
+        memo = EntityMemo()
+        memo(TRANSCRIPT, CONTEXT)
+
+        print(f"Input: {len(audio_bytes)} bytes, model: {model_id}, median of {args.repeat}")
+        miss_ms = timed(miss, max(3, args.repeat // 4))
+        for label, ms in [
+            ('transcript miss', miss_ms),
+            ('transcript memory hit', timed(memory_hit, args.repeat)),
+            ('transcript disk hit', timed(disk_hit, args.repeat)),
+        ]:
+            print(f"{label:<24} {ms:10.3f} ms  ({miss_ms / ms:8.0f}x vs miss)")
+        print(f"{'entities uncached':<24} {timed(lambda: extract_entities(TRANSCRIPT, CONTEXT), 1000) * 1000:10.1f} us")
+        print(f"{'entities memoized':<24} {timed(lambda: memo(TRANSCRIPT, CONTEXT), 1000) * 1000:10.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Wall-clock recognition latency vs recording length, serial vs parallel chunks.
+
+Builds recordings of each --lengths duration (an --input speech recording
+repeated with short pauses, or synthetic speech) and recognizes each one in
+a single pass and with chunked_asr.transcribe_chunked.
+
+--engine simulated stands in for a recognizer that takes --rtf seconds per
+audio second without holding the GIL (like a network call or Kaldi), so the
+benchmark runs offline; use --engine vosk or google for real numbers.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_chunked [--engine vosk --input answer.wav] [--lengths 30,60,120,300]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from asr import get_engine
+from audio_decode import SAMPLE_RATE, SAMPLE_WIDTH, decode_to_pcm, iter_bytes_chunks
+from chunked_asr import CHUNK_MAX_SECONDS, transcribe_chunked
+from benchmarks.bench_vad import synthetic_speech
+
+
+class SimulatedEngine:
+    """Sleeps for rtf x audio length and reports how much audio it received"""
+    name = 'simulated'
+    model_id = 'simulated'
+
+    def __init__(self, rtf):
+        self.rtf = rtf
+
+    def transcribe(self, pcm_chunks):
+        seconds = sum(len(chunk) for chunk in pcm_chunks) / (SAMPLE_RATE * SAMPLE_WIDTH)
+        time.sleep(seconds * self.rtf)
+        return f"{seconds:.0f}s"
+
+
+def build(speech, seconds, rng):
+    pause = rng.normal(0, 40, SAMPLE_RATE // 2).astype('<i2')
+    unit = np.concatenate([speech, pause])
+    repeats = -(-int(seconds * SAMPLE_RATE) // len(unit))
+    return np.tile(unit, repeats)[:int(seconds * SAMPLE_RATE)].tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', help='speech recording to repeat (default: synthetic)')
+    parser.add_argument('--engine', default='simulated')
+    parser.add_argument('--rtf', type=float, default=0.3, help='real-time factor of the simulated engine')
+    parser.add_argument('--lengths', default='30,60,120,300', help='recording lengths in seconds')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-seconds', type=float, default=CHUNK_MAX_SECONDS)
+    args = parser.parse_args()
+
+    engine = SimulatedEngine(args.rtf) if args.engine == 'simulated' else get_engine(args.engine)
+    if args.input:
+        with open(args.input, 'rb') as f:
+            speech = np.frombuffer(decode_to_pcm(f.read()), dtype='<i2')
+    else:
+        speech = synthetic_speech(4.0)
+
+    rng = np.random.default_rng(0)
+    print(f"Engine {engine.model_id}, {args.workers} workers, segments up to {args.max_seconds:g}s")
+    print(f"{'length s':>9} {'serial s':>9} {'parallel s':>11} {'speedup':>8} {'words serial/parallel':>22}")
+    for seconds in [float(value) for value in args.lengths.split(',')]:
+        pcm = build(speech, seconds, rng)
+
+        start = time.perf_counter()
+        serial_text = engine.transcribe(iter_bytes_chunks(pcm))
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parallel_text = transcribe_chunked(engine, pcm, workers=args.workers, max_seconds=args.max_seconds)
+        parallel = time.perf_counter() - start
+
+        print(f"{seconds:>9g} {serial:>9.2f} {parallel:>11.2f} {serial / parallel:>7.2f}x "
+              f"{len(serial_text.split()):>10}/{len(parallel_text.split())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Decode latency and CPU per upload: in-process PyAV vs an FFmpeg process per upload.
+
+First isolates the cost of starting a process: spawning `true` (fork/exec
+alone) and `ffmpeg -version` (fork/exec plus loading the libav libraries),
+which the FFmpeg backend pays on every upload before decoding anything.
+Then decodes the corpus fixtures (benchmarks.corpus) in each --formats with
+each backend, calling the decoder directly so the WAV fast path does not
+apply. CPU per upload counts this process and its children, so FFmpeg's
+own CPU time is included. With --threads > 1 uploads are decoded
+concurrently and the table also shows uploads/s.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_decoder [--formats webm,wav44] [--count 20] [--repeats 3] [--threads 1]
+"""
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_decode import DECODERS
+from benchmarks.corpus import generate, write_fixtures
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def measure(func, items, threads):
+    """Run func over items; return (latencies, CPU seconds, wall seconds)"""
+    def timed(item):
+        start = time.perf_counter()
+        func(item)
+        return time.perf_counter() - start
+
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            latencies = list(pool.map(timed, items))
+    else:
+        latencies = [timed(item) for item in items]
+    return latencies, cpu_seconds() - cpu_start, time.perf_counter() - wall_start
+
+
+def report(label, latencies, cpu, wall):
+    ms = np.array(latencies) * 1000
+    print(f"{label:<28} {np.percentile(ms, 50):>8.2f} {np.percentile(ms, 95):>8.2f} "
+          f"{cpu / len(latencies) * 1000:>8.2f} {len(latencies) / wall:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', default='webm,wav44', help='corpus fixture formats to decode')
+    parser.add_argument('--count', type=int, default=20, help='answers to generate')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--repeats', type=int, default=3, help='passes over the fixtures per backend')
+    parser.add_argument('--threads', type=int, default=1, help='uploads decoded concurrently')
+    args = parser.parse_args()
+    formats = args.formats.split(',')
+
+    print(f"{'':<28} {'p50 ms':>8} {'p95 ms':>8} {'CPU ms':>8} {'per sec':>9}")
+    spawns = [['true'], ['ffmpeg', '-hide_banner', '-version']]
+    for command in spawns:
+        run = lambda _: subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        report(f"spawn {command[0]}", *measure(run, range(20 * args.repeats), args.threads))
+
+    fixture_dir = tempfile.mkdtemp(prefix='speech-fixtures-')
+    try:
+        records = write_fixtures(generate(args.count, args.seed), fixture_dir, formats, args.seed)
+        audio_seconds = sum(record['audioSeconds'] for record in records) / len(records)
+        print(f"\n{len(records)} answers, {audio_seconds:.1f}s of audio on average")
+        print(f"{'':<28} {'p50 ms':>8} {'p95 ms':>8} {'CPU ms':>8} {'per sec':>9}")
+        for name in formats:
+            uploads = []
+            for record in records:
+                with open(os.path.join(fixture_dir, record['audio'][name]), 'rb') as f:
+                    uploads.append(f.read())
+            for backend, decoder_class in DECODERS.items():
+                try:
+                    decoder = decoder_class()
+                except ImportError as e:
+                    print(f"{name + ' ' + backend:<28} unavailable ({str(e)})")
+                    continue
+                decoder.decode(uploads[0])  # Load codecs before timing
+                report(f"{name} {backend}", *measure(decoder.decode, uploads * args.repeats, args.threads))
+    finally:
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
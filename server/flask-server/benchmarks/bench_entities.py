@@ -0,0 +1,63 @@
+"""Micro-benchmark for extract_entities.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_entities [--seconds 2]
+"""
+import argparse
+import time
+
+from entity_engine import extract_entities
+
+# Realistic candidate answers, keyed by question context
+CORPUS = [
+    ("interest", "Yes, I am interested in this role. I can join in 30 days."),
+    ("interest", "Not really, I don't think this is for me right now."),
+    ("interest", "Sure, my notice period is two months but it is negotiable."),
+    ("interest", "I can join immediately."),
+    ("compensation", "My current CTC is 8.5 lakh and I am expecting 12 lakh."),
+    ("compensation", "I am getting 6 LPA right now and looking for 9 LPA."),
+    ("compensation", "Somewhere between 10 and 14 lakhs."),
+    ("compensation", "Currently 750 k, expected 1000 k per annum."),
+    ("available", "I am available on Monday at 2:30 pm."),
+    ("available", "Tomorrow morning works for me."),
+    ("available", "How about the 21st of March around 4 o'clock?"),
+    ("available", "Next week, any time after 14:00 hours."),
+    ("full conversation",
+     "Yes I am interested. My notice period is 2 months. My current CTC is 8.5 lakh and "
+     "I am expecting 12 lakh. I'm available on Thursday at 11 am."),
+    ("full conversation",
+     "Hi, sounds good. I have to serve three weeks notice. I am earning 15 lpa and looking "
+     "for 20 lpa. Day after tomorrow in the evening is fine."),
+    ("full conversation",
+     "I would love to. Immediate joiner. Salary around 7 to 9 lakh. Friday 10 o'clock."),
+]
+
+
+def run(seconds):
+    """Run extract_entities over the corpus for `seconds` and return calls/sec per context"""
+    results = {}
+    contexts = sorted({context for context, _ in CORPUS})
+    for context in contexts + ['all']:
+        samples = [(c, t) for c, t in CORPUS if context in ('all', c)]
+        calls = 0
+        start = time.perf_counter()
+        deadline = start + seconds
+        while time.perf_counter() < deadline:
+            for question_context, text in samples:
+                extract_entities(text, question_context)
+            calls += len(samples)
+        results[context] = calls / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2.0, help='time budget per context')
+    args = parser.parse_args()
+
+    for context, rate in run(args.seconds).items():
+        print(f"{context:>20}: {rate:>10,.0f} calls/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Records/sec of batch entity extraction at batch sizes from 1 to 100k.
+
+For each batch size, reports the Python API (extract_entities_batch), a
+per-record extract_entities loop for reference, and the /extract-entities
+endpoint through the Flask test client with JSON and NDJSON bodies.
+Small batch sizes are repeated until at least --min-records records have
+been processed.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_extract_batch [--sizes 1,10,100,1000,10000,100000]
+"""
+import argparse
+import json
+import time
+
+from entity_engine import extract_entities, extract_entities_batch
+from benchmarks.bench_entities import CORPUS
+
+
+def make_records(count):
+    return [{'text': text, 'questionContext': context}
+            for context, text in (CORPUS[i % len(CORPUS)] for i in range(count))]
+
+
+def rate(func, batch_size, min_records):
+    repeats = max(1, -(-min_records // batch_size))
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return repeats * batch_size / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,10,100,1000,10000,100000')
+    parser.add_argument('--min-records', type=int, default=20000)
+    args = parser.parse_args()
+
+    import app
+    client = app.app.test_client()
+
+    print(f"{'batch':>8} {'loop':>12} {'batch API':>12} {'HTTP JSON':>12} {'HTTP NDJSON':>12}  (records/s)")
+    for size in [int(value) for value in args.sizes.split(',')]:
+        records = make_records(size)
+        json_body = json.dumps(records)
+        ndjson_body = '\n'.join(json.dumps(record) for record in records)
+
+        def loop():
+            for record in records:
+                extract_entities(record['text'], record['questionContext'])
+
+        def batch():
+            for _ in extract_entities_batch(records):
+                pass
+
+        def http_json():
+            client.post('/extract-entities', data=json_body, content_type='application/json').get_data()
+
+        def http_ndjson():
+            client.post('/extract-entities', data=ndjson_body, content_type='application/x-ndjson').get_data()
+
+        print(f"{size:>8} " + ' '.join(f"{rate(func, size, args.min_records):12,.0f}"
+                                        for func in (loop, batch, http_json, http_ndjson)))
+
+
+if __name__ == '__main__':
+    main()
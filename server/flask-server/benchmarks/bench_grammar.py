@@ -0,0 +1,120 @@
+"""Vosk decoding speed and entity accuracy with and without question-context grammars.
+
+Recognizes every corpus answer (benchmarks.corpus) twice: with the open
+vocabulary, and with the grammar of its question context as /process-speech
+does (grammars.py), including the open-vocabulary re-recognition of answers
+whose constrained result was not trusted. 'full conversation' answers have
+no grammar and are left out. Audio is decoded up front so only recognition
+is timed. Each transcript goes through extract_entities and is scored
+against the answer's expected entities.
+
+The default fixtures are speech-like noise, which only measures speed; for
+accuracy, have a TTS engine read the answers out (--voice pyttsx3) or pass
+--fixtures, a directory written by `python -m benchmarks.corpus` (its
+corpus.jsonl can also point at real recordings). Vosk writes numbers as
+words ("thirty days"); both modes return them as digits (spoken_numbers.py),
+as /process-speech does.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_grammar [--voice pyttsx3] [--fixtures dir] [--count 60] [--model path]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import speech_recognition as sr
+import vosk
+
+from asr import VOSK_MODEL_PATH, VoskEngine
+from audio_decode import SAMPLE_RATE, SAMPLE_WIDTH, iter_bytes_chunks, load_pcm
+from entity_engine import extract_entities
+from grammars import VOCABULARY, ContextGrammars, grammar_profile
+from benchmarks.corpus import generate, load_fixtures, score, write_fixtures
+
+
+def recognize(transcribe, pcm):
+    try:
+        return transcribe(iter_bytes_chunks(pcm))
+    except sr.UnknownValueError:
+        return ''
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help='corpus directory (default: generate one)')
+    parser.add_argument('--voice', default='synthetic', help="'synthetic' or a tts.ENGINES name to read answers out")
+    parser.add_argument('--count', type=int, default=60, help='answers to generate')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--model', default=VOSK_MODEL_PATH, help='Vosk model directory')
+    args = parser.parse_args()
+
+    engine = VoskEngine(args.model)
+    if engine.grammars is None:
+        raise Exception("Grammars are disabled (VOSK_GRAMMARS=false)")
+
+    # What building once saves: compiling every grammar, and a recognizer with and without one
+    build_ms = timed(lambda: ContextGrammars(vosk, engine.model, SAMPLE_RATE).warm())
+    open_ms = np.median([timed(engine.recognizer) for _ in range(10)])
+    grammar = engine.grammars.grammar('availability')
+    grammar_ms = np.median([timed(lambda: vosk.KaldiRecognizer(engine.model, SAMPLE_RATE, grammar))
+                            for _ in range(10)])
+    print(f"Model {engine.model_id}: building all {len(VOCABULARY)} grammars {build_ms:.1f} ms; new recognizer "
+          f"{open_ms:.2f} ms open, {grammar_ms:.2f} ms with a grammar (pooled: reused after Reset())")
+
+    fixture_dir = args.fixtures or tempfile.mkdtemp(prefix='speech-fixtures-')
+    try:
+        if args.fixtures:
+            records = load_fixtures(fixture_dir)
+        else:
+            voice = None
+            if args.voice != 'synthetic':
+                import tts
+                voice = tts.get_engine(args.voice)
+            records = write_fixtures(generate(args.count, args.seed), fixture_dir, ['wav'], args.seed, voice)
+        records = [record for record in records if grammar_profile(record['questionContext'])]
+        pcms = []
+        for record in records:
+            with open(os.path.join(fixture_dir, record['audio']['wav']), 'rb') as f:
+                pcms.append(load_pcm(f.read()))
+    finally:
+        if not args.fixtures:
+            shutil.rmtree(fixture_dir, ignore_errors=True)
+
+    audio_seconds = sum(len(pcm) for pcm in pcms) / (SAMPLE_RATE * SAMPLE_WIDTH)
+    source = args.fixtures or f"{args.voice} voice"
+    print(f"{len(records)} targeted answers, {audio_seconds:.0f}s of audio from {source}")
+    modes = {
+        'open': lambda record, pcm: recognize(engine.transcribe, pcm),
+        'grammar': lambda record, pcm: recognize(
+            lambda chunks: engine.transcribe_in_context(chunks, record['questionContext']), pcm),
+    }
+    recognize(engine.transcribe, pcms[0])  # Warm the model before timing
+
+    print(f"{'mode':<8} {'RTF':>6} {'p50 ms':>8} {'p95 ms':>8} {'exact':>7} {'fallbacks':>10}  fields")
+    for mode, transcribe in modes.items():
+        fallbacks = engine.grammars.stats()['fallbacks']
+        latencies, results = [], []
+        for record, pcm in zip(records, pcms):
+            start = time.perf_counter()
+            text = transcribe(record, pcm)
+            latencies.append(time.perf_counter() - start)
+            results.append(extract_entities(text, record['questionContext']))
+        fallbacks = engine.grammars.stats()['fallbacks'] - fallbacks
+        scores = score(records, results)
+        ms = np.array(latencies) * 1000
+        fields = ' '.join(f"{field}={share:.0%}" for field, share in scores['fields'].items())
+        print(f"{mode:<8} {sum(latencies) / audio_seconds:>6.3f} {np.percentile(ms, 50):>8.1f} "
+              f"{np.percentile(ms, 95):>8.1f} {scores['exact']:>7.1%} {fallbacks:>10}  {fields}")
+
+
+if __name__ == '__main__':
+    main()
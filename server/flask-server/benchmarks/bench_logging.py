@@ -0,0 +1,167 @@
+"""Request latency with print() vs queue-based logging when stdout is slow.
+
+Simulates /process-speech requests on --threads threads: each request does
+--work-ms of work and writes the ten lines the handler used to print (the
+upload details, saved/cleaned-up files, the recognized text and so on). The
+lines go to a stand-in for stdout whose every line takes --write-ms to
+write, like a pipe to a log collector that has fallen behind. Three modes
+are compared:
+
+  print  print() straight to the slow stream, as the handlers used to
+  sync   logging with a plain StreamHandler (blocking, for reference)
+  queue  structured_log.QueueLogHandler: the request only enqueues the
+         record; a background thread writes it (dropping records when the
+         queue is full rather than blocking)
+
+Run from server/flask-server:
+    python -m benchmarks.bench_logging [--threads 4] [--requests 200] [--write-ms 2]
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+
+from structured_log import JsonFormatter, QueueLogHandler, context
+
+LINES_PER_REQUEST = 10
+
+
+class SlowStream:
+    """File-like object that takes write_ms per line, one writer at a time"""
+
+    def __init__(self, write_ms):
+        self.delay = write_ms / 1000
+        self.lock = threading.Lock()
+        self.lines = 0
+
+    def write(self, text):
+        if text.endswith('\n'):
+            with self.lock:
+                time.sleep(self.delay)
+                self.lines += 1
+
+    def flush(self):
+        pass
+
+
+def print_request(index, work):
+    candidate_id = f"cand-{index}"
+    print(f"Processing audio for candidate: {candidate_id}")
+    print("Question context: experience")
+    print("Audio file: answer.webm")
+    print("Content type: audio/webm")
+    print(f"Saved audio to: /tmp/input_{candidate_id}.webm")
+    work()
+    print(f"Successfully converted audio to WAV: /tmp/output_{candidate_id}.wav")
+    print("Recognized text: I have five years of experience in python and my notice period is 30 days")
+    print("Successfully sent data to Node.js server")
+    print(f"Cleaned up: /tmp/input_{candidate_id}.webm")
+    print(f"Cleaned up: /tmp/output_{candidate_id}.wav")
+
+
+def log_request(log, index, work):
+    candidate_id = f"cand-{index}"
+    with context(f"req-{index}", candidate_id):
+        log.info("Processing audio", extra={'questionContext': 'experience', 'audioFile': 'answer.webm',
+                                            'contentType': 'audio/webm'})
+        log.info(f"Saved audio to: /tmp/input_{candidate_id}.webm")
+        work()
+        log.info(f"Converted audio to WAV: /tmp/output_{candidate_id}.wav")
+        log.info("Recognized text", extra={
+            'transcript': "I have five years of experience in python and my notice period is 30 days"})
+        log.info("Extracted entities", extra={'entities': ['experience', 'notice_period']})
+        log.info("Successfully sent 1 payload(s) to Node.js server")
+        log.info(f"Cleaned up: /tmp/input_{candidate_id}.webm")
+        log.info(f"Cleaned up: /tmp/output_{candidate_id}.wav")
+        log.info("Speech ratio: 80%")
+        log.info("Request finished")
+
+
+def run(mode, args):
+    stream = SlowStream(args.write_ms)
+    handler = None
+    if mode == 'print':
+        def request(index):
+            print_request(index, work)
+    else:
+        target = logging.StreamHandler(stream)
+        target.setFormatter(JsonFormatter())
+        handler = target if mode == 'sync' else QueueLogHandler(target, maxsize=args.queue_size)
+        log = logging.getLogger(f"bench.{mode}")
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        log.addHandler(handler)
+
+        def request(index):
+            log_request(log, index, work)
+
+    def work():
+        time.sleep(args.work_ms / 1000)
+
+    latencies = []
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+
+    def client():
+        while True:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            request(index)
+            latencies.append(time.perf_counter() - start)
+
+    real_stdout = sys.stdout
+    if mode == 'print':
+        sys.stdout = stream
+    try:
+        start = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = real_stdout
+
+    dropped = 0
+    if isinstance(handler, QueueLogHandler):
+        handler.stop()  # Let the writer catch up before reporting
+        dropped = handler.dropped
+    ms = np.array(latencies) * 1000
+    return {
+        'p50': np.percentile(ms, 50),
+        'p95': np.percentile(ms, 95),
+        'p99': np.percentile(ms, 99),
+        'throughput': args.requests / elapsed,
+        'written': stream.lines,
+        'dropped': dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--work-ms', type=float, default=20, help='time spent in decoding/recognition per request')
+    parser.add_argument('--write-ms', type=float, default=2, help='time to write one line to stdout')
+    parser.add_argument('--queue-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.requests} requests, {args.work_ms:g}ms work, "
+          f"{args.write_ms:g}ms per stdout line ({LINES_PER_REQUEST} lines per request)")
+    print(f"{'mode':<6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'written':>8} {'dropped':>8}")
+    for mode in ('print', 'sync', 'queue'):
+        result = run(mode, args)
+        print(f"{mode:<6} {result['p50']:>8.1f} {result['p95']:>8.1f} {result['p99']:>8.1f} "
+              f"{result['throughput']:>8.1f} {result['written']:>8} {result['dropped']:>8}")
+    print(f"(work alone: {args.work_ms:g}ms per request)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Overhead of the /metrics instrumentation.
+
+Times the recording primitives in a tight loop (one pipeline stage, a
+counter increment, a histogram observation), then sends --requests requests
+to GET /health (and POST /process-speech with --input) through the Flask
+test client, alternating metrics on and off. The recognizer is replaced by
+a stub that answers immediately, so the difference is the cost of the
+instrumentation rather than noise from recognition.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_metrics [--requests 500] [--input answer.webm]
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import metrics
+from app import app
+import asr
+
+
+class InstantEngine:
+    """Recognizer stub that consumes the audio and answers at once"""
+    name = 'instant'
+    model_id = 'instant'
+    local = True
+
+    def transcribe(self, pcm_chunks):
+        for _ in pcm_chunks:
+            pass
+        return "my name is jane and I have five years of experience in python"
+
+
+def per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def time_requests(client, count, audio):
+    # The request log would dominate the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _time_requests(client, count, audio)
+
+
+def _time_requests(client, count, audio):
+    start = time.perf_counter()
+    for i in range(count):
+        if audio is None:
+            client.get('/health')
+        else:
+            client.post('/process-speech', data={
+                'audio': (io.BytesIO(audio), 'answer.webm'),
+                'candidateId': f'bench-{i}',
+                'questionContext': 'experience',
+            }, content_type='multipart/form-data')
+    return (time.perf_counter() - start) / count * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--input', help='recording for the /process-speech loop (default: skip it)')
+    parser.add_argument('--rounds', type=int, default=3, help='alternating on/off rounds; the best of each is kept')
+    args = parser.parse_args()
+
+    def record_stage():
+        with metrics.stage('bench'):
+            pass
+
+    counter = metrics.Counter('bench_total', 'Benchmark counter', ('label',))
+    histogram = metrics.Histogram('bench_seconds', 'Benchmark histogram', ('label',))
+    primitives = [
+        ('stage()', record_stage),
+        ('Counter.inc', lambda: counter.inc('x')),
+        ('Histogram.observe', lambda: histogram.observe(0.042, 'x')),
+    ]
+
+    audio = None
+    if args.input:
+        with open(args.input, 'rb') as f:
+            audio = f.read()
+        asr.ENGINES[asr.ASR_ENGINE] = InstantEngine
+        asr._engines.pop(asr.ASR_ENGINE, None)
+
+    client = app.test_client()
+    # Warm up routes and caches so both runs take the same path
+    time_requests(client, 5, None)
+    if audio is not None:
+        time_requests(client, 5, audio)
+
+    print(f"{'':<22} {'enabled':>10} {'disabled':>10} {'overhead':>10}")
+    for label, func in primitives:
+        metrics.METRICS_ENABLED = True
+        enabled = per_call(func, args.iterations)
+        metrics.METRICS_ENABLED = False
+        disabled = per_call(func, args.iterations)
+        print(f"{label:<22} {enabled:>8.2f}us {disabled:>8.2f}us {enabled - disabled:>8.2f}us")
+
+    loops = [('GET /health', None)]
+    if audio is not None:
+        loops.append(('POST /process-speech', audio))
+    for label, body in loops:
+        enabled, disabled = float('inf'), float('inf')
+        for _ in range(args.rounds):
+            metrics.METRICS_ENABLED = True
+            enabled = min(enabled, time_requests(client, args.requests, body))
+            metrics.METRICS_ENABLED = False
+            disabled = min(disabled, time_requests(client, args.requests, body))
+        overhead = (enabled - disabled) / disabled * 100
+        print(f"{label:<22} {enabled:>8.3f}ms {disabled:>8.3f}ms {overhead:>9.1f}%")
+    metrics.METRICS_ENABLED = True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Per-turn work and accuracy: incremental sessions vs re-processing the full conversation.
+
+Builds --interviews interviews from the corpus (benchmarks.corpus), each
+one answer per targeted question ('interest', 'compensation', 'available')
+in that order, and replays them turn by turn in two ways:
+
+  full         what VoiceAgent.jsx did: every upload is the whole
+               conversation so far, recognized and extracted with
+               questionContext 'full conversation'
+  session      every upload is the new answer only, extracted with its own
+               question context and merged into a SessionStore (memory only,
+               and with the disk copy)
+
+Recognition is not run; the audio a turn has to recognize is counted in
+seconds (as long as the answer takes to say) and converted to recognizer
+time with --rtf. Extraction and session merging are timed. Accuracy is the
+share of interviews whose final entities match every answer's expected
+entities.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_sessions [--interviews 200] [--rtf 0.3] [--seed 1234]
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from entity_engine import extract_entities
+from sessions import SessionStore
+from benchmarks.corpus import SECONDS_PER_WORD, generate
+
+TURN_CONTEXTS = ('interest', 'compensation', 'available')
+
+
+def interviews(count, seed):
+    """Lists of answers, one per TURN_CONTEXTS entry, for `count` candidates"""
+    records = generate(count * 4, seed)
+    by_context = {context: [record for record in records if record['questionContext'] == context]
+                  for context in TURN_CONTEXTS}
+    return [[by_context[context][index] for context in TURN_CONTEXTS] for index in range(count)]
+
+
+def audio_seconds(text):
+    # Mirrors benchmarks.corpus.speech_pcm
+    return max(1.5, SECONDS_PER_WORD * len(text.split()))
+
+
+def expected_state(turns):
+    state = {}
+    for record in turns:
+        state.update(record['expected'])
+    return state
+
+
+def replay_full(conversations):
+    """Per-turn (seconds of audio, extraction seconds), and final entities per interview"""
+    turn_audio, turn_times, finals = [], [], []
+    for turns in conversations:
+        for count in range(1, len(turns) + 1):
+            text = ' '.join(record['text'] for record in turns[:count])
+            start = time.perf_counter()
+            entities = extract_entities(text, 'full conversation')
+            turn_times.append(time.perf_counter() - start)
+            turn_audio.append(sum(audio_seconds(record['text']) for record in turns[:count]))
+        finals.append(entities)
+    return turn_audio, turn_times, finals
+
+
+def replay_session(conversations, store):
+    turn_audio, turn_times, finals = [], [], []
+    for candidate, turns in enumerate(conversations):
+        for record in turns:
+            start = time.perf_counter()
+            entities = extract_entities(record['text'], record['questionContext'])
+            session = store.record(f"c{candidate}", record['questionContext'], record['text'], entities)
+            turn_times.append(time.perf_counter() - start)
+            turn_audio.append(audio_seconds(record['text']))
+        finals.append(session['entities'])
+    return turn_audio, turn_times, finals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interviews', type=int, default=200)
+    parser.add_argument('--rtf', type=float, default=0.3, help='recognizer real-time factor for the audio column')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    conversations = interviews(args.interviews, args.seed)
+    expected = [expected_state(turns) for turns in conversations]
+    disk_dir = tempfile.mkdtemp(prefix='sessions-')
+    try:
+        results = {
+            'full': replay_full(conversations),
+            'session': replay_session(conversations, SessionStore()),
+            'session+disk': replay_session(conversations, SessionStore(disk_dir=disk_dir)),
+        }
+    finally:
+        shutil.rmtree(disk_dir, ignore_errors=True)
+
+    print(f"{args.interviews} interviews of {len(TURN_CONTEXTS)} turns, recognizer rtf {args.rtf}")
+    print(f"{'mode':<14} {'audio s/turn':>12} {'ASR ms/turn':>12} {'last turn audio s':>17} "
+          f"{'extract+merge us':>17} {'exact':>7}")
+    for mode, (turn_audio, turn_times, finals) in results.items():
+        audio = np.array(turn_audio)
+        last = audio[len(TURN_CONTEXTS) - 1::len(TURN_CONTEXTS)]
+        exact = sum(final == want for final, want in zip(finals, expected)) / len(expected)
+        print(f"{mode:<14} {audio.mean():>12.2f} {audio.mean() * args.rtf * 1000:>12.0f} {last.mean():>17.2f} "
+              f"{np.median(turn_times) * 1e6:>17.1f} {exact:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
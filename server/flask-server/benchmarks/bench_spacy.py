@@ -0,0 +1,89 @@
+"""Entity engines compared: the regex rules (entity_engine) vs the spaCy pipeline (spacy_engine).
+
+On a generated corpus (benchmarks.corpus) reports, per engine:
+
+  single     extract(text, question_context) calls/s per question context,
+             as /process-speech runs it
+  batch      extract_batch records/s over the whole corpus, as
+             /extract-entities runs it (nlp.pipe for spaCy), once per
+             --processes value
+  accuracy   exact-match share, per-field and per-tag scores against the
+             corpus' expected entities
+
+spaCy starts its worker processes on every nlp.pipe call, so n_process > 1
+only pays off for large batches and with spare cores.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_spacy [--count 20000] [--processes 1,2] [--batch-size 256] [--seconds 2]
+"""
+import argparse
+import time
+
+from entity_engine import RegexEngine
+from spacy_engine import SpacyEngine
+from benchmarks.corpus import CONTEXTS, generate, score
+
+
+def calls_per_second(func, items, seconds):
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for item in items:
+            func(*item)
+        calls += len(items)
+    return calls / (time.perf_counter() - start)
+
+
+def batch_rate(engine, records):
+    start = time.perf_counter()
+    results = list(engine.extract_batch(records))
+    return len(records) / (time.perf_counter() - start), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20000, help='corpus answers')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--processes', default='1,2', help='comma-separated nlp.pipe n_process values')
+    parser.add_argument('--batch-size', type=int, default=256, help='nlp.pipe batch size')
+    parser.add_argument('--seconds', type=float, default=2, help='time per single-call measurement')
+    args = parser.parse_args()
+
+    records = generate(args.count, args.seed)
+    start = time.perf_counter()
+    spacy_engine = SpacyEngine(batch_size=args.batch_size)
+    print(f"{len(records)} answers; spaCy pipeline loaded in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({', '.join(spacy_engine.nlp.pipe_names)})")
+
+    engines = {'regex': RegexEngine(), 'spacy': spacy_engine}
+    sample = records[:2000]
+    print(f"\nsingle calls/s  {' '.join(f'{context:>18}' for context in CONTEXTS)}")
+    for name, engine in engines.items():
+        rates = [calls_per_second(engine.extract, [(record['text'], record['questionContext']) for record in sample
+                                                   if record['questionContext'] == context], args.seconds)
+                 for context in CONTEXTS]
+        print(f"{name:<15} {' '.join(f'{rate:>18,.0f}' for rate in rates)}")
+
+    print(f"\n{'batch':<15} {'records/s':>10}")
+    rate, regex_results = batch_rate(engines['regex'], records)
+    print(f"{'regex':<15} {rate:>10,.0f}")
+    spacy_results = None
+    for processes in [int(value) for value in args.processes.split(',')]:
+        spacy_engine.n_process = processes
+        rate, results = batch_rate(spacy_engine, records)
+        if spacy_results is not None and results != spacy_results:
+            raise Exception(f"n_process={processes} results differ from n_process=1")
+        spacy_results = spacy_results or results
+        print(f"{f'spacy x{processes}':<15} {rate:>10,.0f}")
+
+    print(f"\n{'accuracy':<15} {'exact':>7}  fields / tags")
+    for name, results in (('regex', regex_results), ('spacy', spacy_results)):
+        scores = score(records, results)
+        fields = ' '.join(f"{field}={share:.0%}" for field, share in scores['fields'].items())
+        tags = ' '.join(f"{tag}={share:.0%}" for tag, share in scores['tags'].items())
+        print(f"{name:<15} {scores['exact']:>7.1%}  {fields}\n{'':<25}{tags}")
+
+
+if __name__ == '__main__':
+    main()
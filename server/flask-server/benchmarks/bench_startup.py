@@ -0,0 +1,103 @@
+"""Startup time and per-worker memory of the gunicorn profile, with and without preload.
+
+Starts `gunicorn -c gunicorn.conf.py app:app` with --workers workers for
+each preload setting, measures the time until GET /ready answers 200 on
+every worker, then reads RSS and PSS (proportional set size, which splits
+shared copy-on-write pages between the processes sharing them) of the
+master and each worker from /proc. Linux only.
+
+Use --engine vosk to include a model load, which is where preloading pays off.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_startup [--workers 4] [--engine vosk]
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid):
+    """Return (rss, pss) of a process in kB"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss'):
+                    values[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values.get('Rss', 0), values.get('Pss', 0)
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def measure(preload, workers, engine, timeout):
+    port = free_port()
+    env = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS=str(workers),
+               GUNICORN_PRELOAD=str(preload).lower())
+    if engine:
+        env['ASR_ENGINE'] = engine
+    start = time.perf_counter()
+    master = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_pids = set()
+        deadline = start + timeout
+        while len(ready_pids) < workers:
+            if time.perf_counter() > deadline or master.poll() is not None:
+                raise Exception(f"Workers did not become ready (ready: {len(ready_pids)}/{workers})")
+            try:
+                response = requests.get(f"http://127.0.0.1:{port}/ready", timeout=1)
+                if response.status_code == 200:
+                    ready_pids.add(response.json()['pid'])
+            except requests.exceptions.RequestException:
+                time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+        master_rss, master_pss = memory_kb(master.pid)
+        worker_memory = [memory_kb(pid) for pid in children(master.pid)]
+        return elapsed, (master_rss, master_pss), worker_memory
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--engine', help='ASR engine (default: ASR_ENGINE)')
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, engine {args.engine or os.getenv('ASR_ENGINE', 'google')}")
+    for preload in (False, True):
+        elapsed, (master_rss, master_pss), worker_memory = measure(preload, args.workers, args.engine, args.timeout)
+        rss = [value[0] / 1024 for value in worker_memory]
+        pss = [value[1] / 1024 for value in worker_memory]
+        total_pss = (master_pss + sum(value[1] for value in worker_memory)) / 1024
+        print(f"preload={str(preload):<5} ready in {elapsed:6.2f}s  master RSS {master_rss / 1024:6.1f} MB  "
+              f"worker RSS avg {sum(rss) / len(rss):6.1f} MB  PSS avg {sum(pss) / len(pss):6.1f} MB  "
+              f"total PSS {total_pss:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Cold vs warm /tts latency.
+
+Sends each prompt to POST /tts through the Flask test client in four states:
+
+  cold         empty caches: every prompt is synthesized
+  memory       repeated prompts, served from the memory tier
+  disk         fresh memory tier over the same disk tier (as after a restart)
+  conditional  repeated prompts with If-None-Match: 304, no audio sent
+
+By default synthesis is simulated (sleeping --rtf x the length of the
+produced clip, roughly one word per 0.4s) so the numbers show the cost of
+the cache and the HTTP layer; --engine pyttsx3 or --engine coqui measures a
+real voice.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_tts [--engine simulated] [--rtf 0.3] [--repeats 20] [--prompts-file prompts.txt]
+"""
+import argparse
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+import tts
+
+SECONDS_PER_WORD = 0.4
+SAMPLE_RATE = 22050
+
+
+class SimulatedVoice:
+    """Sleeps for rtf x clip length and returns a WAV of silence"""
+    name = 'simulated'
+
+    def __init__(self, rtf):
+        self.rtf = rtf
+        self.model_id = f"simulated:{rtf}"
+
+    def synthesize(self, text):
+        seconds = len(text.split()) * SECONDS_PER_WORD
+        time.sleep(seconds * self.rtf)
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(b'\x00\x00' * int(seconds * SAMPLE_RATE))
+        return buffer.getvalue()
+
+
+def measure(client, prompts, repeats, etags=None):
+    latencies, statuses, sent = [], {}, 0
+    for _ in range(repeats):
+        for text in prompts:
+            headers = {'If-None-Match': etags[text]} if etags else {}
+            start = time.perf_counter()
+            response = client.post('/tts', json={'text': text}, headers=headers)
+            body = b''.join(response.response)  # Consume the streamed body
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            sent += len(body)
+            response.close()
+    return latencies, statuses, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', default='simulated', help="'simulated' or a tts.ENGINES name")
+    parser.add_argument('--rtf', type=float, default=0.3, help='real-time factor of the simulated voice')
+    parser.add_argument('--repeats', type=int, default=20, help='passes over the prompts in the warm states')
+    parser.add_argument('--prompts-file', help='extra prompts, one per line')
+    args = parser.parse_args()
+
+    disk_dir = tempfile.mkdtemp(prefix='tts-cache-')
+    # The app reads these at import
+    os.environ.update(TTS_CACHE_DIR=disk_dir, TTS_PRERENDER='false')
+    logging.disable(logging.INFO)
+    if args.engine == 'simulated':
+        tts.ENGINES[tts.TTS_ENGINE] = lambda: SimulatedVoice(args.rtf)
+    else:
+        tts.TTS_ENGINE = args.engine
+    import app
+    client = app.app.test_client()
+    prompts = tts.load_prompts(args.prompts_file)
+
+    try:
+        results = {}
+        results['cold'] = measure(client, prompts, 1)
+        results['memory'] = measure(client, prompts, args.repeats)
+        app.speech_synthesizer.cache = tts.AudioCache(disk_dir=disk_dir)
+        results['disk'] = measure(client, prompts, 1)
+        etags = {text: client.post('/tts', json={'text': text}).headers['ETag'] for text in prompts}
+        results['conditional'] = measure(client, prompts, args.repeats, etags)
+    finally:
+        shutil.rmtree(disk_dir, ignore_errors=True)
+
+    print(f"{len(prompts)} prompts, engine {tts.get_engine().model_id}")
+    print(f"{'state':<12} {'requests':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'KB/req':>8}  statuses")
+    for state, (latencies, statuses, sent) in results.items():
+        ms = np.array(latencies) * 1000
+        print(f"{state:<12} {len(latencies):>8} {np.percentile(ms, 50):>9.2f} {np.percentile(ms, 95):>9.2f} "
+              f"{ms.max():>9.2f} {sent / len(latencies) / 1024:>8.1f}  {statuses}")
+    cold, memory = np.median(results['cold'][0]), np.median(results['memory'][0])
+    print(f"Warm (memory) requests are {cold / memory:.0f}x faster than cold synthesis")
+
+
+if __name__ == '__main__':
+    main()
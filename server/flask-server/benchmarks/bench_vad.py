@@ -0,0 +1,93 @@
+"""Recognition with and without voice-activity trimming on padded recordings.
+
+Each input recording is decoded once and padded with low-level noise
+(leading/trailing silence of --pad seconds and a pause in the middle), the
+way browser recordings arrive. For every padded clip the benchmark runs
+recognition on the full PCM and on the VAD-trimmed PCM and reports audio
+seconds sent to the recognizer, latency (including the VAD itself), and
+whether the transcripts match.
+
+Use real speech recordings with --input for meaningful transcripts; without
+one, a synthetic clip is used. --engine none times only the VAD.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_vad --input answer.wav [--engine vosk] [--pad 0,2,5]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from asr import get_engine
+from audio_decode import SAMPLE_RATE, decode_to_pcm, iter_bytes_chunks
+from vad import trim_silence
+
+
+def synthetic_speech(seconds=3.0):
+    """Amplitude-modulated harmonics, loud enough to register as speech"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    voice = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    return (4000 * voice * envelope).astype('<i2')
+
+
+def pad(samples, seconds, rng):
+    def noise(length):
+        return rng.normal(0, 40, int(length * SAMPLE_RATE)).astype('<i2')
+    half = len(samples) // 2
+    return np.concatenate([noise(seconds), samples[:half], noise(seconds / 2), samples[half:], noise(seconds)])
+
+
+def timed(func, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', action='append', help='speech recording (repeatable)')
+    parser.add_argument('--engine', default='vosk', help="ASR engine, or 'none' to time the VAD only")
+    parser.add_argument('--pad', default='0,2,5', help='seconds of leading/trailing silence per variant')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = None if args.engine == 'none' else get_engine(args.engine)
+
+    def recognize(pcm):
+        if engine is None:
+            return ''
+        try:
+            return engine.transcribe(iter_bytes_chunks(pcm)).strip()
+        except Exception:
+            return ''
+
+    def with_vad(pcm):
+        trimmed, stats = trim_silence(pcm)
+        return recognize(trimmed) if trimmed else '', stats
+
+    sources = []
+    for path in args.input or []:
+        with open(path, 'rb') as f:
+            sources.append((path, np.frombuffer(decode_to_pcm(f.read()), dtype='<i2')))
+    if not sources:
+        sources.append(('synthetic', synthetic_speech()))
+
+    rng = np.random.default_rng(0)
+    print(f"{'input':<24} {'pad':>4} {'audio s':>8} {'sent s':>7} {'ratio':>6} "
+          f"{'full ms':>9} {'vad ms':>9} {'same':>5}")
+    for name, samples in sources:
+        for seconds in [float(value) for value in args.pad.split(',')]:
+            pcm = pad(samples, seconds, rng).tobytes()
+            full_ms, full_text = timed(lambda: recognize(pcm), args.repeat)
+            vad_ms, (vad_text, stats) = timed(lambda: with_vad(pcm), args.repeat)
+            print(f"{name[-24:]:<24} {seconds:>4g} {stats['audioSeconds']:>8.2f} {stats['keptSeconds']:>7.2f} "
+                  f"{stats['speechRatio']:>6.0%} {full_ms:>9.1f} {vad_ms:>9.1f} {str(full_text == vad_text):>5}")
+
+
+if __name__ == '__main__':
+    main()
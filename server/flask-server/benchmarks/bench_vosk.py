@@ -0,0 +1,80 @@
+"""Real-time factor and per-request latency of the Vosk ASR engine.
+
+Audio is decoded to 16kHz mono PCM up front so only recognition is timed.
+Real-time factor (RTF) is processing time divided by audio duration; below
+1.0 means faster than real time.
+
+Run from server/flask-server:
+    python -m benchmarks.bench_vosk [answer1.wav answer2.wav ...] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+
+import speech_recognition as sr
+
+from asr import VOSK_MODEL_PATH, VoskEngine
+from audio_decode import PCM_CHUNK_BYTES, SAMPLE_RATE, SAMPLE_WIDTH, decode_to_pcm
+
+
+def make_fixtures(directory, durations=(2, 5, 10)):
+    """Render speech-band noise WAVs when no samples are given"""
+    paths = []
+    for seconds in durations:
+        path = os.path.join(directory, f"sample_{seconds}s.wav")
+        subprocess.run([
+            'ffmpeg', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'anoisesrc=color=pink:duration={seconds}:amplitude=0.3',
+            '-af', 'bandpass=f=1000:width_type=h:w=2000',
+            '-ar', str(SAMPLE_RATE), '-ac', '1', '-y', path
+        ], check=True)
+        paths.append(path)
+    return paths
+
+
+def chunks(pcm):
+    return [pcm[offset:offset + PCM_CHUNK_BYTES] for offset in range(0, len(pcm), PCM_CHUNK_BYTES)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('wavs', nargs='*', help='sample recordings (default: generated noise clips)')
+    parser.add_argument('--model', default=VOSK_MODEL_PATH)
+    parser.add_argument('--repeat', type=int, default=5, help='recognitions per file')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine = VoskEngine(args.model)
+    print(f"Model load: {(time.perf_counter() - start) * 1000:.0f} ms ({engine.model_id}, once per process)")
+
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        paths = args.wavs or make_fixtures(fixture_dir)
+        total_audio = total_time = 0.0
+        for path in paths:
+            with open(path, 'rb') as f:
+                pcm = decode_to_pcm(f.read())
+            duration = len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+
+            latencies = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                try:
+                    engine.transcribe(chunks(pcm))
+                except sr.UnknownValueError:
+                    pass  # Nothing recognized is still a complete decode
+                latencies.append(time.perf_counter() - start)
+
+            median = statistics.median(latencies)
+            total_audio += duration * len(latencies)
+            total_time += sum(latencies)
+            print(f"{os.path.basename(path):>24}: {duration:6.2f}s audio  "
+                  f"median {median * 1000:8.1f} ms  RTF {median / duration:.3f}")
+
+        print(f"{'overall':>24}: RTF {total_time / total_audio:.3f}")
+
+
+if __name__ == '__main__':
+    main()
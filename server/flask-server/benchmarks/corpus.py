@@ -0,0 +1,336 @@
+"""Seeded synthetic corpus of candidate answers, with audio fixtures.
+
+Generates answers for every question context (notice periods in words and
+digits, CTC in lakh/LPA/k, dates, weekdays, relative days and times in the
+formats candidates use) together with the entities a correct extraction
+yields, so benchmarks can report accuracy as well as speed. Some answers
+carry tags for phrasings the regex rules are known to get wrong (e.g.
+'substring-negation': "know" contains "no").
+
+Each answer gets speech-like audio (its length follows the word count) as
+16kHz mono WAV, 44.1kHz stereo WAV and WebM/Opus, the format VoiceAgent.jsx
+uploads. The same --seed always produces the same corpus and audio. With
+--voice pyttsx3 (or coqui) the answers are read out by that TTS engine
+instead, so recognizers have real words to transcribe. vosk_transcript()
+renders an answer the way Vosk writes it ("my current ctc is twelve lakhs"),
+to score extraction on what the offline recognizer actually returns.
+
+Run from server/flask-server:
+    python -m benchmarks.corpus --output benchmarks/fixtures [--count 60] [--seed 1234] [--voice pyttsx3]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import wave
+
+import numpy as np
+
+from audio_decode import SAMPLE_RATE, SAMPLE_WIDTH, wav_to_pcm
+from spoken_numbers import ORDINALS, TENS, TENS_ORDINALS, TEENS, UNITS
+from benchmarks.bench_vad import synthetic_speech
+
+CONTEXTS = ('interest', 'compensation', 'available', 'full conversation')
+FORMATS = {
+    'wav': '.wav',          # 16kHz mono, what the pipeline decodes to
+    'wav44': '.44k.wav',    # 44.1kHz stereo, a typical desktop recording
+    'wav8k': '.8k.wav',     # 8kHz mono, telephony
+    'webm': '.webm',        # Opus in WebM, what browsers upload
+}
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+          'October', 'November', 'December']
+NUMBER_WORDS = ['one', 'two', 'three', 'four', 'five', 'six']
+PERIODS = {'morning': '9:00 AM', 'afternoon': '2:00 PM', 'evening': '6:00 PM'}
+
+SECONDS_PER_WORD = 0.33
+
+
+def _amount(rng, low, high):
+    """A CTC figure in lakhs, in half-lakh steps, as spoken ("8.5", "12")"""
+    value = rng.randrange(int(low * 2), int(high * 2) + 1) / 2
+    return f"{value:g}"
+
+
+def _lpa(spoken, divisor=1):
+    # Mirrors standardize_ctc_value's output format
+    return f"{float(spoken) / divisor} LPA"
+
+
+def _suffix(day):
+    if day in (11, 12, 13):
+        return 'th'
+    return {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')
+
+
+def notice_answer(rng):
+    kind = rng.choice(['digits', 'digits', 'words', 'immediate', 'range'])
+    if kind == 'immediate':
+        return rng.choice(["I can join immediately.", "I am an immediate joiner."]), 'Immediate', []
+    # The API reports the unit in the singular ("30 day"), however it was said
+    unit = rng.choice(['day', 'week', 'month'])
+    if kind == 'range':
+        start = rng.randint(1, 2)
+        end = start + 1
+        return (f"My notice period is {start} to {end} {unit}s.", f"{start}-{end} {unit}", ['range'])
+    if kind == 'words':
+        index = rng.randrange(len(NUMBER_WORDS))
+        plural = unit + ('s' if index else '')
+        return (rng.choice([f"I have to serve {NUMBER_WORDS[index]} {plural} notice.",
+                            f"It is {NUMBER_WORDS[index]} {plural}."]),
+                f"{index + 1} {unit}", [])
+    number = {'day': rng.choice([15, 30, 45, 60, 90]), 'week': rng.randint(1, 8), 'month': rng.randint(1, 3)}[unit]
+    plural = unit + ('s' if number > 1 else '')
+    return (rng.choice([f"My notice period is {number} {plural}.", f"I can join in {number} {plural}.",
+                        f"I need {number} {plural} to join."]),
+            f"{number} {unit}", [])
+
+
+def ctc_answer(rng):
+    current = _amount(rng, 3, 30)
+    expected = f"{float(current) * rng.choice([1.2, 1.3, 1.5]) // 0.5 * 0.5:g}"
+    kind = rng.choice(['lakh', 'lpa', 'k', 'current-only', 'range', 'earning'])
+    if kind == 'lakh':
+        text = f"My current CTC is {current} lakh and I am expecting {expected} lakh."
+    elif kind == 'lpa':
+        text = f"I am getting {current} LPA right now and looking for {expected} LPA."
+    elif kind == 'earning':
+        text = f"I am earning {current} lakhs, and I expect {expected} lakhs."
+    elif kind == 'k':
+        current_k, expected_k = f"{float(current) * 100:g}", f"{float(expected) * 100:g}"
+        return (f"Currently {current_k} k, expected {expected_k} k per annum.",
+                {'current_ctc': _lpa(current_k, 100), 'expected_ctc': _lpa(expected_k, 100)}, ['thousands'])
+    elif kind == 'current-only':
+        return f"My current CTC is {current} lakhs.", {'current_ctc': _lpa(current)}, []
+    else:
+        return (f"Somewhere between {current} and {expected} lakhs.",
+                {'current_ctc': _lpa(current), 'expected_ctc': _lpa(expected)}, ['range'])
+    return text, {'current_ctc': _lpa(current), 'expected_ctc': _lpa(expected)}, []
+
+
+def availability_answer(rng):
+    kind = rng.choice(['weekday-minutes', 'weekday-hour', 'relative-period', 'date-oclock', '24h'])
+    if kind == 'weekday-minutes':
+        day, hour, ampm = rng.choice(WEEKDAYS), rng.randint(1, 11), rng.choice(['am', 'pm'])
+        minute = rng.choice(['00', '15', '30', '45'])
+        return (f"I am available on {day} at {hour}:{minute} {ampm}.",
+                {'day': day.lower(), 'time': f"{hour}:{minute} {ampm.upper()}"}, ['minutes-with-ampm'])
+    if kind == 'weekday-hour':
+        day, hour, ampm = rng.choice(WEEKDAYS), rng.randint(1, 11), rng.choice(['am', 'pm'])
+        return f"{day} at {hour} {ampm} is fine.", {'day': day.lower(), 'time': f"{hour}:00 {ampm.upper()}"}, []
+    if kind == 'relative-period':
+        day, period = rng.choice(['tomorrow', 'day after tomorrow']), rng.choice(list(PERIODS))
+        return f"{day.capitalize()} {period} works for me.", {'day': day, 'time': PERIODS[period]}, []
+    if kind == 'date-oclock':
+        date, month, hour = rng.randint(1, 28), rng.choice(MONTHS), rng.randint(8, 12)
+        ampm = 'AM' if hour <= 11 else 'PM'
+        return (f"How about the {date}{_suffix(date)} of {month} around {hour} o'clock?",
+                {'day': f"{date} {month.lower()}", 'time': f"{hour}:00 {ampm}"}, [])
+    hour = rng.randint(13, 18)
+    return (f"Next week, any time after {hour}:00 hours.",
+            {'day': 'next week', 'time': f"{hour - 12}:00 PM"}, [])
+
+
+def interest_answer(rng):
+    kind = rng.choice(['yes', 'yes', 'no', 'know'])
+    if kind == 'yes':
+        return rng.choice(["Yes, I am interested.", "Sure, sounds good.", "I would love to."]), 'Yes', []
+    if kind == 'no':
+        if rng.random() < 0.5:
+            return "No, I am not interested.", 'No', ['negated-positive']
+        return "Not at this time, thanks.", 'No', []
+    return "I know this is a great opportunity and I am keen.", 'Yes', ['substring-negation']
+
+
+# Number words by value, the inverse of spoken_numbers' tables
+_NUMBER_WORDS = {value: word for table in (UNITS, TEENS, TENS) for word, value in table.items()}
+_ORDINAL_WORDS = {value: word for table in (ORDINALS, TENS_ORDINALS) for word, value in table.items()}
+
+
+def _spell(number):
+    """An integer below a million in words ("one hundred and fifty")"""
+    if number >= 1000:
+        rest = number % 1000
+        return f"{_spell(number // 1000)} thousand" + (f" {_spell(rest)}" if rest else '')
+    if number >= 100:
+        rest = number % 100
+        return f"{_NUMBER_WORDS[number // 100]} hundred" + (f" and {_spell(rest)}" if rest else '')
+    if number in _NUMBER_WORDS:
+        return _NUMBER_WORDS[number]
+    return f"{_NUMBER_WORDS[number // 10 * 10]} {_NUMBER_WORDS[number % 10]}"
+
+
+def _spell_ordinal(number):
+    if number in _ORDINAL_WORDS:
+        return _ORDINAL_WORDS[number]
+    return f"{_NUMBER_WORDS[number // 10 * 10]} {_ORDINAL_WORDS[number % 10]}"
+
+
+def _spell_clock(match):
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if minute:
+        return f"{_spell(hour)} {_spell(minute)}"
+    # "14:00 hours" is said "fourteen hundred hours"
+    return f"{_spell(hour)} hundred" if hour > 12 else _spell(hour)
+
+
+def _spell_decimal(match):
+    whole, _, fraction = match.group(0).partition('.')
+    return ' '.join([_spell(int(whole))] + (['point'] + [_NUMBER_WORDS[int(digit)] for digit in fraction]
+                                             if fraction else []))
+
+
+def vosk_transcript(text):
+    """An answer as Vosk writes it: lowercase, unpunctuated, numbers spelled out"""
+    text = text.lower()
+    text = re.sub(r'(\d{1,2}):(\d{2})', _spell_clock, text)
+    text = re.sub(r'(\d+)(?:st|nd|rd|th)\b', lambda match: _spell_ordinal(int(match.group(1))), text)
+    text = re.sub(r'\d+(?:\.\d+)?', _spell_decimal, text)
+    return ' '.join(re.sub(r"[^\w\s']", ' ', text).split())
+
+
+def answer(rng, context):
+    """Return (text, expected entities, tags) for one answer to a question context"""
+    if context == 'interest':
+        text, notice, tags = notice_answer(rng)
+        return text, {'notice_period': notice}, tags
+    if context == 'compensation':
+        return ctc_answer(rng)
+    if context == 'available':
+        text, availability, tags = availability_answer(rng)
+        return text, {'availability': availability}, tags
+    parts = [interest_answer(rng), notice_answer(rng), ctc_answer(rng), availability_answer(rng)]
+    expected = {'interested': parts[0][1], 'notice_period': parts[1][1]}
+    expected.update(parts[2][1])
+    expected['availability'] = parts[3][1]
+    return ' '.join(part[0] for part in parts), expected, sorted({tag for part in parts for tag in part[2]})
+
+
+def generate(count=60, seed=1234):
+    """Return `count` answers, spread evenly over the question contexts"""
+    rng = random.Random(seed)
+    records = []
+    for index in range(count):
+        context = CONTEXTS[index % len(CONTEXTS)]
+        text, expected, tags = answer(rng, context)
+        records.append({'id': f"a{index:04d}", 'questionContext': context, 'text': text,
+                        'expected': expected, 'tags': tags})
+    return records
+
+
+def score(records, results):
+    """Compare extraction results with the records' expected entities
+
+    Returns the share of records extracted exactly, the share of correct
+    values per entity field, and the exact-match share per tag.
+    """
+    exact = 0
+    fields = {}
+    tags = {}
+    for record, result in zip(records, results):
+        expected = record['expected']
+        matched = result == expected
+        exact += matched
+        for field in set(expected) | set(result):
+            hits, total = fields.get(field, (0, 0))
+            fields[field] = (hits + (result.get(field) == expected.get(field)), total + 1)
+        for tag in record.get('tags', []):
+            hits, total = tags.get(tag, (0, 0))
+            tags[tag] = (hits + matched, total + 1)
+    return {
+        'exact': round(exact / max(1, len(records)), 4),
+        'fields': {field: round(hits / total, 4) for field, (hits, total) in sorted(fields.items())},
+        'tags': {tag: round(hits / total, 4) for tag, (hits, total) in sorted(tags.items())},
+    }
+
+
+def speech_pcm(text, rng):
+    """Speech-like 16kHz mono samples as long as the answer would take to say"""
+    seconds = max(1.5, SECONDS_PER_WORD * len(text.split()))
+    samples = synthetic_speech(seconds).astype(np.float64)
+    # Unique per answer, so content-addressed caches never see two identical recordings
+    samples += rng.normal(0, 30, len(samples))
+    lead = rng.normal(0, 30, int(0.3 * SAMPLE_RATE))
+    return np.concatenate([lead, samples, lead[::-1]]).clip(-32768, 32767).astype('<i2')
+
+
+def spoken_pcm(text, voice):
+    """16kHz mono samples of the answer read out by a TTS engine (tts.ENGINES)"""
+    pcm = wav_to_pcm(voice.synthesize(text))
+    if pcm is None:
+        raise Exception(f"Unsupported WAV layout from TTS engine {voice.model_id}")
+    return np.frombuffer(pcm, dtype='<i2')
+
+
+def write_wav(path, samples, rate=SAMPLE_RATE, channels=1):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(SAMPLE_WIDTH)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+
+
+def write_fixtures(records, output_dir, formats=tuple(FORMATS), seed=1234, voice=None):
+    """Render audio for every record into output_dir and write corpus.jsonl there
+
+    `voice` is a TTS engine to read the answers out with; by default the
+    audio is speech-like noise.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for record in records:
+        samples = spoken_pcm(record['text'], voice) if voice is not None else speech_pcm(record['text'], rng)
+        base = os.path.join(output_dir, record['id'])
+        record['audio'] = {}
+        record['audioSeconds'] = round(len(samples) / SAMPLE_RATE, 3)
+        write_wav(base + FORMATS['wav'], samples)
+        if 'wav' in formats:
+            record['audio']['wav'] = record['id'] + FORMATS['wav']
+        if 'wav44' in formats:
+            positions = np.arange(int(len(samples) * 44100 / SAMPLE_RATE)) * SAMPLE_RATE / 44100
+            resampled = np.interp(positions, np.arange(len(samples)), samples).astype('<i2')
+            write_wav(base + FORMATS['wav44'], np.repeat(resampled, 2), rate=44100, channels=2)
+            record['audio']['wav44'] = record['id'] + FORMATS['wav44']
+        if 'wav8k' in formats:
+            write_wav(base + FORMATS['wav8k'], samples[::2], rate=8000)
+            record['audio']['wav8k'] = record['id'] + FORMATS['wav8k']
+        if 'webm' in formats:
+            subprocess.run(['ffmpeg', '-loglevel', 'error', '-y', '-i', base + FORMATS['wav'],
+                            '-c:a', 'libopus', '-b:a', '32k', base + FORMATS['webm']], check=True)
+            record['audio']['webm'] = record['id'] + FORMATS['webm']
+        if 'wav' not in formats:
+            os.remove(base + FORMATS['wav'])
+    with open(os.path.join(output_dir, 'corpus.jsonl'), 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return records
+
+
+def load_fixtures(fixture_dir):
+    with open(os.path.join(fixture_dir, 'corpus.jsonl')) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='directory for corpus.jsonl and the audio files')
+    parser.add_argument('--count', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--formats', default=','.join(FORMATS))
+    parser.add_argument('--voice', default='synthetic', help="'synthetic' or a tts.ENGINES name to read answers out")
+    args = parser.parse_args()
+
+    voice = None
+    if args.voice != 'synthetic':
+        import tts
+        voice = tts.get_engine(args.voice)
+    records = write_fixtures(generate(args.count, args.seed), args.output, args.formats.split(','), args.seed, voice)
+    seconds = sum(record['audioSeconds'] for record in records)
+    print(f"Wrote {len(records)} answers ({seconds:.0f}s of audio per format) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
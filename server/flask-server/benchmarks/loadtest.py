@@ -0,0 +1,297 @@
+"""Concurrent load test of /process-speech, /tts and /health.
+
+Sends a weighted mix of requests (--mix) for --duration seconds, either
+open-loop at --rate requests/s (Poisson arrivals, independent of how fast
+the server answers) or closed-loop with --concurrency clients that each
+send their next request as soon as the previous one returns. /process-speech
+uploads cycle through the corpus fixtures (benchmarks.corpus) in --format.
+
+Without --url the app is started in-process on a threaded HTTP server, with
+node_stub standing in for the Node.js server (--node-latency,
+--node-failure-rate) and the recognizer replaced by one that takes --rtf
+seconds per audio second without holding the GIL (--engine real keeps the
+configured ASR and TTS engines; the simulated voice renders with the same
+--rtf into a memory-only TTS cache). The transcript cache is off unless --cache is given,
+since the fixtures repeat.
+
+Give several comma-separated values to --rate or --concurrency to sweep the
+load: each step reports throughput, p50/p95/p99 latency per endpoint and
+errors by status code or exception. The first step where the server falls
+behind the offered load (open loop: latency of the last quarter of arrivals
+more than twice that of the first quarter, i.e. a queue is building up),
+misses --slo-ms at p99 or fails more than --max-error-rate of requests is
+reported as the saturation point. Open-loop latencies are measured from each
+request's scheduled start, so time spent waiting behind a slow server is
+counted.
+
+Run from server/flask-server:
+    python -m benchmarks.loadtest --rate 5,10,20,40 [--duration 20] [--mix process-speech:8,tts:1,health:1]
+    python -m benchmarks.loadtest --concurrency 1,4,16 --url http://localhost:5000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmarks.corpus import generate, load_fixtures, write_fixtures
+
+TTS_PROMPTS = [
+    "Are you interested in this role?",
+    "What is your current and expected CTC?",
+    "When are you available for an interview?",
+]
+
+
+class Client:
+    """Sends one request of a given kind; one pooled session per thread"""
+
+    def __init__(self, url, records, fixture_dir, audio_format, timeout):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.uploads = []
+        for record in records:
+            filename = record['audio'][audio_format]
+            with open(os.path.join(fixture_dir, filename), 'rb') as f:
+                self.uploads.append((record, filename, f.read()))
+        self._next = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        return session
+
+    def send(self, kind):
+        """Return the status code, or the exception's class name"""
+        session = self._session()
+        try:
+            if kind == 'process-speech':
+                with self._lock:
+                    record, filename, audio = self.uploads[self._next % len(self.uploads)]
+                    self._next += 1
+                response = session.post(f"{self.url}/process-speech", timeout=self.timeout, data={
+                    'candidateId': record['id'], 'questionContext': record['questionContext']
+                }, files={'audio': (filename, audio)})
+            elif kind == 'tts':
+                response = session.post(f"{self.url}/tts", json={'text': random.choice(TTS_PROMPTS)},
+                                        timeout=self.timeout)
+            else:
+                response = session.get(f"{self.url}/health", timeout=self.timeout)
+            response.content  # Read the whole body, streamed or not
+            return response.status_code
+        except requests.exceptions.RequestException as e:
+            return type(e).__name__
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition(':')
+        if kind not in ('process-speech', 'tts', 'health'):
+            raise SystemExit(f"Unknown endpoint in --mix: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def run_step(client, mix, duration, rate=None, concurrency=None, seed=0):
+    """Run one load level and return ([(kind, outcome, latency, scheduled start)], elapsed seconds)"""
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    results = []
+    results_lock = threading.Lock()
+
+    def one(kind, scheduled):
+        outcome = client.send(kind)
+        latency = time.perf_counter() - scheduled
+        with results_lock:
+            results.append((kind, outcome, latency, scheduled))
+
+    start = time.perf_counter()
+    end = start + duration
+    if rate is not None:
+        # Open loop: arrivals follow the schedule whatever the server does
+        with ThreadPoolExecutor(max_workers=256, thread_name_prefix='load') as executor:
+            scheduled = start
+            while True:
+                scheduled += rng.expovariate(rate)
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(one, rng.choices(kinds, weights)[0], scheduled)
+    else:
+        def worker(worker_rng):
+            while time.perf_counter() < end:
+                one(worker_rng.choices(kinds, weights)[0], time.perf_counter())
+        threads = [threading.Thread(target=worker, args=(random.Random(seed + i),)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed, duration):
+    def percentiles(latencies):
+        if not latencies:
+            return {}
+        ms = np.array(latencies) * 1000
+        return {f"p{q}_ms": round(float(np.percentile(ms, q)), 1) for q in (50, 95, 99)}
+
+    summary = {'requests': len(results), 'offered': round(len(results) / duration, 2),
+               'throughput': round(len(results) / elapsed, 2),
+               'ok': sum(1 for _, outcome, _, _ in results if outcome == 200), 'endpoints': {}, 'errors': {}}
+    summary.update(percentiles([latency for _, _, latency, _ in results]))
+    for kind in sorted({kind for kind, _, _, _ in results}):
+        latencies = [latency for k, outcome, latency, _ in results if k == kind and outcome == 200]
+        summary['endpoints'][kind] = dict(percentiles(latencies),
+                                          requests=sum(1 for k, _, _, _ in results if k == kind))
+    for kind, outcome, _, _ in results:
+        if outcome != 200:
+            key = f"{kind} {outcome}"
+            summary['errors'][key] = summary['errors'].get(key, 0) + 1
+    summary['error_rate'] = round(1 - summary['ok'] / max(1, len(results)), 4)
+
+    # A server that keeps up answers late arrivals as fast as early ones; one
+    # that falls behind builds a queue, so latency grows over the step
+    by_start = [latency for _, _, latency, _ in sorted(results, key=lambda result: result[3])]
+    quarter = len(by_start) // 4
+    if quarter:
+        summary['latency_growth'] = round(float(np.median(by_start[-quarter:]) / np.median(by_start[:quarter])), 2)
+    return summary
+
+
+def start_local_server(args):
+    """Start the app on a threaded HTTP server, with node_stub as the Node.js server"""
+    import logging
+    from werkzeug.serving import make_server
+    from node_stub import NodeStub
+    from benchmarks.bench_chunked import SimulatedEngine
+    from benchmarks.bench_tts import SimulatedVoice
+
+    stub = NodeStub(port=0, latency=args.node_latency, failure_rate=args.node_failure_rate).start()
+    os.environ.update(NODE_URL=stub.url, NODE_SPOOL_PATH=os.path.join(tempfile.mkdtemp(), 'spool.jsonl'))
+    if not args.cache:
+        os.environ['TRANSCRIPT_CACHE_MB'] = '0'
+    if not args.server_logs:
+        logging.disable(logging.CRITICAL)
+
+    import asr
+    import tts
+    if args.engine == 'simulated':
+        asr.ENGINES[asr.ASR_ENGINE] = lambda: SimulatedEngine(args.rtf)
+        asr._engines.pop(asr.ASR_ENGINE, None)
+        tts.ENGINES[tts.TTS_ENGINE] = lambda: SimulatedVoice(args.rtf)
+        os.environ['TTS_CACHE_DIR'] = ''
+    import app
+
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", stub, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_mutually_exclusive_group(required=True)
+    load.add_argument('--rate', help='open-loop arrival rate(s) in requests/s, e.g. 5,10,20')
+    load.add_argument('--concurrency', help='number(s) of closed-loop clients, e.g. 1,4,16')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per load step')
+    parser.add_argument('--mix', default='process-speech:8,tts:1,health:1', help='endpoint:weight pairs')
+    parser.add_argument('--url', help='server to test (default: start the app in-process)')
+    parser.add_argument('--fixtures', help='directory written by benchmarks.corpus (default: generate one)')
+    parser.add_argument('--format', default='webm', help='fixture format to upload')
+    parser.add_argument('--count', type=int, default=40, help='answers to generate without --fixtures')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--timeout', type=float, default=30, help='client timeout per request')
+    parser.add_argument('--engine', choices=['simulated', 'real'], default='simulated')
+    parser.add_argument('--rtf', type=float, default=0.1, help='real-time factor of the simulated recognizer')
+    parser.add_argument('--node-latency', type=float, default=0.05)
+    parser.add_argument('--node-failure-rate', type=float, default=0.0)
+    parser.add_argument('--cache', action='store_true', help='keep the transcript cache on')
+    parser.add_argument('--server-logs', action='store_true', help='show the in-process server\'s logs')
+    parser.add_argument('--slo-ms', type=float, default=5000, help='p99 latency above which a step is saturated')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--output', help='also write the report as JSON')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    fixture_dir = args.fixtures
+    if fixture_dir:
+        records = load_fixtures(fixture_dir)
+    else:
+        fixture_dir = tempfile.mkdtemp(prefix='speech-fixtures-')
+        records = write_fixtures(generate(args.count, args.seed), fixture_dir, [args.format], args.seed)
+
+    stub = None
+    url = args.url
+    if url is None:
+        url, stub, _ = start_local_server(args)
+    client = Client(url, records, fixture_dir, args.format, args.timeout)
+    if not args.fixtures:
+        shutil.rmtree(fixture_dir, ignore_errors=True)  # Uploads are held in memory from here on
+
+    mode = 'rate' if args.rate else 'concurrency'
+    levels = [float(value) for value in (args.rate or args.concurrency).split(',')]
+    print(f"{url}  mix {args.mix}  {args.duration:g}s per step", file=sys.stderr)
+    print(f"{mode:>11} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  per endpoint p99 ms")
+
+    steps = []
+    saturation = None
+    for level in levels:
+        if mode == 'rate':
+            results, elapsed = run_step(client, mix, args.duration, rate=level, seed=args.seed)
+        else:
+            results, elapsed = run_step(client, mix, args.duration, concurrency=int(level), seed=args.seed)
+        summary = summarize(results, elapsed, args.duration)
+        summary[mode] = level
+        reasons = []
+        if mode == 'rate' and summary.get('latency_growth', 1) > 2:
+            reasons.append(f"latency grew {summary['latency_growth']:g}x during the step")
+        if summary.get('p99_ms', 0) > args.slo_ms:
+            reasons.append(f"p99 above {args.slo_ms:g}ms")
+        if summary['error_rate'] > args.max_error_rate:
+            reasons.append(f"error rate {summary['error_rate']:.1%}")
+        summary['saturated'] = reasons
+        if reasons and saturation is None:
+            saturation = level
+        steps.append(summary)
+
+        per_endpoint = ' '.join(f"{kind}={stats.get('p99_ms', '-')}" for kind, stats in summary['endpoints'].items())
+        print(f"{level:>11g} {summary['throughput']:>7.1f} {summary.get('p50_ms', 0):>8.1f} "
+              f"{summary.get('p95_ms', 0):>8.1f} {summary.get('p99_ms', 0):>8.1f} {summary['error_rate']:>7.1%}  "
+              f"{per_endpoint}{'  SATURATED: ' + ', '.join(reasons) if reasons else ''}")
+        for key, count in sorted(summary['errors'].items()):
+            print(f"{'':>11} {count:>7} x {key}")
+
+    sustainable = [step['throughput'] for step in steps if not step['saturated']]
+    report = {
+        'url': url, 'mix': mix, 'duration': args.duration, 'mode': mode, 'steps': steps,
+        'saturation_point': saturation,
+        'max_sustainable_throughput': max(sustainable) if sustainable else None,
+    }
+    if stub is not None:
+        report['node_stub'] = {'requests': stub.requests, 'failures': stub.failures, 'received': len(stub.received),
+                               'latency': args.node_latency, 'failure_rate': args.node_failure_rate}
+    print(f"\nSaturation point: {saturation if saturation is not None else 'not reached'} ({mode}); "
+          f"max sustainable throughput: {report['max_sustainable_throughput']} req/s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
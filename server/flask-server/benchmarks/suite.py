@@ -0,0 +1,316 @@
+"""Reproducible benchmark suite with machine-readable results.
+
+Uses the seeded corpus from benchmarks.corpus (generated into a temporary
+directory, or --fixtures from an earlier `python -m benchmarks.corpus`) and
+measures:
+
+  entities  extract_entities calls/s per question context, plus accuracy
+            against the corpus' expected entities (overall, per field, per tag),
+            also on the answers as Vosk writes them (vosk_transcript) after
+            the Vosk engine's digits_from_words
+  ctc       standardize_ctc_value calls/s over spoken CTC amounts and units
+  ffmpeg    conversion latency per fixture format, through pipes and through
+            temporary files
+  decode    the decoding the pipeline actually does per fixture format (WAV
+            in-process: passed through or resampled with NumPy; anything
+            else through FFmpeg) against always spawning FFmpeg
+  e2e       POST /process-speech through the Flask test client per fixture
+            format, with an in-process Node stand-in (node_stub) receiving the
+            forwarded results. Recognition is replaced by an engine that
+            answers with the corpus text, so the numbers cover everything
+            except the recognizer itself, and the transcript and entity
+            caches are off.
+
+Results are written as JSON (--output) together with the commit, Python
+version and relevant settings; --compare prints the change of every number
+against an earlier results file.
+
+Run from server/flask-server:
+    python -m benchmarks.suite --output results.json [--compare baseline.json] [--only entities,ctc]
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from audio_decode import convert_to_wav, decode_to_pcm, iter_wav_chunks, load_pcm, wav_to_pcm
+from entity_engine import extract_entities, standardize_ctc_value
+from spoken_numbers import digits_from_words
+from benchmarks.corpus import CONTEXTS, FORMATS, generate, load_fixtures, score, vosk_transcript, write_fixtures
+
+SECTIONS = ('entities', 'ctc', 'ffmpeg', 'decode', 'e2e')
+
+
+def latency_summary(seconds):
+    ms = np.array(seconds) * 1000
+    return {
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def calls_per_second(func, items, seconds):
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for item in items:
+            func(*item)
+        calls += len(items)
+    return round(calls / (time.perf_counter() - start), 1)
+
+
+def bench_entities(records, args):
+    rates = {}
+    for context in CONTEXTS + ('all',):
+        items = [(record['text'], record['questionContext']) for record in records
+                 if context in ('all', record['questionContext'])]
+        rates[context] = calls_per_second(extract_entities, items, args.seconds)
+    results = [extract_entities(record['text'], record['questionContext']) for record in records]
+    vosk_results = [extract_entities(digits_from_words(vosk_transcript(record['text'])), record['questionContext'])
+                    for record in records]
+    return {'calls_per_second': rates, 'accuracy': score(records, results),
+            'vosk_accuracy': score(records, vosk_results)}
+
+
+def ctc_inputs(seed, count=200):
+    rng = random.Random(seed)
+    units = ['lakh', 'lakhs', 'LPA', 'L', 'k', '', 'per annum']
+    inputs = []
+    for _ in range(count):
+        unit = rng.choice(units)
+        value = rng.randrange(300, 3000) if unit == 'k' else rng.randrange(6, 60) / 2
+        inputs.append((f"{value:g}", unit))
+    inputs.append(('eight', 'lakh'))  # Unparseable amounts are passed through
+    return inputs
+
+
+def bench_ctc(records, args):
+    inputs = ctc_inputs(args.seed)
+    return {'calls_per_second': calls_per_second(standardize_ctc_value, inputs, args.seconds),
+            'inputs': len(inputs)}
+
+
+def bench_ffmpeg(records, args):
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        wav_path = os.path.join(temp_dir, 'output.wav')
+        for name in args.formats:
+            pipe, temp = [], []
+            audio_seconds = 0.0
+            for _ in range(args.repeats):
+                for record in records:
+                    path = os.path.join(args.fixtures, record['audio'][name])
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    start = time.perf_counter()
+                    decode_to_pcm(data)
+                    pipe.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    convert_to_wav(path, wav_path)
+                    for _ in iter_wav_chunks(wav_path):
+                        pass
+                    temp.append(time.perf_counter() - start)
+                    audio_seconds += record['audioSeconds']
+            results[name] = {
+                'pipe': dict(latency_summary(pipe), realtime_factor=round(sum(pipe) / audio_seconds, 5)),
+                'tempfile': dict(latency_summary(temp), realtime_factor=round(sum(temp) / audio_seconds, 5)),
+            }
+    return results
+
+
+def bench_decode(records, args):
+    results = {}
+    for name in args.formats:
+        uploads = []
+        for record in records:
+            with open(os.path.join(args.fixtures, record['audio'][name]), 'rb') as f:
+                uploads.append(f.read())
+        audio_seconds = sum(record['audioSeconds'] for record in records) * args.repeats
+        timings = {'probed': [], 'ffmpeg': []}
+        for _ in range(args.repeats):
+            for data in uploads:
+                for mode, decode in (('probed', load_pcm), ('ffmpeg', decode_to_pcm)):
+                    start = time.perf_counter()
+                    decode(data)
+                    timings[mode].append(time.perf_counter() - start)
+        results[name] = {mode: dict(latency_summary(seconds), realtime_factor=round(sum(seconds) / audio_seconds, 5))
+                         for mode, seconds in timings.items()}
+        results[name]['in_process'] = wav_to_pcm(uploads[0]) is not None
+        results[name]['speedup'] = round(sum(timings['ffmpeg']) / sum(timings['probed']), 2)
+    return results
+
+
+class CorpusEngine:
+    """Stands in for the recognizer: answers with the corpus text of the upload being processed"""
+    name = 'corpus'
+    model_id = 'corpus'
+    local = True
+    current = threading.local()
+
+    def transcribe(self, pcm_chunks):
+        for _ in pcm_chunks:
+            pass
+        return self.current.text
+
+
+def bench_e2e(records, args):
+    from node_stub import NodeStub
+
+    stub = NodeStub(port=0, latency=args.node_latency).start()
+    spool_dir = tempfile.mkdtemp()
+    # The app reads these at import
+    os.environ.update(NODE_URL=stub.url, NODE_SPOOL_PATH=os.path.join(spool_dir, 'spool.jsonl'),
+                      ASR_EXECUTION='inline', TRANSCRIPT_CACHE_MB='0', ENTITY_CACHE_SIZE='0')
+    logging.disable(logging.INFO)
+
+    import asr
+    asr.ENGINES[asr.ASR_ENGINE] = CorpusEngine
+    asr._engines.pop(asr.ASR_ENGINE, None)
+    import app
+    client = app.app.test_client()
+
+    results = {}
+    sent = 0
+    try:
+        for name in args.formats:
+            latencies, statuses, extracted = [], {}, []
+            start_all = time.perf_counter()
+            for record in records:
+                with open(os.path.join(args.fixtures, record['audio'][name]), 'rb') as f:
+                    data = f.read()
+                CorpusEngine.current.text = record['text']
+                start = time.perf_counter()
+                response = client.post('/process-speech', data={
+                    'audio': (io.BytesIO(data), record['audio'][name]),
+                    'candidateId': record['id'],
+                    'questionContext': record['questionContext'],
+                }, content_type='multipart/form-data')
+                latencies.append(time.perf_counter() - start)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                body = response.get_json() or {}
+                extracted.append(body.get('entities', {}))
+            elapsed = time.perf_counter() - start_all
+            sent += len(records)
+            results[name] = dict(latency_summary(latencies), requests_per_second=round(len(records) / elapsed, 2),
+                                 statuses=statuses, entity_accuracy=score(records, extracted)['exact'])
+
+        flush_start = time.perf_counter()
+        app.node_forwarder.flush(timeout=60)
+        results['node'] = {'forwarded': sent, 'received': len(stub.received),
+                           'drain_seconds': round(time.perf_counter() - flush_start, 3)}
+    finally:
+        stub.stop()
+    return results
+
+
+BENCHMARKS = {'entities': bench_entities, 'ctc': bench_ctc, 'ffmpeg': bench_ffmpeg, 'decode': bench_decode,
+              'e2e': bench_e2e}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (subprocess.SubprocessError, FileNotFoundError):
+        return None, None
+
+
+def flatten(data, prefix=''):
+    """Yield (dotted key, value) for every number in nested results"""
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(baseline, current):
+    old = dict(flatten(baseline['results']))
+    print(f"\nChange against {baseline['meta'].get('commit') or 'baseline'}:", file=sys.stderr)
+    for key, value in flatten(current['results']):
+        if key in old:
+            change = f"{(value - old[key]) / old[key] * 100:+7.1f}%" if old[key] else '    n/a'
+            print(f"  {key:<50} {old[key]:>12g} -> {value:>12g} {change}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='write results as JSON to this file (default: stdout)')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--only', default=','.join(SECTIONS), help='comma-separated sections to run')
+    parser.add_argument('--fixtures', help='directory written by benchmarks.corpus (default: generate one)')
+    parser.add_argument('--count', type=int, default=60, help='answers to generate without --fixtures')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--formats', default=','.join(FORMATS), help='audio formats for ffmpeg, decode and e2e')
+    parser.add_argument('--seconds', type=float, default=1.0, help='time budget per micro-benchmark')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='passes over the fixtures in the ffmpeg and decode sections')
+    parser.add_argument('--node-latency', type=float, default=0.0, help='seconds the Node stand-in takes per request')
+    args = parser.parse_args()
+    args.formats = args.formats.split(',')
+    sections = args.only.split(',')
+
+    generated = None
+    if args.fixtures:
+        records = load_fixtures(args.fixtures)
+    elif {'ffmpeg', 'decode', 'e2e'} & set(sections):
+        args.fixtures = generated = tempfile.mkdtemp(prefix='speech-fixtures-')
+        records = write_fixtures(generate(args.count, args.seed), args.fixtures, args.formats, args.seed)
+    else:
+        records = generate(args.count, args.seed)
+
+    commit, dirty = git_commit()
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit,
+            'dirty': dirty,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed': args.seed,
+            'answers': len(records),
+            'settings': {key: os.getenv(key) for key in ('AUDIO_PIPELINE', 'VAD_ENABLED', 'CHUNKED_ASR', 'ASR_ENGINE')},
+        },
+        'results': {},
+    }
+    try:
+        for section in sections:
+            print(f"Running {section}...", file=sys.stderr)
+            report['results'][section] = BENCHMARKS[section](records, args)
+    finally:
+        if generated:
+            shutil.rmtree(generated, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
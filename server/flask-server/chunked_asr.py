@@ -0,0 +1,126 @@
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from audio_decode import SAMPLE_RATE, SAMPLE_WIDTH, iter_bytes_chunks
+from vad import FRAME_MS, frame_levels, speech_frames
+
+# Parallel recognition of long recordings
+#
+# A "full conversation" answer can run for minutes, and recognizing it in one
+# pass makes latency grow with its length. Long PCM is split into segments
+# of at most CHUNK_MAX_SECONDS, cutting at the quietest frame near the end of
+# each segment. A cut that lands in silence needs nothing else; a cut forced
+# inside speech gives both neighbours CHUNK_OVERLAP_MS of shared audio, and
+# the words repeated across the overlap are removed when the segment
+# transcripts are stitched back together in order. Segments are recognized
+# on threads: the Google engine waits on the network and Vosk releases the
+# GIL inside Kaldi, so both run concurrently.
+
+CHUNKED_ASR = os.getenv('CHUNKED_ASR', 'false').lower() in ('1', 'true', 'yes')
+# Only recordings longer than this are split
+CHUNK_MIN_AUDIO_SECONDS = float(os.getenv('CHUNK_MIN_AUDIO_SECONDS', 30))
+CHUNK_MAX_SECONDS = float(os.getenv('CHUNK_MAX_SECONDS', 15))
+CHUNK_OVERLAP_MS = int(os.getenv('CHUNK_OVERLAP_MS', 500))
+CHUNK_WORKERS = int(os.getenv('CHUNK_WORKERS', 4))
+
+# Longest run of words looked for when de-duplicating an overlap
+MAX_OVERLAP_WORDS = 8
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+log = logging.getLogger(__name__)
+
+
+def split_segments(pcm, max_seconds=CHUNK_MAX_SECONDS, overlap_ms=CHUNK_OVERLAP_MS):
+    """Split PCM into (start, end, overlapped) byte ranges at quiet points
+
+    `overlapped` is True when the segment starts inside speech and shares
+    its first overlap_ms with the previous segment.
+    """
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    frame_bytes = frame_len * SAMPLE_WIDTH
+    samples = np.frombuffer(pcm, dtype='<i2')
+    levels = frame_levels(samples, frame_len)
+    speech = speech_frames(levels)
+
+    max_frames = max(2, int(max_seconds * 1000 // FRAME_MS))
+    overlap_frames = overlap_ms // FRAME_MS
+    total_frames = -(-len(pcm) // frame_bytes)
+
+    segments = []
+    start, overlapped = 0, False
+    while total_frames - start > max_frames:
+        # Cut at the quietest frame in the second half of the window
+        window = levels[start + max_frames // 2:start + max_frames]
+        cut = start + max_frames // 2 + int(np.argmin(window))
+        if speech[cut]:
+            segments.append((start * frame_bytes, min(len(pcm), (cut + overlap_frames) * frame_bytes), overlapped))
+            start, overlapped = max(start + 1, cut - overlap_frames), True
+        else:
+            segments.append((start * frame_bytes, cut * frame_bytes, overlapped))
+            start, overlapped = cut, False
+    segments.append((start * frame_bytes, len(pcm), overlapped))
+    return segments
+
+
+def _words(text):
+    return re.findall(r"[\w']+", text.lower())
+
+
+def stitch(texts, overlapped):
+    """Join segment transcripts in order, dropping words repeated across overlaps"""
+    words = []
+    for text, shared in zip(texts, overlapped):
+        new = text.split()
+        if shared and words and new:
+            previous = _words(' '.join(words[-MAX_OVERLAP_WORDS:]))
+            current = _words(' '.join(new[:MAX_OVERLAP_WORDS]))
+            for size in range(min(len(previous), len(current)), 0, -1):
+                if previous[-size:] == current[:size]:
+                    new = new[size:]
+                    break
+        words.extend(new)
+    return ' '.join(words)
+
+
+def _transcribe_segment(engine, segment):
+    try:
+        return engine.transcribe(iter_bytes_chunks(segment)).strip()
+    except sr.UnknownValueError:
+        return ''
+
+
+def transcribe_chunked(engine, pcm, workers=CHUNK_WORKERS, max_seconds=CHUNK_MAX_SECONDS,
+                       overlap_ms=CHUNK_OVERLAP_MS):
+    """Recognize long PCM as parallel segments and return the stitched transcript
+
+    Raises sr.UnknownValueError when no segment was understood, like a
+    single-pass engine call.
+    """
+    segments = split_segments(pcm, max_seconds, overlap_ms)
+    view = memoryview(pcm)
+    pieces = [bytes(view[start:end]) for start, end, _ in segments]
+
+    if len(pieces) == 1 or workers <= 1:
+        texts = [_transcribe_segment(engine, piece) for piece in pieces]
+    else:
+        with _executors_lock:
+            executor = _executors.get(workers)
+            if executor is None:
+                # Created on first use so worker processes never inherit its threads
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asr-chunk')
+                _executors[workers] = executor
+        texts = list(executor.map(lambda piece: _transcribe_segment(engine, piece), pieces))
+        log.info(f"Recognized {len(pieces)} segments of up to {max_seconds:g}s on {workers} threads")
+
+    text = stitch(texts, [shared for _, _, shared in segments])
+    if not text:
+        raise sr.UnknownValueError()
+    return text
@@ -0,0 +1,379 @@
+import os
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+
+# Entity extraction engine
+#
+# Every rule is compiled exactly once, at import, into a single table shared
+# by all question contexts. A call lowercases the transcript once, then walks
+# only the rules its context needs, in priority order, stopping at the first
+# rule that matches. Rules carry cheap literal guards (a digit, a keyword) so
+# patterns that cannot match are never run. Results are identical to the
+# original per-pattern findall() cascade.
+#
+# ENTITY_ENGINE picks the engine the server uses: 'regex' (this module) or
+# 'spacy' (spacy_engine.py, token patterns in a spaCy pipeline). Both take
+# the same input and return the same entity schema.
+
+ENTITY_ENGINE = os.getenv('ENTITY_ENGINE', 'regex').lower()
+
+UNITS = r'day|days|week|weeks|month|months'
+CTC_UNITS = r'lakh|lakhs|lpa|k|L'
+CURRENCY = r'(?:inr|rs|₹)?'
+AMOUNT = r'\d+(?:\.\d+)?'
+MONTHS = (r'jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?'
+          r'|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?')
+
+POSITIVE_KEYWORDS = ["yes", "interested", "definitely", "absolutely", "sure", "of course", "certainly", "yeah", "yep", "positive"]
+NEGATIVE_KEYWORDS = ["no", "not interested", "don't think", "cannot", "nope", "negative", "pass", "decline"]
+POSITIVE_PHRASES = ["sounds good", "like to", "would love", "great opportunity"]
+NEGATIVE_PHRASES = ["not for me", "looking elsewhere", "other opportunities", "not at this time"]
+
+NUMBER_WORDS = {"one": "1", "two": "2", "three": "3", "four": "4", "five": "5", "six": "6"}
+TIME_OF_DAY = {"morning": "9:00 AM", "afternoon": "2:00 PM", "evening": "6:00 PM"}
+
+UNIT_WORDS = ('day', 'week', 'month')
+
+# A compiled rule. `digit` and `keywords` are necessary conditions checked
+# with plain substring tests before the regex runs.
+Rule = namedtuple('Rule', ['name', 'regex', 'digit', 'keywords'])
+
+
+def _keywords(words):
+    """Build a substring alternation equivalent to any(word in text for word in words)"""
+    return '|'.join(re.escape(word) for word in words)
+
+
+def _rule(name, pattern, digit=False, keywords=()):
+    return Rule(name, re.compile(pattern), digit, keywords)
+
+
+# Shared rule table, keyed by rule name
+RULES = {rule.name: rule for rule in [
+    # Interest level
+    _rule('interest_yes', _keywords(POSITIVE_KEYWORDS)),
+    _rule('interest_no', _keywords(NEGATIVE_KEYWORDS)),
+    _rule('interest_yes_phrase', _keywords(POSITIVE_PHRASES)),
+    _rule('interest_no_phrase', _keywords(NEGATIVE_PHRASES)),
+
+    # Notice period
+    _rule('notice_count', rf'(?P<number>\d+)\s*(?P<unit>{UNITS})', digit=True, keywords=UNIT_WORDS),  # e.g., "2 months", "30 days"
+    _rule('notice_words', rf'(?P<number>one|two|three|four|five|six)\s*(?P<unit>{UNITS})', keywords=UNIT_WORDS),  # e.g., "two weeks"
+    _rule('notice_immediate', r'immediate|immediately'),  # Immediate joining
+    _rule('notice_range', rf'(?P<start>\d+)\s*to\s*(?P<end>\d+)\s*(?P<unit>{UNITS})', digit=True, keywords=UNIT_WORDS),  # e.g., "2 to 3 months"
+
+    # Current CTC
+    _rule('ctc_current_stated', rf'current(?:\s*ctc)?\s*(?:is|of)?\s*{CURRENCY}\s*(?P<value>{AMOUNT})\s*(?P<unit>{CTC_UNITS})?',
+          digit=True),
+    _rule('ctc_current_earning', rf'(?:i\s*(?:am|m)\s*(?:getting|earning|making))\s*{CURRENCY}\s*(?P<value>{AMOUNT})\s*(?P<unit>{CTC_UNITS})?',
+          digit=True, keywords=('getting', 'earning', 'making')),
+    _rule('ctc_current_trailing', rf'{CURRENCY}\s*(?P<value>{AMOUNT})\s*(?P<unit>{CTC_UNITS})?\s*(?:per\s*annum|p\.?a\.?)?\s*(?:current|right now|at present)',
+          digit=True, keywords=('current', 'right now', 'at present')),
+
+    # Expected CTC
+    _rule('ctc_expected_stated', rf'expect(?:ed|ing)?(?:\s*ctc)?\s*(?:is|of)?\s*{CURRENCY}\s*(?P<value>{AMOUNT})\s*(?P<unit>{CTC_UNITS})?',
+          digit=True),
+    _rule('ctc_expected_looking', rf'looking\s*for\s*{CURRENCY}\s*(?P<value>{AMOUNT})\s*(?P<unit>{CTC_UNITS})?',
+          digit=True),
+    _rule('ctc_expected_trailing', rf'{CURRENCY}\s*(?P<value>{AMOUNT})\s*(?P<unit>{CTC_UNITS})?\s*(?:per\s*annum|p\.?a\.?)?\s*(?:expect|want|desired)',
+          digit=True, keywords=('expect', 'want', 'desired')),
+
+    # CTC fallbacks: "X to Y" / "X and Y", then bare numbers
+    _rule('ctc_range', rf'{CURRENCY}\s*(?P<first>{AMOUNT})\s*(?:{CTC_UNITS})?\s*(?:to|and)\s*{CURRENCY}\s*(?P<second>{AMOUNT})\s*(?:{CTC_UNITS})?',
+          digit=True, keywords=('to', 'and')),
+    _rule('ctc_number', rf'(?P<value>{AMOUNT})', digit=True),
+
+    # Days
+    _rule('day_name', r'\b(?P<value>monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b'),
+    _rule('day_abbrev', r'\b(?P<value>mon|tue|tues|wed|thu|thur|thurs|fri|sat|sun)\b'),
+    _rule('day_relative', r'\b(?P<value>tomorrow|day after tomorrow|next week)\b'),
+    _rule('day_date', rf'\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s*(?:of)?\s*(?P<month>{MONTHS})\b', digit=True),
+
+    # Times
+    _rule('time_24h', r'\b(?P<hour>\d{1,2})\s*(?::|\.)\s*(?P<minute>\d{2})\s*(?:hours|hrs|h)?\b',
+          digit=True, keywords=(':', '.')),  # 14:30, 2.30
+    _rule('time_ampm_minutes', r'\b(?P<hour>\d{1,2})\s*(?::|\.)\s*(?P<minute>\d{2})\s*(?P<ampm>am|pm)\b',
+          digit=True, keywords=(':', '.')),  # 2:30 pm
+    _rule('time_ampm', r'\b(?P<hour>\d{1,2})\s*(?P<ampm>am|pm)\b', digit=True, keywords=('am', 'pm')),  # 2pm
+    _rule('time_period', r'\b(?P<value>morning|afternoon|evening)\b'),  # morning, afternoon
+    _rule('time_oclock', r'\b(?P<hour>\d{1,2})\s*o\'?clock\b', digit=True, keywords=('clock',)),  # 2 o'clock
+]}
+
+INTEREST_RULES = ['interest_yes', 'interest_no', 'interest_yes_phrase', 'interest_no_phrase']
+NOTICE_RULES = ['notice_count', 'notice_words', 'notice_immediate', 'notice_range']
+CURRENT_CTC_RULES = ['ctc_current_stated', 'ctc_current_earning', 'ctc_current_trailing']
+EXPECTED_CTC_RULES = ['ctc_expected_stated', 'ctc_expected_looking', 'ctc_expected_trailing']
+DAY_RULES = ['day_name', 'day_abbrev', 'day_relative', 'day_date']
+TIME_RULES = ['time_24h', 'time_ampm_minutes', 'time_ampm', 'time_period', 'time_oclock']
+
+_DIGIT = re.compile(r'\d')
+
+
+def standardize_ctc_value(value, unit):
+    """Standardize CTC values to a consistent format"""
+    try:
+        value = float(value)
+
+        # Apply unit multiplier if needed
+        if unit and unit.lower() in ['lakh', 'lakhs', 'lpa', 'l']:
+            # Convert to lakhs format
+            return f"{value} LPA"
+        elif unit and unit.lower() in ['k']:
+            # Convert thousands to lakhs
+            return f"{value/100} LPA"
+        else:
+            # Assume it's already in lakhs if no unit
+            return f"{value} LPA"
+    except ValueError:
+        return value  # Return as is if conversion fails
+
+
+class Transcript:
+    """Lowercased transcript plus the per-call state shared by all rules"""
+
+    __slots__ = ('text', 'has_digit')
+
+    def __init__(self, text):
+        self.text = text.lower()
+        self.has_digit = _DIGIT.search(self.text) is not None
+
+    def allows(self, rule):
+        if rule.digit and not self.has_digit:
+            return False
+        return not rule.keywords or any(keyword in self.text for keyword in rule.keywords)
+
+    def first(self, rule_names):
+        """Return (rule name, match) for the first rule, in order, that matches anywhere"""
+        for name in rule_names:
+            rule = RULES[name]
+            if self.allows(rule):
+                match = rule.regex.search(self.text)
+                if match:
+                    return name, match
+        return None, None
+
+    def all(self, name, limit=None):
+        """Return up to `limit` non-overlapping matches of a rule"""
+        rule = RULES[name]
+        if not self.allows(rule):
+            return []
+        return list(islice(rule.regex.finditer(self.text), limit))
+
+
+def _extract_interest(transcript, entities):
+    name, _ = transcript.first(INTEREST_RULES)
+    if name in ('interest_yes', 'interest_yes_phrase'):
+        entities["interested"] = "Yes"
+    elif name in ('interest_no', 'interest_no_phrase'):
+        entities["interested"] = "No"
+
+
+def _extract_notice_period(transcript, entities):
+    name, match = transcript.first(NOTICE_RULES)
+    if name == 'notice_immediate':
+        entities["notice_period"] = "Immediate"
+    elif name == 'notice_range':
+        start, end, unit = match.group('start', 'end', 'unit')
+        entities["notice_period"] = f"{start}-{end} {unit}"
+    elif name is not None:
+        number, unit = match.group('number', 'unit')
+        # Convert text numbers to digits if needed
+        number = NUMBER_WORDS.get(number, number)
+        entities["notice_period"] = f"{number} {unit}"
+
+
+def _ctc_from(transcript, rule_names):
+    _, match = transcript.first(rule_names)
+    if match is None:
+        return None
+    return standardize_ctc_value(match.group('value'), match.group('unit') or '')
+
+
+def _extract_ctc(transcript, entities, fill_partial):
+    """Extract current/expected CTC.
+
+    With fill_partial, bare numbers also fill whichever value is still missing
+    when the other one was found (full conversation behaviour); otherwise bare
+    numbers are only used when neither value was found.
+    """
+    current = _ctc_from(transcript, CURRENT_CTC_RULES)
+    expected = _ctc_from(transcript, EXPECTED_CTC_RULES)
+    if current is not None:
+        entities["current_ctc"] = current
+    if expected is not None:
+        entities["expected_ctc"] = expected
+
+    if current is not None and expected is not None:
+        return
+
+    # Look for patterns like "X to Y" or "X and Y"
+    _, match = transcript.first(['ctc_range'])
+    if match:
+        if current is None:
+            entities["current_ctc"] = standardize_ctc_value(match.group('first'), '')
+        if expected is None:
+            entities["expected_ctc"] = standardize_ctc_value(match.group('second'), '')
+        return
+
+    # Just find the first numbers and make an educated guess
+    numbers = [match.group('value') for match in transcript.all('ctc_number', limit=2)]
+    if len(numbers) == 2:
+        if fill_partial or (current is None and expected is None):
+            if current is None:
+                entities["current_ctc"] = standardize_ctc_value(numbers[0], '')
+            if expected is None:
+                entities["expected_ctc"] = standardize_ctc_value(numbers[1], '')
+    elif len(numbers) == 1 and current is None:
+        # If only one number, assume it's current CTC
+        entities["current_ctc"] = standardize_ctc_value(numbers[0], '')
+
+
+def _format_day(name, match):
+    if name == 'day_date':
+        day, month = match.group('day', 'month')
+        return f"{day} {month}"
+    return match.group('value')
+
+
+def _format_time(name, match):
+    if name == 'time_period':
+        # Convert time of day to representative hours
+        return TIME_OF_DAY[match.group('value')]
+    if name == 'time_oclock':
+        hour = match.group('hour')
+        # Assume AM for 8-11, PM for 12-7
+        ampm = "AM" if 8 <= int(hour) <= 11 else "PM"
+        return f"{hour}:00 {ampm}"
+    if name == 'time_ampm':
+        hour, ampm = match.group('hour', 'ampm')
+        return f"{hour}:00 {ampm.upper()}"
+    if name == 'time_ampm_minutes':
+        hour, minute, ampm = match.group('hour', 'minute', 'ampm')
+        return f"{hour}:{minute} {ampm.upper()}"
+    # Convert 24-hour times to 12-hour format
+    hour, minute = match.group('hour', 'minute')
+    ampm = "AM" if int(hour) < 12 else "PM"
+    hour12 = str(int(hour) % 12)
+    hour12 = "12" if hour12 == "0" else hour12
+    return f"{hour12}:{minute} {ampm}"
+
+
+def _extract_availability(transcript, entities):
+    availability = {}
+    name, match = transcript.first(DAY_RULES)
+    if name is not None:
+        availability["day"] = _format_day(name, match)  # Take the first day mentioned
+    name, match = transcript.first(TIME_RULES)
+    if name is not None:
+        availability["time"] = _format_time(name, match)  # Take the first time mentioned
+    if availability:
+        entities["availability"] = availability
+
+
+def _extract_full_conversation(transcript, entities):
+    _extract_interest(transcript, entities)
+    _extract_notice_period(transcript, entities)
+    _extract_ctc(transcript, entities, fill_partial=True)
+    _extract_availability(transcript, entities)
+
+
+def _extract_compensation(transcript, entities):
+    _extract_ctc(transcript, entities, fill_partial=False)
+
+
+# Question context profiles, checked in order against the lowercased context
+PROFILES = [
+    ('full conversation', ('full conversation',), _extract_full_conversation),
+    ('notice period', ('interest', 'notice'), _extract_notice_period),
+    ('compensation', ('ctc', 'compensation', 'salary'), _extract_compensation),
+    ('availability', ('available', 'availability', 'interview', 'schedule'), _extract_availability),
+]
+
+
+@lru_cache(maxsize=256)
+def profile_name(question_context):
+    """Map a free-form question context to the name of its profile (or None)"""
+    question_context = question_context.lower()
+    for name, keywords, _ in PROFILES:
+        if any(keyword in question_context for keyword in keywords):
+            return name
+    return None
+
+
+@lru_cache(maxsize=256)
+def resolve_profile(question_context):
+    """Map a free-form question context to its extractor (or None)"""
+    name = profile_name(question_context)
+    for profile, _, extractor in PROFILES:
+        if profile == name:
+            return extractor
+    return None
+
+
+def extract_entities(text, question_context):
+    """Extract entities from recognized text based on question context"""
+    entities = {}
+    extractor = resolve_profile(question_context)
+    if extractor is not None:
+        extractor(Transcript(text), entities)
+    return entities
+
+
+def extract_entities_batch(records):
+    """Yield extract_entities results for {text, questionContext} records, in order
+
+    Rules and profile lookups are shared across the batch and results are
+    produced lazily, so arbitrarily large inputs can be streamed through.
+    """
+    resolve = resolve_profile
+    for record in records:
+        entities = {}
+        extractor = resolve(record.get('questionContext') or '')
+        if extractor is not None:
+            extractor(Transcript(record['text']), entities)
+        yield entities
+
+
+class RegexEngine:
+    """extract_entities / extract_entities_batch behind the engine interface"""
+
+    name = 'regex'
+
+    def extract(self, text, question_context):
+        return extract_entities(text, question_context)
+
+    def extract_batch(self, records):
+        return extract_entities_batch(records)
+
+
+def _spacy_engine():
+    # Imported on first use: spaCy is only needed when it is selected
+    from spacy_engine import SpacyEngine
+    return SpacyEngine()
+
+
+ENGINES = {
+    'regex': RegexEngine,
+    'spacy': _spacy_engine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name=None):
+    """Return the process-wide instance of an entity engine, creating it on first use"""
+    name = (name or ENTITY_ENGINE).lower()
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                if name not in ENGINES:
+                    raise Exception(f"Unknown entity engine: {name}")
+                engine = ENGINES[name]()
+                _engines[name] = engine
+    return engine
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from entity_engine import profile_name
+import metrics
+
+# Question-context grammars for the Vosk recognizer
+#
+# extract_entities only looks for a few kinds of words per question context
+# (numbers and units for notice periods and CTC, weekdays, months and times
+# for availability), so answers to those questions can be decoded against
+# that vocabulary instead of the model's full lexicon. A profile's grammar
+# is every vocabulary word the model knows, each as its own phrase so they
+# can be said in any order, plus [unk] for everything else. It is built once
+# per model and cached; Vosk compiles a grammar whenever a recognizer is
+# created, so grammar recognizers are pooled per profile and Reset() between
+# requests instead of being rebuilt.
+#
+# A constrained decode forces off-script answers onto vocabulary words, so
+# word confidences are checked: when their mean is below min_confidence or
+# more than max_unknown of the words were [unk], the audio is recognized
+# again with the open vocabulary. 'full conversation' answers are free-form
+# and always use the open vocabulary.
+
+VOSK_GRAMMARS = os.getenv('VOSK_GRAMMARS', 'true').lower() in ('1', 'true', 'yes')
+VOSK_GRAMMAR_MIN_CONFIDENCE = float(os.getenv('VOSK_GRAMMAR_MIN_CONFIDENCE', 0.7))
+VOSK_GRAMMAR_MAX_UNKNOWN = float(os.getenv('VOSK_GRAMMAR_MAX_UNKNOWN', 0.5))
+
+UNKNOWN = '[unk]'
+
+NUMBERS = ['zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten', 'eleven',
+           'twelve', 'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen',
+           'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety', 'hundred',
+           'thousand', 'point', 'half', 'a', 'and']
+ORDINALS = ['first', 'second', 'third', 'fourth', 'fifth', 'sixth', 'seventh', 'eighth', 'ninth', 'tenth',
+            'eleventh', 'twelfth', 'thirteenth', 'fourteenth', 'fifteenth', 'sixteenth', 'seventeenth',
+            'eighteenth', 'nineteenth', 'twentieth', 'thirtieth']
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+          'november', 'december']
+# Words that carry no entity but make up most natural answers
+COMMON = ['i', "i'm", 'am', 'is', 'it', "it's", 'my', 'me', 'the', 'of', 'to', 'in', 'on', 'at', 'for', 'be',
+          'can', 'will', 'would', 'could', 'about', 'around', 'maybe', 'within', 'only', 'just', 'yes', 'no',
+          'okay', 'so', 'that', 'this', 'currently', 'right', 'now']
+
+VOCABULARY = {
+    'notice period': NUMBERS + COMMON + [
+        'day', 'days', 'week', 'weeks', 'month', 'months', 'notice', 'period', 'serving', 'join', 'joining',
+        'immediate', 'immediately', 'away', 'negotiable', 'buyout', 'last', 'working', 'after'],
+    'compensation': NUMBERS + COMMON + [
+        'current', 'ctc', 'salary', 'package', 'expected', 'expect', 'expecting', 'expectation', 'looking',
+        'getting', 'earning', 'making', 'lakh', 'lakhs', 'lpa', 'k', 'per', 'annum', 'year', 'rupees',
+        'hike', 'percent', 'fixed', 'variable', 'present', 'want', 'desired'],
+    'availability': NUMBERS + ORDINALS + WEEKDAYS + MONTHS + COMMON + [
+        'today', 'tomorrow', 'day', 'after', 'next', 'week', 'morning', 'afternoon', 'evening', 'noon',
+        "o'clock", 'am', 'pm', 'free', 'available', 'any', 'time', 'works', 'slot', 'between', 'from',
+        'until', 'past', 'quarter'],
+}
+
+log = logging.getLogger(__name__)
+
+
+def grammar_profile(question_context):
+    """The grammar profile of a question context, or None for the open vocabulary"""
+    if not VOSK_GRAMMARS or not question_context:
+        return None
+    profile = profile_name(question_context)
+    return profile if profile in VOCABULARY else None
+
+
+def decode(recognizer, pcm_chunks):
+    """Feed PCM to a recognizer; return (text, word confidences)"""
+    results = []
+    for chunk in pcm_chunks:
+        if recognizer.AcceptWaveform(chunk):
+            results.append(json.loads(recognizer.Result()))
+    results.append(json.loads(recognizer.FinalResult()))
+    text = ' '.join(result.get('text', '') for result in results if result.get('text'))
+    words = [word for result in results for word in result.get('result', [])]
+    return text, words
+
+
+class ContextGrammars:
+    """Per-profile grammars and pooled grammar recognizers for one Vosk model"""
+
+    def __init__(self, vosk, model, sample_rate, min_confidence=VOSK_GRAMMAR_MIN_CONFIDENCE,
+                 max_unknown=VOSK_GRAMMAR_MAX_UNKNOWN):
+        self._vosk = vosk
+        self.model = model
+        self.sample_rate = sample_rate
+        self.min_confidence = min_confidence
+        self.max_unknown = max_unknown
+        self._grammars = {}
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._counts = {'constrained': 0, 'fallbacks': 0, 'recognizersBuilt': 0}
+
+    def grammar(self, profile):
+        """The profile's grammar as a Vosk JSON phrase list, built on first use"""
+        grammar = self._grammars.get(profile)
+        if grammar is None:
+            words = sorted({word for word in VOCABULARY[profile] if self.model.vosk_model_find_word(word) >= 0})
+            missing = len(set(VOCABULARY[profile])) - len(words)
+            if missing:
+                log.debug(f"{missing} '{profile}' grammar word(s) are not in the model's lexicon")
+            grammar = self._grammars[profile] = json.dumps(words + [UNKNOWN])
+        return grammar
+
+    @contextmanager
+    def recognizer(self, profile):
+        """Borrow a recognizer constrained to the profile's grammar"""
+        with self._lock:
+            idle = self._idle.setdefault(profile, [])
+            recognizer = idle.pop() if idle else None
+            if recognizer is None:
+                grammar = self.grammar(profile)
+                self._counts['recognizersBuilt'] += 1
+        if recognizer is None:
+            recognizer = self._vosk.KaldiRecognizer(self.model, self.sample_rate, grammar)
+            recognizer.SetWords(True)
+        try:
+            yield recognizer
+        finally:
+            recognizer.Reset()
+            with self._lock:
+                self._idle[profile].append(recognizer)
+
+    def transcribe(self, profile, pcm_chunks):
+        """Decode against the profile's grammar; return the text, or None if the result is not trusted"""
+        with self.recognizer(profile) as recognizer:
+            _, words = decode(recognizer, pcm_chunks)
+        known = [word for word in words if word['word'] != UNKNOWN]
+        confidence = sum(word['conf'] for word in known) / len(known) if known else 0.0
+        unknown_share = 1 - len(known) / len(words) if words else 1.0
+        with self._lock:
+            trusted = bool(known) and confidence >= self.min_confidence and unknown_share <= self.max_unknown
+            self._counts['constrained' if trusted else 'fallbacks'] += 1
+        metrics.GRAMMAR_DECODES.inc(profile, 'constrained' if trusted else 'fallback')
+        if trusted:
+            return ' '.join(word['word'] for word in known)
+        log.info(f"Low-confidence '{profile}' grammar result ({confidence:.2f}, "
+                 f"{unknown_share:.0%} unknown), using the open vocabulary")
+        return None
+
+    def warm(self):
+        """Build every grammar and one pooled recognizer per profile"""
+        for profile in VOCABULARY:
+            with self.recognizer(profile):
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats['idleRecognizers'] = {profile: len(idle) for profile, idle in self._idle.items()}
+            return stats
@@ -0,0 +1,67 @@
+# Production serving profile for the Flask server
+#
+#     gunicorn -c gunicorn.conf.py app:app
+#
+# With preload_app the app module (FFmpeg check, ASR model, compiled entity
+# rules) is imported once in the master and warmed up by pushing a silent
+# clip through the pipeline before any worker is forked. Background threads
+# and worker processes (Node forwarder, job queue, ASR pool) are all started
+# lazily, so none exist in the master at fork time. GET /ready returns 503
+# until warm-up has finished.
+#
+# Scaling here means threads, not workers. Async /process-speech jobs
+# (jobs.JobQueue) and, without SESSION_DIR, conversation sessions live in
+# the memory of the worker that created them, so a second worker would
+# answer 404 for another worker's job and split a candidate's turns over
+# separate sessions. The default is one worker with GUNICORN_THREADS
+# threads, and recognition uses every core through the ASR worker pool
+# (ASR_EXECUTION=process). With a single worker, preload_app does not save
+# memory; it still warms up once in the master, so a restarted worker
+# (timeout, crash) is ready without reloading the model.
+#
+# More workers are refused unless sessions are shared through SESSION_DIR
+# (a local directory; each turn holds a per-candidate file lock) or
+# disabled, and GUNICORN_ALLOW_LOCAL_JOBS=true acknowledges that async jobs
+# can only be polled from the worker that accepted them. Then the worker
+# count defaults to WEB_CONCURRENCY (if set) and the workers share the
+# preloaded model copy-on-write.
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('FLASK_PORT', 5000)}")
+sessions_local = (os.getenv('SESSIONS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+                  and not os.getenv('SESSION_DIR'))
+local_jobs_allowed = os.getenv('GUNICORN_ALLOW_LOCAL_JOBS', 'false').lower() in ('1', 'true', 'yes')
+default_workers = os.getenv('WEB_CONCURRENCY', 1) if not sessions_local and local_jobs_allowed else 1
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+if workers > 1:
+    if sessions_local:
+        raise Exception(f"GUNICORN_WORKERS={workers} needs SESSION_DIR (sessions are per process otherwise)")
+    if not local_jobs_allowed:
+        raise Exception(f"GUNICORN_WORKERS={workers}: async jobs are kept per worker, so polling /jobs/<id> "
+                        "can reach the wrong one; set GUNICORN_ALLOW_LOCAL_JOBS=true to run anyway")
+# Threaded workers: WebSocket streams and SSE job events hold a thread each
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+accesslog = '-'
+
+
+def when_ready(server):
+    # Master process, after the preloaded app was imported and before any worker is forked
+    if preload_app:
+        import app
+        app.warm_up()
+
+
+def post_worker_init(worker):
+    import app
+    if not app.warmup_state['ready']:
+        # Without preload_app (or if the master's warm-up failed) every worker warms up itself
+        app.warm_up()
+    if app.asr_pool is not None:
+        app.asr_pool.start()
+    # Replays spooled payloads; the spool is claimed atomically, so workers never replay twice
+    app.node_forwarder.start()
@@ -0,0 +1,193 @@
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+# Background job queue for asynchronous /process-speech requests
+#
+# Jobs wait in a bounded FIFO queue and are processed by a fixed pool of
+# worker threads. When the queue is full, submit() raises QueueFull so the
+# endpoint can shed load instead of accepting unbounded work.
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+    def __init__(self, retry_after):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class Job:
+    """A single queued unit of work and its lifecycle"""
+
+    def __init__(self, func, args, meta=None):
+        self.id = uuid.uuid4().hex
+        self.func = func
+        self.args = args
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def set_status(self, status, result=None, error=None):
+        with self.changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in (DONE, FAILED):
+                self.finished_at = time.time()
+                # Release the upload as soon as it has been processed
+                self.args = None
+            self.changed.notify_all()
+
+    def wait_for_change(self, last_status, timeout):
+        """Block until the status differs from `last_status` or the timeout expires"""
+        with self.changed:
+            if self.status == last_status:
+                self.changed.wait(timeout)
+            return self.status
+
+    def to_dict(self):
+        data = {
+            'jobId': self.id,
+            'status': self.status,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+        }
+        data.update(self.meta)
+        if self.status == DONE:
+            data['result'] = self.result
+        elif self.status == FAILED:
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded FIFO job queue served by a fixed-size worker pool"""
+
+    def __init__(self, workers=2, max_queued=32, ttl=3600, window=1000):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+        self._wait_times = deque(maxlen=window)
+        self._service_times = deque(maxlen=window)
+        self._counts = {'submitted': 0, 'rejected': 0, DONE: 0, FAILED: 0}
+
+    def _start(self):
+        # Workers start lazily so no threads exist before a server forks
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"speech-job-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args, meta=None):
+        """Queue func(*args) and return the Job, or raise QueueFull"""
+        job = Job(func, args, meta)
+        with self._lock:
+            self._start()
+            self._purge()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._counts['rejected'] += 1
+                raise QueueFull(self.retry_after())
+            self._jobs[job.id] = job
+            self._counts['submitted'] += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def retry_after(self):
+        """Estimate, in whole seconds, how long until a queue slot frees up"""
+        service = self._mean(self._service_times) or 1.0
+        return max(1, math.ceil(service * self._queue.qsize() / max(1, self.workers)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.max_queued,
+                'queueDepth': self._queue.qsize(),
+                'running': self._running,
+                'submitted': self._counts['submitted'],
+                'rejected': self._counts['rejected'],
+                'completed': self._counts[DONE],
+                'failed': self._counts[FAILED],
+                'waitTime': self._summary(self._wait_times),
+                'serviceTime': self._summary(self._service_times),
+            }
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._running += 1
+            job.set_status(RUNNING)
+            self._wait_times.append(job.started_at - job.created_at)
+            try:
+                result = job.func(*job.args)
+                job.set_status(DONE, result=result)
+            except Exception as e:
+                log.warning(f"Job {job.id} failed: {str(e)}")
+                job.set_status(FAILED, error=str(e))
+            self._service_times.append(job.finished_at - job.started_at)
+            with self._lock:
+                self._running -= 1
+                self._counts[job.status] += 1
+            self._queue.task_done()
+
+    def _purge(self):
+        # Drop finished jobs older than the TTL; caller holds the lock
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _mean(values):
+        values = list(values)
+        return sum(values) / len(values) if values else None
+
+    @classmethod
+    def _summary(cls, values):
+        values = sorted(values)
+        if not values:
+            return {'count': 0, 'mean': None, 'p50': None, 'p95': None, 'max': None}
+        return {
+            'count': len(values),
+            'mean': round(cls._mean(values), 4),
+            'p50': round(values[len(values) // 2], 4),
+            'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+            'max': round(values[-1], 4),
+        }
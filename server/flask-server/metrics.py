@@ -0,0 +1,286 @@
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+# In-process pipeline metrics in the Prometheus text format
+#
+# Counters, gauges and histograms are plain dicts guarded by one lock, so
+# recording a value costs about a microsecond and metrics can stay on in
+# production. Work done in the ASR worker pool is recorded in the child and
+# shipped back with the task result (see run_captured/replay), so the
+# serving process sees every stage.
+#
+# Under gunicorn each worker has its own registry. With METRICS_DIR set,
+# every process writes a snapshot there every few seconds and /metrics sums
+# the snapshots of all live processes, so any worker can answer a scrape.
+# A forked worker (gunicorn's preload_app) starts its own snapshot thread;
+# the one it inherited from the master does not exist in the child.
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_DIR = os.getenv('METRICS_DIR') or None
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_metrics = {}
+_local = threading.local()
+_flusher = None
+_pool_worker = False
+
+log = logging.getLogger(__name__)
+
+
+class _Metric:
+    def __init__(self, name, kind, help_text, labels, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.values = {}
+        _metrics[name] = self
+
+    def _record(self, op, value, label_values):
+        captured = getattr(_local, 'captured', None)
+        if captured is not None:
+            captured.append((self.name, op, label_values, value))
+        elif METRICS_DIR is not None and _flusher is None and not _pool_worker:
+            _start_flusher()
+
+
+class Counter(_Metric):
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, 'counter', help_text, labels)
+
+    def inc(self, *label_values, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with _lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+        self._record('inc', amount, label_values)
+
+
+class Gauge(_Metric):
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, 'gauge', help_text, labels)
+
+    def add(self, amount, *label_values):
+        if not METRICS_ENABLED:
+            return
+        with _lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class Histogram(_Metric):
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, 'histogram', help_text, labels, buckets)
+
+    def observe(self, value, *label_values):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            series = self.values.get(label_values)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+        self._record('observe', value, label_values)
+
+
+STAGE_SECONDS = Histogram('speech_stage_seconds', 'Latency of each speech pipeline stage', ('stage',))
+STAGE_ERRORS = Counter('speech_stage_errors_total', 'Pipeline stages that raised an error', ('stage',))
+EMPTY_TRANSCRIPTS = Counter('speech_empty_transcripts_total', 'Recognitions that returned no text')
+NODE_FORWARD_FAILURES = Counter('node_forward_failures_total',
+                                'Failed Node.js forwards (retry: attempt failed, spooled: gave up, '
+                                'rejected: refused by Node)', ('reason',))
+AUDIO_DECODES = Counter('audio_decodes_total', 'Uploads decoded, by path (passthrough: already 16kHz mono '
+                        'PCM, numpy: other WAV layouts, pyav/ffmpeg: compressed, ffmpeg_fallback: '
+                        'PyAV failed)', ('path',))
+GRAMMAR_DECODES = Counter('asr_grammar_decodes_total', 'Vosk recognitions against a question-context grammar, '
+                          'by outcome (constrained: result kept, fallback: recognized again with the open '
+                          'vocabulary)', ('profile', 'outcome'))
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by endpoint and status', ('endpoint', 'status'))
+LOG_RECORDS_DROPPED = Counter('log_records_dropped_total', 'Log records dropped because the log queue was full')
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests being handled', ('endpoint',))
+
+
+class stage:
+    """Context manager timing one pipeline stage (and counting its errors)"""
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.name)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(self.name)
+        return False
+
+
+def run_captured(func, *args):
+    """Run func(*args) in a pool worker, returning (result, error, metric updates)
+
+    Errors are returned rather than raised so the updates recorded before
+    the failure still reach the serving process.
+    """
+    global _pool_worker
+    # The serving process replays these updates; never publish them from here too
+    _pool_worker = True
+    _local.captured = []
+    try:
+        return func(*args), None, _local.captured
+    except Exception as e:
+        return None, str(e), _local.captured
+    finally:
+        _local.captured = None
+
+
+def replay(updates):
+    """Apply metric updates captured in another process"""
+    for name, op, label_values, value in updates:
+        metric = _metrics.get(name)
+        if metric is None:
+            continue
+        if op == 'observe':
+            metric.observe(value, *label_values)
+        else:
+            metric.inc(*label_values, amount=value)
+
+
+def snapshot():
+    with _lock:
+        return {name: {json.dumps(key): (list(value) if isinstance(value, list) else value)
+                       for key, value in metric.values.items()}
+                for name, metric in _metrics.items()}
+
+
+def _merge(total, other):
+    for name, series in other.items():
+        target = total.setdefault(name, {})
+        for key, value in series.items():
+            if key not in target:
+                target[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                target[key] = [a + b for a, b in zip(target[key], value)]
+            else:
+                target[key] += value
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"metrics_{pid}.json")
+
+
+def _write_snapshot():
+    path = _snapshot_path(os.getpid())
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(temp_path, path)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        try:
+            _write_snapshot()
+        except OSError as e:
+            log.warning(f"Could not write metrics snapshot: {str(e)}")
+
+
+def _start_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        _flusher = threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True)
+        _flusher.start()
+
+
+def _after_fork_in_child():
+    global _flusher, _lock
+    _lock = threading.Lock()
+    if _flusher is not None:
+        # The parent keeps writing its own snapshot; counting its values again here would double them
+        for metric in _metrics.values():
+            metric.values.clear()
+    _flusher = None
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Return all metrics, summed over the processes sharing METRICS_DIR"""
+    total = snapshot()
+    if METRICS_DIR is None:
+        return total
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics_*.json')):
+        pid = os.path.basename(path)[len('metrics_'):-len('.json')]
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        if not _pid_alive(int(pid)):
+            try:
+                os.remove(path)  # Its counters reset, which Prometheus handles
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                _merge(total, json.load(f))
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render():
+    """Render all metrics in the Prometheus text exposition format"""
+    data = collect()
+    lines = []
+    for name, metric in _metrics.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(data.get(name, {}).items()):
+            label_values = json.loads(key)
+            if metric.kind != 'histogram':
+                lines.append(f"{name}{_labels(metric.labels, label_values)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric.buckets) + ['+Inf'], value[:-2]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(metric.labels, label_values, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labels, label_values)} {value[-2]}")
+            lines.append(f"{name}_count{_labels(metric.labels, label_values)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,529 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+# Background delivery of processed candidate data to the Node.js server
+#
+# send() only enqueues; a single sender thread delivers payloads over one
+# pooled keep-alive session, retrying transient failures with exponential
+# backoff. Payloads that still cannot be delivered are appended to a local
+# JSONL spool file, which is replayed the next time the forwarder starts.
+# With batch_size > 1, queued payloads are coalesced into one request to
+# the Node batch endpoint. send_many() queues payloads that belong together
+# (e.g. one upload batch) as pre-grouped batch requests. The batch endpoint
+# answers 200 with a status per item, so items that failed on the Node side
+# are retried (and spooled) or dropped as rejected one by one.
+
+SINGLE_PATH = '/process-candidate-data'
+BATCH_PATH = '/process-candidate-data/batch'
+
+log = logging.getLogger(__name__)
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # Windows runs the server as a single process
+        return pid == os.getpid()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Statuses worth retrying; other 4xx responses will never succeed
+RETRYABLE_STATUSES = {408, 425, 429}
+
+# Largest number of payloads sent in one batch request
+MAX_GROUP_SIZE = 100
+
+
+class NodeForwarder:
+    """Pooled, retrying, spooling sender for /process-candidate-data payloads"""
+
+    def __init__(self, base_url, spool_path, batch_size=1, batch_wait=0.2, max_retries=4,
+                 backoff=0.5, max_backoff=30.0, timeout=10, queue_size=1000, pool_size=4):
+        self.base_url = base_url.rstrip('/')
+        self.spool_path = spool_path
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._thread = None
+        self._node_down = False
+        self._counts = {'queued': 0, 'delivered': 0, 'retried': 0, 'rejected': 0, 'spooled': 0, 'replayed': 0}
+
+    def start(self):
+        """Replay any spooled payloads and start the sender thread (once)"""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self._run, name='node-forwarder', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        self.replay_spool()
+        return self
+
+    def send(self, payload):
+        """Queue a payload for delivery; never blocks the caller"""
+        self.start()
+        try:
+            self._queue.put_nowait(payload)
+            self._count('queued')
+        except queue.Full:
+            log.warning("Node forward queue full, spooling payload")
+            self._spool([payload])
+
+    def send_many(self, payloads):
+        """Queue related payloads to be delivered together via the batch endpoint"""
+        self.start()
+        for start in range(0, len(payloads), MAX_GROUP_SIZE):
+            group = list(payloads[start:start + MAX_GROUP_SIZE])
+            try:
+                self._queue.put_nowait(group)
+                self._count('queued', len(group))
+            except queue.Full:
+                log.warning("Node forward queue full, spooling payloads")
+                self._spool(group)
+
+    def flush(self, timeout=None):
+        """Wait until every queued payload was delivered or spooled"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        """Spool whatever is still queued, e.g. at interpreter exit"""
+        pending = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+                pending.extend(item if isinstance(item, list) else [item])
+                self._queue.task_done()
+            except queue.Empty:
+                break
+        if pending:
+            self._spool(pending)
+
+    def replay_spool(self):
+        """Re-queue payloads spooled by a previous run"""
+        if not self._replay_lock.acquire(blocking=False):
+            return 0  # A replay is already in progress
+        try:
+            return self._replay()
+        finally:
+            self._replay_lock.release()
+
+    def _replay(self):
+        # A process claims spooled payloads by renaming the spool to a name of
+        # its own. Renames are atomic, so when several server processes share
+        # one spool (e.g. gunicorn workers) each payload is replayed once.
+        # Files left by a process that died mid-replay are claimed the same way.
+        replaying = f"{self.spool_path}.{os.getpid()}.replaying"
+        payloads = []
+        for source in self._orphaned_replays() + [self.spool_path]:
+            with self._spool_lock:
+                try:
+                    os.replace(source, replaying)
+                except FileNotFoundError:
+                    continue  # Nothing spooled, or claimed by another process
+            payloads.extend(self._read_spool(replaying))
+            # Anything that fails again is appended to the live spool file
+            os.remove(replaying)
+
+        for payload in payloads:
+            self.send(payload)
+        self._count('replayed', len(payloads))
+        if payloads:
+            log.info(f"Replaying {len(payloads)} spooled payload(s) to Node.js server")
+        return len(payloads)
+
+    def _orphaned_replays(self):
+        directory = os.path.dirname(self.spool_path) or '.'
+        prefix = os.path.basename(self.spool_path) + '.'
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        orphans = []
+        for name in names:
+            if not (name.startswith(prefix) and name.endswith('.replaying')):
+                continue
+            pid = name[len(prefix):-len('.replaying')]
+            if not pid.isdigit() or not _pid_alive(int(pid)) or int(pid) == os.getpid():
+                orphans.append(os.path.join(directory, name))
+        return orphans
+
+    @staticmethod
+    def _read_spool(path):
+        payloads = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        payloads.append(json.loads(line))
+                    except ValueError:
+                        log.warning("Skipping corrupt spool line")
+        return payloads
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+        stats['pending'] = self._queue.qsize()  # Queued requests, not payloads
+        stats['batchSize'] = self.batch_size
+        stats['nodeDown'] = self._node_down
+        return stats
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._counts[key] += amount
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            items = 1
+            if isinstance(item, list):
+                # Already grouped by send_many()
+                batch = item
+            else:
+                batch = [item]
+                if self.batch_size > 1:
+                    # Coalesce whatever arrives within the batch window
+                    deadline = time.monotonic() + self.batch_wait
+                    while len(batch) < self.batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        try:
+                            next_item = self._queue.get(timeout=remaining)
+                        except queue.Empty:
+                            break
+                        items += 1
+                        batch.extend(next_item if isinstance(next_item, list) else [next_item])
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                log.exception(f"Unexpected error forwarding to Node.js server: {str(e)}")
+                self._spool(batch)
+            finally:
+                for _ in range(items):
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        # While Node is known to be down, make one attempt and spool on failure
+        # instead of holding every payload through the full backoff schedule
+        attempts = 1 if self._node_down else self.max_retries + 1
+        for attempt in range(attempts):
+            if attempt:
+                self._count('retried')
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+            url, body = self._request(batch)
+            try:
+                with metrics.stage('node_forward'):
+                    response = self._session.post(url, json=body, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                log.warning(f"Failed to send to Node.js server: {str(e)}")
+                metrics.NODE_FORWARD_FAILURES.inc('retry')
+                continue
+
+            batch = self._handle_response(batch, response.status_code, response.text, response.json)
+            if not batch:
+                return
+
+        self._node_down = True
+        self._spool(batch)
+
+    def _node_up(self):
+        # Node is back: deliver what was spooled while it was down
+        threading.Thread(target=self.replay_spool, daemon=True).start()
+
+    def _request(self, batch):
+        if len(batch) == 1:
+            return self.base_url + SINGLE_PATH, batch[0]
+        return self.base_url + BATCH_PATH, {'items': batch}
+
+    def _handle_response(self, batch, status, text, parse_json):
+        """Account for one Node response; return the payloads that should be sent again
+
+        The batch endpoint answers 200 with a status per item in `results`, so
+        items are judged one by one: server errors (and 408/425/429) are
+        retried and then spooled, other 4xx items are dropped as rejected.
+        """
+        statuses = [status] * len(batch)
+        if status < 400 and len(batch) > 1:
+            try:
+                results = parse_json().get('results')
+            except (ValueError, AttributeError):
+                results = None
+            if isinstance(results, list) and len(results) == len(batch):
+                statuses = [result.get('status', status) if isinstance(result, dict) else status
+                            for result in results]
+            else:
+                log.warning("Node.js batch response has no per-item results, counting every payload as delivered")
+
+        delivered, retry, rejected = [], [], {}
+        for payload, item_status in zip(batch, statuses):
+            if not isinstance(item_status, int) or item_status < 400:
+                delivered.append(payload)
+            elif item_status >= 500 or item_status in RETRYABLE_STATUSES:
+                retry.append(payload)
+            else:
+                rejected[item_status] = rejected.get(item_status, 0) + 1
+
+        if delivered:
+            self._count('delivered', len(delivered))
+            if self._node_down:
+                self._node_down = False
+                self._node_up()
+            log.info(f"Successfully sent {len(delivered)} payload(s) to Node.js server")
+        if rejected:
+            # The payloads themselves were refused; retrying or spooling will not help
+            count = sum(rejected.values())
+            self._count('rejected', count)
+            metrics.NODE_FORWARD_FAILURES.inc('rejected', amount=count)
+            log.error(f"Node.js server rejected {count} payload(s) (status counts {rejected}): {text[:200]}")
+        if retry:
+            log.warning(f"Node.js server error for {len(retry)} payload(s), will retry")
+            metrics.NODE_FORWARD_FAILURES.inc('retry')
+        return retry
+
+    def _spool(self, payloads):
+        with self._spool_lock:
+            directory = os.path.dirname(self.spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spool_path, 'a', encoding='utf-8') as f:
+                for payload in payloads:
+                    f.write(json.dumps(payload) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        self._count('spooled', len(payloads))
+        metrics.NODE_FORWARD_FAILURES.inc('spooled', amount=len(payloads))
+        log.warning(f"Spooled {len(payloads)} undelivered payload(s) to {self.spool_path}")
+
+
+class AsyncNodeForwarder(NodeForwarder):
+    """NodeForwarder for asyncio servers (asgi_app)
+
+    Same queueing, batching, retries and spool as NodeForwarder, but the
+    sender is a task on the server's event loop posting over a pooled
+    httpx.AsyncClient. send() and send_many() called from other threads
+    (e.g. WSGI routes mounted in the ASGI app) are handed to that loop, and
+    spool writes and replays on the loop run in a thread.
+    """
+
+    def __init__(self, base_url, spool_path, queue_size=1000, pool_size=4, **kwargs):
+        super().__init__(base_url, spool_path, queue_size=queue_size, pool_size=pool_size, **kwargs)
+        self.queue_size = queue_size
+        self.pool_size = pool_size
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._session = None  # httpx.AsyncClient, created on the event loop by start()
+        self._task = None
+        self._loop = None
+        self._disk_tasks = set()  # Spool writes and replays running in threads
+
+    def start(self):
+        """Replay any spooled payloads and start the sender task (once, on the running loop)"""
+        if self._task is not None:
+            return self
+        import httpx
+
+        self._session = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(
+            max_connections=self.pool_size, max_keepalive_connections=self.pool_size))
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+        self.replay_spool()
+        return self
+
+    def _on_loop(self):
+        try:
+            return self._loop is not None and asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _in_thread(self, func, *args):
+        # Keeps file I/O (appends, fsync, renames) off the event loop; aclose() waits for it
+        task = self._loop.create_task(asyncio.to_thread(func, *args))
+        self._disk_tasks.add(task)
+        task.add_done_callback(self._disk_tasks.discard)
+
+    def _spool(self, payloads):
+        if self._on_loop():
+            self._in_thread(super()._spool, payloads)
+        else:
+            super()._spool(payloads)
+
+    def replay_spool(self):
+        """Re-queue payloads spooled by a previous run (read in a thread when called on the loop)"""
+        if self._on_loop():
+            # Payloads read in the thread are handed back to the loop by send()
+            self._in_thread(super().replay_spool)
+            return None
+        return super().replay_spool()
+
+    def _handed_to_loop(self, method, *args):
+        """From a thread other than the sender's loop, schedule method(*args) on it; True if that was needed"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and (self._loop is None or running is self._loop):
+            return False
+        if self._loop is None or self._loop.is_closed():
+            # Not started (or already shut down): keep the payloads for the next replay
+            payloads = args[0]
+            self._spool(payloads if isinstance(payloads, list) else [payloads])
+            return True
+        self._loop.call_soon_threadsafe(method, *args)
+        return True
+
+    def send(self, payload):
+        if self._handed_to_loop(self.send, payload):
+            return
+        self.start()
+        try:
+            self._queue.put_nowait(payload)
+            self._count('queued')
+        except asyncio.QueueFull:
+            log.warning("Node forward queue full, spooling payload")
+            self._spool([payload])
+
+    def send_many(self, payloads):
+        if self._handed_to_loop(self.send_many, list(payloads)):
+            return
+        self.start()
+        for start in range(0, len(payloads), MAX_GROUP_SIZE):
+            group = list(payloads[start:start + MAX_GROUP_SIZE])
+            try:
+                self._queue.put_nowait(group)
+                self._count('queued', len(group))
+            except asyncio.QueueFull:
+                log.warning("Node forward queue full, spooling payloads")
+                self._spool(group)
+
+    async def flush(self, timeout=None):
+        """Wait until every queued payload was delivered or spooled"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+            if self._disk_tasks:
+                await asyncio.wait_for(asyncio.gather(*self._disk_tasks, return_exceptions=True), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def aclose(self):
+        """Stop the sender and spool whatever is still queued (server shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task  # Spools the batch it was delivering
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close()
+        if self._disk_tasks:
+            await asyncio.gather(*self._disk_tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    def close(self):
+        pending = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+                pending.extend(item if isinstance(item, list) else [item])
+                self._queue.task_done()
+            except asyncio.QueueEmpty:
+                break
+        if pending:
+            self._spool(pending)
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            items = 1
+            if isinstance(item, list):
+                batch = item
+            else:
+                batch = [item]
+                if self.batch_size > 1:
+                    loop = asyncio.get_running_loop()
+                    deadline = loop.time() + self.batch_wait
+                    while len(batch) < self.batch_size:
+                        remaining = deadline - loop.time()
+                        if remaining <= 0:
+                            break
+                        try:
+                            next_item = await asyncio.wait_for(self._queue.get(), remaining)
+                        except asyncio.TimeoutError:
+                            break
+                        items += 1
+                        batch.extend(next_item if isinstance(next_item, list) else [next_item])
+            try:
+                await self._deliver(batch)
+            except asyncio.CancelledError:
+                self._spool(batch)
+                raise
+            except Exception as e:
+                log.exception(f"Unexpected error forwarding to Node.js server: {str(e)}")
+                self._spool(batch)
+            finally:
+                for _ in range(items):
+                    self._queue.task_done()
+
+    async def _deliver(self, batch):
+        import httpx
+
+        attempts = 1 if self._node_down else self.max_retries + 1
+        for attempt in range(attempts):
+            if attempt:
+                self._count('retried')
+                delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            url, body = self._request(batch)
+            try:
+                with metrics.stage('node_forward'):
+                    response = await self._session.post(url, json=body)
+            except httpx.HTTPError as e:
+                log.warning(f"Failed to send to Node.js server: {str(e)}")
+                metrics.NODE_FORWARD_FAILURES.inc('retry')
+                continue
+
+            batch = self._handle_response(batch, response.status_code, response.text, response.json)
+            if not batch:
+                return
+
+        self._node_down = True
+        self._spool(batch)
+
+    def _node_up(self):
+        # Node is back: deliver what was spooled while it was down
+        self.replay_spool()
@@ -0,0 +1,99 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in for the Node.js /process-candidate-data endpoints, for local
+# testing of the Flask server without a database. Latency and failure rate
+# are configurable; received payloads are counted and kept in memory.
+
+
+class NodeStub:
+    """In-process stub of the Node.js candidate data endpoints"""
+
+    def __init__(self, port=3001, latency=0.0, failure_rate=0.0, host='127.0.0.1'):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.received = []
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://{host}:{self.port}"
+        self._thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path == '/process-candidate-data':
+                    items = [json.loads(body)]
+                elif self.path == '/process-candidate-data/batch':
+                    items = json.loads(body).get('items', [])
+                else:
+                    return self._reply(404, {'error': 'Not found'})
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                    if random.random() < stub.failure_rate:
+                        stub.failures += 1
+                        return self._reply(503, {'error': 'Injected failure'})
+                    stub.received.extend(items)
+
+                if self.path.endswith('/batch'):
+                    return self._reply(200, {'results': [
+                        {'status': 200, 'message': 'Candidate data processed successfully',
+                         'candidateId': item.get('candidateId')} for item in items]})
+                return self._reply(200, {'message': 'Candidate data processed successfully',
+                                         'candidateId': items[0].get('candidateId')})
+
+            def _reply(self, status, data):
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass  # Keep test output quiet
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': self.requests, 'failures': self.failures, 'received': len(self.received)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stub Node.js server for /process-candidate-data")
+    parser.add_argument('--port', type=int, default=3001)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    stub = NodeStub(args.port, args.latency, args.failure_rate, host='0.0.0.0')
+    print(f"Stub Node.js server listening on port {stub.port}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{stub.stats()}")
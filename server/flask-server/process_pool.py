@@ -0,0 +1,177 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+# Process pool for CPU-bound audio work
+#
+# Decoding and recognition hold the GIL (or saturate a core) for the whole
+# request, so running them in request threads makes concurrent requests
+# compete with no limit. WorkerPool runs them in long-lived worker processes
+# instead: each worker warms up once (e.g. loads the ASR model) and then
+# serves tasks one at a time. Admission is capped; past the cap, callers get
+# PoolOverloaded immediately instead of queueing without bound. A task that
+# exceeds its timeout has its worker killed and replaced.
+
+log = logging.getLogger(__name__)
+
+
+class PoolOverloaded(Exception):
+    """Raised when the pool is at its concurrency cap"""
+
+    def __init__(self, retry_after):
+        super().__init__("Recognition workers are busy")
+        self.retry_after = retry_after
+
+
+class PoolTimeout(Exception):
+    """Raised when a task does not finish within the pool timeout"""
+
+
+def _worker_main(conn, initializer, initargs):
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except Exception as e:
+            # Keep serving; the task itself will surface the error
+            log.warning(f"Worker {os.getpid()} warm-up failed: {str(e)}")
+    while True:
+        try:
+            func, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:
+            conn.send((False, str(e)))
+
+
+class _Worker:
+    def __init__(self, context, initializer, initargs):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, initializer, initargs), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def run(self, func, args, timeout):
+        self.conn.send((func, args))
+        if not self.conn.poll(timeout):
+            raise PoolTimeout()
+        ok, value = self.conn.recv()
+        if not ok:
+            raise Exception(value)
+        return value
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Fixed set of warm worker processes with admission control and timeouts"""
+
+    def __init__(self, workers=None, max_pending=None, timeout=60, initializer=None, initargs=(), start_method=None):
+        self.workers = workers or os.cpu_count() or 1
+        # Requests beyond the worker count may wait for a free worker, up to this cap
+        self.max_pending = max_pending or self.workers * 2
+        self.timeout = timeout
+        self._initializer = initializer
+        self._initargs = initargs
+        self._context = multiprocessing.get_context(start_method)
+        self._admission = threading.BoundedSemaphore(self.max_pending)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._in_flight = 0
+        self._service_time = 1.0
+        self._counts = {'completed': 0, 'failed': 0, 'timedOut': 0, 'rejected': 0}
+
+    def start(self):
+        """Spawn and warm all workers (otherwise done on first use)"""
+        with self._lock:
+            if not self._started:
+                for _ in range(self.workers):
+                    self._idle.put(self._spawn())
+                self._started = True
+        return self
+
+    def _spawn(self):
+        return _Worker(self._context, self._initializer, self._initargs)
+
+    def run(self, func, *args):
+        """Run func(*args) in a worker process and return its result"""
+        self.start()
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self._counts['rejected'] += 1
+            raise PoolOverloaded(self.retry_after())
+
+        started = time.monotonic()
+        try:
+            try:
+                worker = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                self._count('timedOut')
+                raise PoolTimeout(f"No worker became free within {self.timeout}s")
+
+            with self._lock:
+                self._in_flight += 1
+            try:
+                remaining = max(0.0, self.timeout - (time.monotonic() - started))
+                result = worker.run(func, args, remaining)
+                self._count('completed', time.monotonic() - started)
+                return result
+            except PoolTimeout:
+                # The worker is stuck; replace it so capacity is not lost
+                worker.kill()
+                worker = self._spawn()
+                self._count('timedOut')
+                raise PoolTimeout(f"Task timed out after {self.timeout}s")
+            except (EOFError, OSError) as e:
+                # The worker died mid-task
+                worker.kill()
+                worker = self._spawn()
+                self._count('failed')
+                raise Exception(f"Worker process failed: {str(e) or type(e).__name__}")
+            except Exception:
+                self._count('failed')
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._idle.put(worker)
+        finally:
+            self._admission.release()
+
+    def _count(self, outcome, service_time=None):
+        with self._lock:
+            self._counts[outcome] += 1
+            if service_time is not None:
+                # Exponential moving average, used for Retry-After hints
+                self._service_time = 0.8 * self._service_time + 0.2 * service_time
+
+    def retry_after(self):
+        return max(1, round(self._service_time * self.max_pending / self.workers))
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'workers': self.workers,
+                'maxPending': self.max_pending,
+                'inFlight': self._in_flight,
+                'timeout': self.timeout,
+            }
+            stats.update(self._counts)
+            return stats
+
+    def shutdown(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().kill()
+                except queue.Empty:
+                    break
+            self._started = False
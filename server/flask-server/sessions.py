@@ -0,0 +1,390 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows runs the server as a single process
+
+from entity_engine import resolve_profile
+
+# Per-candidate conversation sessions
+#
+# Each /process-speech upload is one turn of a candidate's conversation.
+# Entities are extracted from the new turn only and merged into the running
+# state, so earlier answers are never recognized or re-extracted again.
+#
+# Sessions live in memory (least recently used ones are evicted beyond
+# max_sessions) and expire `ttl` seconds after their last turn. With a
+# disk_dir every session is also written to <disk_dir>/<candidate>.json, so
+# sessions survive restarts and evicted sessions are reloaded on demand. A
+# turn holds the candidate's <candidate>.json.lock (flock) while it loads,
+# merges and saves, so worker processes sharing disk_dir (a local
+# directory) take turns and re-read a file another one changed; the sweep
+# removes lock files of sessions that are gone.
+#
+# Conflicting values are resolved per field (availability per day/time):
+# a value from a question that targets specific fields (e.g. 'ctc') beats a
+# value picked out of a general 'full conversation' answer, where numbers
+# are guessed; between answers of the same kind the latest one wins.
+#
+# Turns carry an id (the client's turnId, or a hash of the upload), so an
+# upload that is retried (e.g. after a 429) is not merged twice.
+
+# How specific a question context is: targeted questions outrank the
+# general full-conversation profile
+RANK_TARGETED = 2
+RANK_GENERAL = 1
+RANK_NONE = 0
+
+log = logging.getLogger(__name__)
+
+
+def context_rank(question_context):
+    extractor = resolve_profile(question_context or '')
+    if extractor is None:
+        return RANK_NONE
+    if extractor is resolve_profile('full conversation'):
+        return RANK_GENERAL
+    return RANK_TARGETED
+
+
+def _flatten(entities):
+    """{'availability': {'day': 'monday'}} -> {'availability.day': 'monday'}"""
+    fields = {}
+    for key, value in entities.items():
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                fields[f"{key}.{sub_key}"] = sub_value
+        else:
+            fields[key] = value
+    return fields
+
+
+def _nest(fields):
+    entities = {}
+    for path, value in fields.items():
+        key, _, sub_key = path.partition('.')
+        if sub_key:
+            entities.setdefault(key, {})[sub_key] = value
+        else:
+            entities[key] = value
+    return entities
+
+
+class Session:
+    """One candidate's turns and merged entity state"""
+
+    def __init__(self, candidate_id, created_at=None):
+        self.candidate_id = candidate_id
+        self.created_at = created_at or time.time()
+        self.updated_at = self.created_at
+        self.turn_count = 0
+        self.turns = []
+        self.fields = {}
+        self.sources = {}
+        self.disk_version = None  # (mtime, inode) of the disk copy this was loaded from or saved to
+
+    @property
+    def entities(self):
+        return _nest(self.fields)
+
+    def has_turn(self, turn_id):
+        return any(turn.get('turnId') == turn_id for turn in self.turns)
+
+    def add_turn(self, question_context, text, entities, max_turns, turn_id=None):
+        """Append a turn, merge its entities and return the diff
+
+        The diff has `added` and `changed` ({from, to}) fields, plus
+        `conflicts` ({kept, ignored}) for values the merge rules rejected.
+        Nested fields are named by path, e.g. 'availability.day'.
+        """
+        self.turn_count += 1
+        self.updated_at = time.time()
+        turn = {
+            'turn': self.turn_count,
+            'questionContext': question_context,
+            'text': text,
+            'entities': _nest(_flatten(entities)),  # A copy
+            'at': self.updated_at,
+        }
+        if turn_id is not None:
+            turn['turnId'] = turn_id
+        self.turns.append(turn)
+        del self.turns[:-max_turns]
+
+        rank = context_rank(question_context)
+        diff = {'added': {}, 'changed': {}, 'conflicts': {}}
+        for path, value in _flatten(entities).items():
+            source = {'turn': self.turn_count, 'questionContext': question_context, 'rank': rank}
+            if path not in self.fields:
+                diff['added'][path] = value
+            elif self.fields[path] == value:
+                source['rank'] = max(rank, self.sources[path]['rank'])
+            elif rank >= self.sources[path]['rank']:
+                diff['changed'][path] = {'from': self.fields[path], 'to': value}
+            else:
+                diff['conflicts'][path] = {'kept': self.fields[path], 'ignored': value}
+                continue
+            self.fields[path] = value
+            self.sources[path] = source
+        return diff
+
+    def summary(self, diff):
+        """The `session` block of a /process-speech response"""
+        return {
+            'turn': self.turn_count,
+            'entities': self.entities,
+            'changes': diff,
+            'updatedAt': self.updated_at,
+        }
+
+    def transcript(self):
+        return ' '.join(turn['text'] for turn in self.turns if turn['text'])
+
+    def to_dict(self):
+        return {
+            'candidateId': self.candidate_id,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'turnCount': self.turn_count,
+            'entities': self.entities,
+            'sources': self.sources,
+            'transcript': self.transcript(),
+            'turns': self.turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls(data['candidateId'], data['createdAt'])
+        session.updated_at = data['updatedAt']
+        session.turn_count = data['turnCount']
+        session.turns = data['turns']
+        session.fields = _flatten(data['entities'])
+        session.sources = data['sources']
+        return session
+
+
+class SessionStore:
+    """In-memory sessions keyed by candidate id, with TTL expiry and an optional disk copy"""
+
+    def __init__(self, ttl=3600, max_sessions=10000, max_turns=50, disk_dir=None, sweep_interval=60):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.disk_dir = disk_dir or None
+        self.sweep_interval = sweep_interval
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._counts = {'created': 0, 'turns': 0, 'duplicates': 0, 'expired': 0, 'evictions': 0, 'diskLoads': 0,
+                        'conflicts': 0}
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def record(self, candidate_id, question_context, text, entities, turn_id=None):
+        """Add a turn to the candidate's session and return its summary (merged entities and diff)
+
+        A turn whose `turn_id` is already in the session is not merged again;
+        its summary has an empty diff and `duplicate: true`.
+        """
+        with self._disk_lock(candidate_id), self._lock:
+            self._sweep()
+            session = self._load(candidate_id)
+            if session is None:
+                session = Session(candidate_id)
+                self._counts['created'] += 1
+            elif turn_id is not None and session.has_turn(turn_id):
+                self._counts['duplicates'] += 1
+                summary = session.summary({'added': {}, 'changed': {}, 'conflicts': {}})
+                summary['duplicate'] = True
+                return summary
+            diff = session.add_turn(question_context, text, entities, self.max_turns, turn_id)
+            self._counts['turns'] += 1
+            self._counts['conflicts'] += len(diff['conflicts'])
+            self._store(session)
+            # Under the locks, so concurrent turns reach the disk in order
+            self._write_disk(session)
+            return session.summary(diff)
+
+    def get(self, candidate_id):
+        """Return the candidate's session as a dict, or None"""
+        with self._lock:
+            session = self._load(candidate_id)
+            return session.to_dict() if session is not None else None
+
+    def delete(self, candidate_id):
+        """Forget the candidate's session; return whether there was one"""
+        with self._disk_lock(candidate_id), self._lock:
+            found = self._sessions.pop(candidate_id, None) is not None
+            path = self._disk_path(candidate_id)
+            if path:
+                try:
+                    os.remove(path)
+                    found = True
+                except OSError:
+                    pass
+            return found
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats.update({
+                'sessions': len(self._sessions),
+                'maxSessions': self.max_sessions,
+                'ttl': self.ttl,
+                'disk': self.disk_dir is not None,
+            })
+            return stats
+
+    def _expired(self, session):
+        return session.updated_at < time.time() - self.ttl
+
+    def _load(self, candidate_id):
+        # Caller holds the lock
+        session = self._sessions.get(candidate_id)
+        path = self._disk_path(candidate_id)
+        if path:
+            version = self._disk_version(path)
+            if version is not None and (session is None or version != session.disk_version):
+                # Not in memory, or written by another worker since
+                session = self._read_disk(path, version) or session
+        if session is None:
+            return None
+        if self._expired(session):
+            self._drop(candidate_id)
+            return None
+        self._store(session)
+        return session
+
+    def _store(self, session):
+        # Caller holds the lock
+        self._sessions[session.candidate_id] = session
+        self._sessions.move_to_end(session.candidate_id)
+        while len(self._sessions) > self.max_sessions:
+            # Evicted sessions are reloaded from disk when it is enabled
+            self._sessions.popitem(last=False)
+            self._counts['evictions'] += 1
+
+    def _drop(self, candidate_id):
+        # Caller holds the lock
+        self._sessions.pop(candidate_id, None)
+        self._counts['expired'] += 1
+        path = self._disk_path(candidate_id)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _sweep(self):
+        # Expire idle sessions at most once per sweep_interval; caller holds the lock
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for candidate_id in [candidate_id for candidate_id, session in self._sessions.items()
+                             if self._expired(session)]:
+            self._drop(candidate_id)
+        if self.disk_dir:
+            cutoff = time.time() - self.ttl
+            try:
+                names = os.listdir(self.disk_dir)
+            except OSError:
+                return
+            for name in names:
+                path = os.path.join(self.disk_dir, name)
+                try:
+                    if name.endswith('.json') and os.stat(path).st_mtime < cutoff:
+                        os.remove(path)
+                        self._counts['expired'] += 1
+                except OSError:
+                    pass
+            for name in names:
+                if name.endswith('.json.lock'):
+                    self._remove_lock(os.path.join(self.disk_dir, name), cutoff)
+
+    def _disk_path(self, candidate_id):
+        if not self.disk_dir:
+            return None
+        # Candidate ids come from clients: keep file names inside disk_dir
+        name = ''.join(char if char.isalnum() or char in '-_' else f"%{ord(char):02x}" for char in str(candidate_id))
+        return os.path.join(self.disk_dir, f"{name}.json")
+
+    @staticmethod
+    def _disk_version(path):
+        # Every save replaces the file, so the inode changes even within the mtime resolution
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    @contextmanager
+    def _disk_lock(self, candidate_id):
+        """Hold the candidate's lock file, so worker processes take turns on its disk copy"""
+        path = self._disk_path(candidate_id)
+        if path is None or fcntl is None:
+            yield
+            return
+        lock_path = f"{path}.lock"
+        while True:
+            try:
+                lock_file = open(lock_path, 'a')
+            except OSError as e:
+                log.warning(f"Could not lock session {path}: {str(e)}")
+                yield
+                return
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # The sweep may have removed the file while we waited for it
+                if os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino:
+                    break
+            except OSError:
+                pass
+            lock_file.close()
+        with lock_file:
+            yield
+
+    def _remove_lock(self, lock_path, cutoff):
+        # Only unused lock files of sessions that are gone; caller holds the lock
+        try:
+            if os.path.exists(lock_path[:-len('.lock')]) or os.stat(lock_path).st_mtime >= cutoff:
+                return
+            with open(lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if not os.path.exists(lock_path[:-len('.lock')]):
+                    os.remove(lock_path)
+        except OSError:
+            pass  # In use (BlockingIOError) or already removed
+
+    def _read_disk(self, path, version):
+        try:
+            with open(path, encoding='utf-8') as f:
+                session = Session.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Could not read session {path}: {str(e)}")
+            return None
+        session.disk_version = version
+        self._counts['diskLoads'] += 1
+        return session
+
+    def _write_disk(self, session):
+        path = self._disk_path(session.candidate_id)
+        if not path:
+            return
+        try:
+            # Write then rename so readers never see a partial file
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(session.to_dict(), f)
+            os.replace(temp_path, path)
+            session.disk_version = self._disk_version(path)
+        except OSError as e:
+            log.warning(f"Could not write session {path}: {str(e)}")
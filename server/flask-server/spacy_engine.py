@@ -0,0 +1,379 @@
+import os
+
+import spacy
+from spacy.language import Language
+from spacy.matcher import Matcher, PhraseMatcher
+from spacy.tokens import Doc
+from spacy.util import compile_prefix_regex, compile_suffix_regex
+
+from entity_engine import (NEGATIVE_KEYWORDS, NEGATIVE_PHRASES, NUMBER_WORDS, POSITIVE_KEYWORDS, POSITIVE_PHRASES,
+                           TIME_OF_DAY, profile_name, standardize_ctc_value)
+
+# spaCy entity extraction engine (ENTITY_ENGINE=spacy)
+#
+# The same entities as entity_engine.extract_entities, found with token
+# patterns instead of substring regexes, so words only match whole tokens
+# ("no" never matches inside "know") and a positive word right after a
+# negation ("not interested") counts as negative. The pipeline is a blank
+# English tokenizer (taught to split "12k", "8.5lpa", "rs.12" and "2:30pm")
+# plus one rule-matcher component per entity group; each question context
+# runs only the components its profile needs, the others are disabled.
+#
+# Batches go through nlp.pipe, grouped by profile. With n_process > 1,
+# groups of at least batch_size * n_process transcripts are split over
+# worker processes (started per call, so only worth it for large offline
+# batches); smaller groups stay in this process.
+
+ENTITY_SPACY_BATCH_SIZE = int(os.getenv('ENTITY_SPACY_BATCH_SIZE', 256))
+ENTITY_SPACY_PROCESSES = int(os.getenv('ENTITY_SPACY_PROCESSES', 1))
+# Records read from a batch before grouping them by profile
+ENTITY_SPACY_BLOCK_SIZE = int(os.getenv('ENTITY_SPACY_BLOCK_SIZE', 10000))
+
+NUMBER = {'TEXT': {'REGEX': r'^\d+(?:\.\d+)?$'}}
+INTEGER = {'TEXT': {'REGEX': r'^\d+$'}}
+HOUR = {'TEXT': {'REGEX': r'^\d{1,2}$'}}
+CLOCK = {'TEXT': {'REGEX': r'^\d{1,2}[:.]\d{2}$'}}
+CURRENCY = {'LOWER': {'IN': ['inr', 'rs', 'rs.', '₹']}, 'OP': '?'}
+CTC_UNITS = ['lakh', 'lakhs', 'lpa', 'k', 'l']
+CTC_UNIT = {'LOWER': {'IN': CTC_UNITS}, 'OP': '?'}
+PER_ANNUM = [{'LOWER': 'per', 'OP': '?'}, {'LOWER': {'IN': ['annum', 'year', 'p.a', 'pa']}, 'OP': '?'},
+             {'ORTH': '.', 'OP': '?'}]
+NOTICE_UNIT = {'LOWER': {'IN': ['day', 'days', 'week', 'weeks', 'month', 'months']}}
+AMPM = {'LOWER': {'IN': ['am', 'pm', 'a.m.', 'p.m.']}}
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+WEEKDAY_ABBREVIATIONS = ['mon', 'tue', 'tues', 'wed', 'thu', 'thur', 'thurs', 'fri', 'sat', 'sun']
+MONTHS = ['jan', 'january', 'feb', 'february', 'mar', 'march', 'apr', 'april', 'may', 'jun', 'june', 'jul', 'july',
+          'aug', 'august', 'sep', 'september', 'oct', 'october', 'nov', 'november', 'dec', 'december']
+NEGATIONS = {'not', "n't", 'never'}
+
+# Number followed by a unit, and a currency before a number, become separate tokens
+SUFFIXES = [r'(?<=[0-9])(?i:lakhs|lakh|lpa|k|l|am|pm|hrs|hours)']
+PREFIXES = [r'(?i:rs\.?|inr|₹)(?=[0-9])']
+
+# Rules per entity group as (label, token patterns, phrases). Within a group,
+# labels are tried in order and the first label found anywhere wins (the
+# earliest match if it is found several times), as in entity_engine.
+RULES = {
+    'interest': [
+        ('interest_yes', [], POSITIVE_KEYWORDS),
+        ('interest_no', [], NEGATIVE_KEYWORDS),
+        ('interest_yes_phrase', [], POSITIVE_PHRASES),
+        ('interest_no_phrase', [], NEGATIVE_PHRASES),
+    ],
+    'notice': [
+        ('notice_range', [[INTEGER, {'LOWER': {'IN': ['to', '-']}}, INTEGER, NOTICE_UNIT]], []),
+        ('notice_count', [[INTEGER, NOTICE_UNIT]], []),
+        ('notice_words', [[{'LOWER': {'IN': list(NUMBER_WORDS)}}, NOTICE_UNIT]], []),
+        ('notice_immediate', [[{'LOWER': {'IN': ['immediate', 'immediately']}}]], []),
+    ],
+    'ctc': [
+        ('ctc_current_stated', [[{'LOWER': {'IN': ['current', 'currently']}},
+                                 {'LOWER': {'IN': ['ctc', 'salary', 'package']}, 'OP': '?'},
+                                 {'LOWER': {'IN': ['is', 'of', 'at']}, 'OP': '?'}, CURRENCY, NUMBER, CTC_UNIT]], []),
+        ('ctc_current_earning', [[{'LOWER': {'IN': ['getting', 'earning', 'making']}}, CURRENCY, NUMBER, CTC_UNIT]],
+         []),
+        ('ctc_current_trailing', [[CURRENCY, NUMBER, CTC_UNIT] + PER_ANNUM + ending for ending in
+                                  ([{'LOWER': {'IN': ['current', 'currently']}}],
+                                   [{'LOWER': 'right'}, {'LOWER': 'now'}],
+                                   [{'LOWER': 'at'}, {'LOWER': 'present'}])], []),
+        ('ctc_expected_stated', [[{'LOWER': {'REGEX': r'^expect(?:ed|ing|ation)?$'}}, {'LOWER': 'ctc', 'OP': '?'},
+                                  {'LOWER': {'IN': ['is', 'of']}, 'OP': '?'}, CURRENCY, NUMBER, CTC_UNIT]], []),
+        ('ctc_expected_looking', [[{'LOWER': 'looking'}, {'LOWER': 'for'}, CURRENCY, NUMBER, CTC_UNIT]], []),
+        ('ctc_expected_trailing', [[CURRENCY, NUMBER, CTC_UNIT] + PER_ANNUM +
+                                   [{'LOWER': {'REGEX': r'^(?:expect|want|desired)'}}]], []),
+        ('ctc_range', [[CURRENCY, NUMBER, CTC_UNIT, {'LOWER': {'IN': ['to', 'and', '-']}}, CURRENCY, NUMBER,
+                        CTC_UNIT]], []),
+        ('ctc_number', [[NUMBER]], []),
+    ],
+    'availability': [
+        ('day_name', [[{'LOWER': {'IN': WEEKDAYS}}]], []),
+        ('day_abbrev', [[{'LOWER': {'IN': WEEKDAY_ABBREVIATIONS}}]], []),
+        ('day_relative', [], ['tomorrow', 'day after tomorrow', 'next week']),
+        ('day_date', [[{'TEXT': {'REGEX': r'^\d{1,2}(?:st|nd|rd|th)?$'}}, {'LOWER': 'of', 'OP': '?'},
+                       {'LOWER': {'IN': MONTHS}}]], []),
+        ('time_ampm_minutes', [[CLOCK, AMPM]], []),
+        ('time_24h', [[CLOCK, {'LOWER': {'IN': ['hours', 'hrs', 'h']}, 'OP': '?'}]], []),
+        ('time_ampm', [[HOUR, AMPM]], []),
+        ('time_oclock', [[HOUR, {'LOWER': {'IN': ["o'clock", 'oclock', 'o’clock']}}]], []),
+        ('time_period', [[{'LOWER': {'IN': list(TIME_OF_DAY)}}]], []),
+    ],
+}
+
+DAY_RULES = ['day_name', 'day_abbrev', 'day_relative', 'day_date']
+TIME_RULES = ['time_ampm_minutes', 'time_24h', 'time_ampm', 'time_oclock', 'time_period']
+CURRENT_CTC_RULES = ['ctc_current_stated', 'ctc_current_earning', 'ctc_current_trailing']
+EXPECTED_CTC_RULES = ['ctc_expected_stated', 'ctc_expected_looking', 'ctc_expected_trailing']
+
+# Matcher components each profile needs
+PROFILE_PIPES = {
+    'full conversation': ['interest_matcher', 'notice_matcher', 'ctc_matcher', 'availability_matcher'],
+    'notice period': ['notice_matcher'],
+    'compensation': ['ctc_matcher'],
+    'availability': ['availability_matcher'],
+}
+
+if not Doc.has_extension('rule_matches'):
+    Doc.set_extension('rule_matches', default=None)
+
+
+class RuleMatcher:
+    """Pipeline component: store one group's matches as doc._.rule_matches[group] = [(label, start, end)]"""
+
+    def __init__(self, nlp, group):
+        self.group = group
+        self.matcher = Matcher(nlp.vocab)
+        self.phrases = PhraseMatcher(nlp.vocab, attr='LOWER')
+        for label, patterns, phrases in RULES[group]:
+            if patterns:
+                self.matcher.add(label, patterns, greedy='LONGEST')
+            if phrases:
+                self.phrases.add(label, [nlp.make_doc(phrase) for phrase in phrases])
+
+    def __call__(self, doc):
+        strings = doc.vocab.strings
+        found = [(strings[match_id], start, end) for matcher in (self.matcher, self.phrases) if len(matcher)
+                 for match_id, start, end in matcher(doc)]
+        matches = dict(doc._.rule_matches or {})
+        matches[self.group] = sorted(found, key=lambda match: match[1])
+        doc._.rule_matches = matches
+        return doc
+
+
+for _group in RULES:
+    Language.factory(f"{_group}_matcher", func=lambda nlp, name, group=_group: RuleMatcher(nlp, group))
+
+
+def build_pipeline():
+    """Blank English pipeline with the number/unit tokenizer rules and every matcher component"""
+    nlp = spacy.blank('en')
+    nlp.tokenizer.suffix_search = compile_suffix_regex(SUFFIXES + list(nlp.Defaults.suffixes)).search
+    nlp.tokenizer.prefix_search = compile_prefix_regex(PREFIXES + list(nlp.Defaults.prefixes)).search
+    for group in RULES:
+        nlp.add_pipe(f"{group}_matcher")
+    return nlp
+
+
+class Matches:
+    """A doc's matches, with the first-rule-wins lookup of entity_engine.Transcript"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.by_label = {}
+        for group_matches in (doc._.rule_matches or {}).values():
+            for label, start, end in group_matches:
+                self.by_label.setdefault(label, []).append((start, end))
+        self.used = set()  # Tokens taken by notice periods, dates and times
+
+    def first(self, labels, exclude=False):
+        """Return (label, span) for the first label, in order, that matched"""
+        for label in labels:
+            for start, end in self.by_label.get(label, ()):
+                if exclude and self.used.intersection(range(start, end)):
+                    continue
+                return label, self.doc[start:end]
+        return None, None
+
+    def all(self, label, exclude=False):
+        return [self.doc[start:end] for start, end in self.by_label.get(label, ())
+                if not (exclude and self.used.intersection(range(start, end)))]
+
+    def use(self, span):
+        if span is not None:
+            self.used.update(range(span.start, span.end))
+
+
+def _negated(span):
+    return any(token.lower_ in NEGATIONS for token in span.doc[max(0, span.start - 2):span.start])
+
+
+def _extract_interest(matches, entities):
+    # A positive word right after a negation ("not interested") is negative
+    positive = {label: [span for span in matches.all(label) if not _negated(span)]
+                for label in ('interest_yes', 'interest_yes_phrase')}
+    negated = any(_negated(span) for label in positive for span in matches.all(label))
+    if positive['interest_yes']:
+        entities["interested"] = "Yes"
+    elif matches.all('interest_no') or negated:
+        entities["interested"] = "No"
+    elif positive['interest_yes_phrase']:
+        entities["interested"] = "Yes"
+    elif matches.all('interest_no_phrase'):
+        entities["interested"] = "No"
+
+
+def _singular(unit):
+    # Reported in the singular, like the regex engine ("30 day")
+    return unit[:-1] if unit.endswith('s') else unit
+
+
+def _extract_notice_period(matches, entities):
+    label, span = matches.first(['notice_range', 'notice_count', 'notice_words', 'notice_immediate'])
+    matches.use(span)
+    if label == 'notice_immediate':
+        entities["notice_period"] = "Immediate"
+    elif label == 'notice_range':
+        entities["notice_period"] = f"{span[0].text}-{span[2].text} {_singular(span[3].lower_)}"
+    elif label is not None:
+        number = NUMBER_WORDS.get(span[0].lower_, span[0].text)
+        entities["notice_period"] = f"{number} {_singular(span[1].lower_)}"
+
+
+def _amounts(span):
+    """[(value, unit)] for the numbers in a span, each with the CTC unit right after it"""
+    amounts = []
+    for token in span:
+        if token.like_num and any(char.isdigit() for char in token.text):
+            amounts.append([token.text, ''])
+        elif amounts and token.lower_ in CTC_UNITS and token.i > 0 and span.doc[token.i - 1].like_num:
+            amounts[-1][1] = token.lower_
+    return amounts
+
+
+def _ctc_from(matches, labels, exclude):
+    _, span = matches.first(labels, exclude)
+    if span is None:
+        return None
+    value, unit = _amounts(span)[0]
+    return standardize_ctc_value(value, unit)
+
+
+def _extract_ctc(matches, entities, fill_partial, exclude=False):
+    """entity_engine._extract_ctc on matches; with `exclude`, numbers in notice periods, dates and times are skipped"""
+    current = _ctc_from(matches, CURRENT_CTC_RULES, exclude)
+    expected = _ctc_from(matches, EXPECTED_CTC_RULES, exclude)
+    if current is not None:
+        entities["current_ctc"] = current
+    if expected is not None:
+        entities["expected_ctc"] = expected
+
+    if current is not None and expected is not None:
+        return
+
+    # "X to Y" / "X and Y": a unit said once ("8 and 12 lakhs") applies to both
+    _, span = matches.first(['ctc_range'], exclude)
+    if span is not None:
+        (first, first_unit), (second, second_unit) = _amounts(span)[:2]
+        if current is None:
+            entities["current_ctc"] = standardize_ctc_value(first, first_unit or second_unit)
+        if expected is None:
+            entities["expected_ctc"] = standardize_ctc_value(second, second_unit)
+        return
+
+    numbers = [span.text for span in matches.all('ctc_number', exclude)][:2]
+    if len(numbers) == 2:
+        if fill_partial or (current is None and expected is None):
+            if current is None:
+                entities["current_ctc"] = standardize_ctc_value(numbers[0], '')
+            if expected is None:
+                entities["expected_ctc"] = standardize_ctc_value(numbers[1], '')
+    elif len(numbers) == 1 and current is None:
+        entities["current_ctc"] = standardize_ctc_value(numbers[0], '')
+
+
+def _format_day(label, span):
+    if label == 'day_date':
+        return f"{span[0].text.rstrip('stndrh')} {span[-1].lower_}"
+    return span.text.lower()
+
+
+def _format_time(label, span):
+    if label == 'time_period':
+        return TIME_OF_DAY[span.text.lower()]
+    if label == 'time_oclock':
+        hour = span[0].text
+        ampm = "AM" if 8 <= int(hour) <= 11 else "PM"
+        return f"{hour}:00 {ampm}"
+    if label == 'time_ampm':
+        return f"{span[0].text}:00 {span[1].lower_.replace('.', '').upper()}"
+    hour, minute = span[0].text.replace('.', ':').split(':')
+    if label == 'time_ampm_minutes':
+        return f"{hour}:{minute} {span[1].lower_.replace('.', '').upper()}"
+    ampm = "AM" if int(hour) < 12 else "PM"
+    hour12 = str(int(hour) % 12)
+    hour12 = "12" if hour12 == "0" else hour12
+    return f"{hour12}:{minute} {ampm}"
+
+
+def _extract_availability(matches, entities):
+    availability = {}
+    label, span = matches.first(DAY_RULES)
+    matches.use(span)
+    if label is not None:
+        availability["day"] = _format_day(label, span)
+    label, span = matches.first(TIME_RULES)
+    while label == 'time_24h' and span.end < len(span.doc) and span.doc[span.end].lower_ in CTC_UNITS:
+        # "12.50 lakhs" is an amount, not a time
+        label, span = matches.first(TIME_RULES[TIME_RULES.index(label) + 1:])
+    matches.use(span)
+    if label is not None:
+        availability["time"] = _format_time(label, span)
+    if availability:
+        entities["availability"] = availability
+
+
+def entities_from_doc(doc, profile):
+    """Build extract_entities' schema from a doc processed with the profile's components"""
+    entities = {}
+    matches = Matches(doc)
+    if profile == 'full conversation':
+        _extract_interest(matches, entities)
+        _extract_notice_period(matches, entities)
+        _extract_availability(matches, entities)
+        _extract_ctc(matches, entities, fill_partial=True, exclude=True)
+        # Keep the regex engine's key order
+        order = ['interested', 'notice_period', 'current_ctc', 'expected_ctc', 'availability']
+        return {key: entities[key] for key in order if key in entities}
+    if profile == 'notice period':
+        _extract_notice_period(matches, entities)
+    elif profile == 'compensation':
+        _extract_ctc(matches, entities, fill_partial=False)
+    elif profile == 'availability':
+        _extract_availability(matches, entities)
+    return entities
+
+
+class SpacyEngine:
+    """extract_entities / extract_entities_batch on a spaCy rule pipeline, loaded once"""
+
+    name = 'spacy'
+
+    def __init__(self, batch_size=ENTITY_SPACY_BATCH_SIZE, n_process=ENTITY_SPACY_PROCESSES,
+                 block_size=ENTITY_SPACY_BLOCK_SIZE):
+        self.nlp = build_pipeline()
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.block_size = block_size
+        self._disabled = {profile: [name for name in self.nlp.pipe_names if name not in pipes]
+                          for profile, pipes in PROFILE_PIPES.items()}
+
+    def extract(self, text, question_context):
+        """Extract entities from recognized text based on question context"""
+        profile = profile_name(question_context or '')
+        if profile is None:
+            return {}
+        return entities_from_doc(self.nlp(text, disable=self._disabled[profile]), profile)
+
+    def extract_batch(self, records):
+        """Yield results for {text, questionContext} records, in order
+
+        Records are read in blocks of block_size and each block is piped
+        through nlp.pipe once per profile, with only that profile's matchers.
+        """
+        records = iter(records)
+        while True:
+            block = [record for _, record in zip(range(self.block_size), records)]
+            if not block:
+                return
+            results = [{} for _ in block]
+            groups = {}
+            for index, record in enumerate(block):
+                profile = profile_name(record.get('questionContext') or '')
+                if profile is not None:
+                    groups.setdefault(profile, []).append(index)
+            for profile, indexes in groups.items():
+                n_process = self.n_process if len(indexes) >= self.batch_size * self.n_process else 1
+                docs = self.nlp.pipe((block[index]['text'] for index in indexes), batch_size=self.batch_size,
+                                     n_process=n_process, disable=self._disabled[profile])
+                for index, doc in zip(indexes, docs):
+                    results[index] = entities_from_doc(doc, profile)
+            yield from results
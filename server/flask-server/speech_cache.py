@@ -0,0 +1,149 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from entity_engine import extract_entities
+
+# Caches for repeated work on re-sent recordings
+#
+# TranscriptCache is content-addressed: the key is a hash of the uploaded
+# bytes plus the ASR engine/model identity, so the same recording recognized
+# by a different model is a different entry. A memory tier evicts least
+# recently used entries once its byte budget is exceeded; an optional disk
+# tier keeps transcripts across restarts.
+
+# Rough per-entry bookkeeping cost in the memory tier, in bytes
+ENTRY_OVERHEAD = 200
+
+log = logging.getLogger(__name__)
+
+
+class TranscriptCache:
+    """Two-tier (memory LRU + optional disk) cache of transcripts by audio hash"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'memoryHits': 0, 'diskHits': 0, 'misses': 0, 'evictions': 0}
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(audio_bytes, model_id):
+        digest = hashlib.sha256(model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(audio_bytes)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached transcript for `key`, or None"""
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self._counts['hits'] += 1
+                self._counts['memoryHits'] += 1
+                return text
+
+        text = self._read_disk(key)
+        with self._lock:
+            if text is None:
+                self._counts['misses'] += 1
+                return None
+            self._counts['hits'] += 1
+            self._counts['diskHits'] += 1
+            self._store(key, text)
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._store(key, text)
+        self._write_disk(key, text)
+
+    def get_or_compute(self, audio_bytes, model_id, compute):
+        """Return the transcript for the audio, calling compute() on a miss"""
+        key = self.key(audio_bytes, model_id)
+        text = self.get(key)
+        if text is None:
+            text = compute()
+            self.put(key, text)
+        return text
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'disk': self.disk_dir is not None,
+            })
+            return stats
+
+    def _store(self, key, text):
+        # Caller holds the lock
+        size = len(text.encode('utf-8')) + len(key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key).encode('utf-8')) + len(key) + ENTRY_OVERHEAD
+        self._entries[key] = text
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            old_key, old_text = self._entries.popitem(last=False)
+            self._bytes -= len(old_text.encode('utf-8')) + len(old_key) + ENTRY_OVERHEAD
+            self._counts['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.txt")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, text):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log.warning(f"Could not write transcript cache entry: {str(e)}")
+
+
+def _copy_entities(entities):
+    # Entities nest at most one level (availability); copy so callers can't
+    # mutate the memoized value
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in entities.items()}
+
+
+class EntityMemo:
+    """Memoized extract_entities (or an entity engine's extract) keyed on (transcript, question_context)"""
+
+    def __init__(self, maxsize=4096, extract=extract_entities):
+        self._extract = lru_cache(maxsize=maxsize)(extract) if maxsize else extract
+
+    def __call__(self, text, question_context):
+        return _copy_entities(self._extract(text, question_context))
+
+    def stats(self):
+        if not hasattr(self._extract, 'cache_info'):
+            return {'hits': 0, 'misses': 0, 'entries': 0, 'maxEntries': 0}
+        info = self._extract.cache_info()
+        return {'hits': info.hits, 'misses': info.misses, 'entries': info.currsize, 'maxEntries': info.maxsize}
@@ -0,0 +1,141 @@
+import re
+
+# Spoken numbers to digits for Vosk transcripts
+#
+# Vosk writes numbers the way they were said ("twelve lakhs", "thirty days",
+# "the twenty first of march at two thirty pm"), while the entity rules look
+# for digits. digits_from_words() rewrites every run of number words as one
+# number, keeping the words around it: units, teens and tens combine with
+# "hundred" and "thousand" ("one hundred and fifty"), "point" starts decimals
+# ("eight point five") and "and a half" adds .5. Ordinals are only dates
+# ("the twenty first", "first of march", "march first" become "21st", "1st"),
+# so "give me a second" and "first of all" keep their words. An hour followed
+# by its minutes before am/pm becomes "2:30 pm" and "fourteen hundred hours"
+# "14:00 hours". Words the parser does not expect end the number, so "ten and
+# fourteen" stays two numbers, and "one" after "no", "any" and the like, or
+# before "of" ("one of the candidates"), is left as a word.
+#
+# The examples in digits_from_words() run with `python -m doctest spoken_numbers.py`.
+
+UNITS = {'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8,
+         'nine': 9}
+TEENS = {'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15, 'sixteen': 16,
+         'seventeen': 17, 'eighteen': 18, 'nineteen': 19}
+TENS = {'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70, 'eighty': 80,
+        'ninety': 90}
+ORDINALS = {'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5, 'sixth': 6, 'seventh': 7, 'eighth': 8,
+            'ninth': 9, 'tenth': 10, 'eleventh': 11, 'twelfth': 12, 'thirteenth': 13, 'fourteenth': 14,
+            'fifteenth': 15, 'sixteenth': 16, 'seventeenth': 17, 'eighteenth': 18, 'nineteenth': 19}
+TENS_ORDINALS = {'twentieth': 20, 'thirtieth': 30}
+
+MONTHS = ('january', 'february', 'march', 'april', 'may', 'june', 'july', 'august', 'september', 'october',
+          'november', 'december')
+# Units that keep "one of" a number
+UNIT_WORDS = ('day', 'days', 'week', 'weeks', 'month', 'months', 'lakh', 'lakhs', 'lpa', 'k')
+
+# "no one", "any one": not a number
+PRONOUN_ONE = ('no', 'any', 'every', 'some', 'which', 'this', 'that')
+
+_CLOCK = re.compile(r'\b(1[0-2]|[1-9]) ([0-5]\d) (?=(?:am|pm|a\.m\.|p\.m\.)\b)')
+_HOURS = re.compile(r'\b([01]?\d|2[0-3])([0-5]\d) (?=hours\b)')
+
+
+def _ordinal(value):
+    if value % 100 in (11, 12, 13):
+        return f"{value}th"
+    suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(value % 10, 'th')
+    return f"{value}{suffix}"
+
+
+def _is_date(words, start, end):
+    """Whether the ordinal in words[start:end] is a date: the Nth, Nth of <month>, <month> Nth"""
+    before = words[start - 1] if start else None
+    return (before in ('the',) + MONTHS
+            or words[end:end + 1] == ['of'] and end + 1 < len(words) and words[end + 1] in MONTHS)
+
+
+def _number(words, start):
+    """Parse the number starting at words[start]; return (text, next index), or None"""
+    total = 0   # Completed thousands
+    group = 0   # Below a thousand
+    last = None
+    index = start
+    while index < len(words):
+        word = words[index]
+        if word in ORDINALS and (last in (None, 'hundred', 'thousand') or last == 'tens' and ORDINALS[word] < 10):
+            if not _is_date(words, start, index + 1):
+                break
+            return _ordinal(total + group + ORDINALS[word]), index + 1
+        if last in (None, 'hundred', 'thousand') and word in TENS_ORDINALS:
+            if not _is_date(words, start, index + 1):
+                break
+            return _ordinal(total + group + TENS_ORDINALS[word]), index + 1
+        if word in UNITS and last in (None, 'tens', 'hundred', 'thousand'):
+            group += UNITS[word]
+            last = 'unit'
+        elif word in TEENS and last in (None, 'hundred', 'thousand'):
+            group += TEENS[word]
+            last = 'teen'
+        elif word in TENS and last in (None, 'hundred', 'thousand'):
+            group += TENS[word]
+            last = 'tens'
+        elif word == 'hundred' and last in ('unit', 'teen', 'tens') and group < 100:
+            group *= 100
+            last = 'hundred'
+        elif word == 'thousand' and last in ('unit', 'teen', 'tens', 'hundred'):
+            total += group * 1000
+            group = 0
+            last = 'thousand'
+        elif (word == 'and' and last in ('hundred', 'thousand') and index + 1 < len(words)
+              and words[index + 1] in {**UNITS, **TEENS, **TENS}):
+            pass  # "one hundred and fifty"
+        else:
+            break
+        index += 1
+    if last is None:
+        return None
+    if words[start:index] == ['one'] and (start and words[start - 1] in PRONOUN_ONE
+                                          or words[index:index + 1] == ['of']
+                                          and words[index + 1:index + 2] not in [[unit] for unit in UNIT_WORDS]):
+        return None
+
+    value = str(total + group)
+    if words[index:index + 1] == ['point'] and index + 1 < len(words) and words[index + 1] in UNITS:
+        index += 1
+        digits = []
+        while index < len(words) and words[index] in UNITS:
+            digits.append(str(UNITS[words[index]]))
+            index += 1
+        value = f"{value}.{''.join(digits)}"
+    elif words[index:index + 3] == ['and', 'a', 'half']:
+        value = f"{value}.5"
+        index += 3
+    return value, index
+
+
+def digits_from_words(text):
+    """Rewrite the number words in a lowercase transcript as digits
+
+    >>> digits_from_words('my current ctc is twelve lakhs and i can join on the twenty first of march')
+    'my current ctc is 12 lakhs and i can join on the 21st of march'
+    >>> digits_from_words('give me a second i earn twelve lakhs')
+    'give me a second i earn 12 lakhs'
+    >>> digits_from_words('first of all i can join in thirty days')
+    'first of all i can join in 30 days'
+    >>> digits_from_words('i am one of the candidates')
+    'i am one of the candidates'
+    """
+    if not text:
+        return text
+    words = text.split()
+    output = []
+    index = 0
+    while index < len(words):
+        number = _number(words, index)
+        if number is None:
+            output.append(words[index])
+            index += 1
+        else:
+            value, index = number
+            output.append(value)
+    return _HOURS.sub(r'\1:\2 ', _CLOCK.sub(r'\1:\2 ', ' '.join(output)))
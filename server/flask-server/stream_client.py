@@ -0,0 +1,95 @@
+import argparse
+import json
+import threading
+import time
+import wave
+from urllib.parse import urlencode
+
+from simple_websocket import Client, ConnectionClosed
+
+# Replays a WAV file against /process-speech/stream as if it were spoken live
+
+BASE_URL = "ws://127.0.0.1:5000"
+STREAM_URL = f"{BASE_URL}/process-speech/stream"
+
+
+def stream_wav(wav_path, candidate_id, question_context, chunk_ms=250, realtime=True, url=STREAM_URL):
+    """Send a WAV file in real-time-paced chunks and print server events"""
+    with wave.open(wav_path, 'rb') as wav:
+        is_pcm = wav.getframerate() == 16000 and wav.getnchannels() == 1 and wav.getsampwidth() == 2
+        bytes_per_second = wav.getframerate() * wav.getnchannels() * wav.getsampwidth()
+
+    params = {'candidateId': candidate_id, 'questionContext': question_context}
+    if is_pcm:
+        # Already 16kHz mono: send bare samples and skip server-side decoding
+        with wave.open(wav_path, 'rb') as wav:
+            audio = wav.readframes(wav.getnframes())
+        params['format'] = 'pcm'
+    else:
+        # Let the server's FFmpeg decoder parse the WAV container
+        with open(wav_path, 'rb') as f:
+            audio = f.read()
+
+    chunk_bytes = max(2, int(bytes_per_second * chunk_ms / 1000) // 2 * 2)
+    ws = Client.connect(f"{url}?{urlencode(params)}")
+    final = {}
+    done = threading.Event()
+
+    def receive():
+        try:
+            while True:
+                event = json.loads(ws.receive())
+                elapsed = time.perf_counter() - start
+                if event['type'] == 'partial':
+                    print(f"[{elapsed:6.2f}s] partial: {event['text']}")
+                elif event['type'] == 'utterance':
+                    print(f"[{elapsed:6.2f}s] utterance: {event['text']}")
+                    print(f"           entities: {event['entities']}")
+                else:
+                    final.update(event)
+                    break
+        except ConnectionClosed:
+            pass
+        finally:
+            done.set()
+
+    start = time.perf_counter()
+    receiver = threading.Thread(target=receive, daemon=True)
+    receiver.start()
+
+    for offset in range(0, len(audio), chunk_bytes):
+        ws.send(audio[offset:offset + chunk_bytes])
+        if realtime:
+            # Pace chunks like a live microphone
+            time.sleep(chunk_ms / 1000)
+    end_sent_at = time.perf_counter()
+    ws.send('end')
+
+    done.wait()
+    latency = time.perf_counter() - end_sent_at
+    try:
+        ws.close()
+    except ConnectionClosed:
+        pass  # Server already closed the stream
+
+    if final.get('type') == 'final':
+        print(f"\nFinal text: {final['text']}")
+        print(f"Entities: {final['entities']}")
+        print(f"End of speech to final entities: {latency * 1000:.0f} ms")
+    else:
+        print(f"\nError: {final.get('error', 'connection closed')}")
+    return final
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a WAV file as a live stream to the Flask server")
+    parser.add_argument('wav')
+    parser.add_argument('--candidate-id', default='1')
+    parser.add_argument('--question-context', default='full conversation')
+    parser.add_argument('--chunk-ms', type=int, default=250)
+    parser.add_argument('--fast', action='store_true', help='send as fast as possible instead of in real time')
+    parser.add_argument('--url', default=STREAM_URL)
+    args = parser.parse_args()
+
+    stream_wav(args.wav, args.candidate_id, args.question_context,
+               chunk_ms=args.chunk_ms, realtime=not args.fast, url=args.url)
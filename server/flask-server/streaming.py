@@ -0,0 +1,129 @@
+import json
+import subprocess
+import threading
+
+from audio_decode import SAMPLE_RATE, CHANNELS, PCM_CHUNK_BYTES
+from entity_engine import extract_entities
+from spoken_numbers import digits_from_words
+
+# Incremental speech processing for the streaming endpoint
+#
+# A SpeechStream owns one long-running decoder and one incremental
+# recognizer for the lifetime of a connection. Audio chunks are pushed in as
+# they arrive from the client; partial transcripts are emitted as the
+# recognizer produces them and entities are re-extracted from the running
+# transcript each time an utterance is finalized, with its numbers as digits
+# (spoken_numbers.py). When the client stops, only the audio still buffered
+# in the decoder remains to be processed.
+
+
+class SpeechStream:
+    """Decode and recognize one candidate's audio incrementally"""
+
+    def __init__(self, engine, question_context, on_event, raw_pcm=False, extract=extract_entities):
+        if not hasattr(engine, 'recognizer'):
+            raise Exception(f"ASR engine '{engine.name}' does not support streaming recognition")
+        self.question_context = question_context
+        self.on_event = on_event
+        self.extract = extract
+        self.recognizer = engine.recognizer()
+        self.utterances = []
+        self.entities = {}
+        self._lock = threading.Lock()
+        self._decoder = None
+        self._reader = None
+        self._error = None
+
+        if not raw_pcm:
+            # Compressed input (e.g. WebM/Opus from MediaRecorder): keep one
+            # FFmpeg process open for the whole stream
+            self._decoder = subprocess.Popen([
+                'ffmpeg',
+                '-loglevel', 'error',
+                '-i', 'pipe:0',
+                '-f', 's16le',
+                '-acodec', 'pcm_s16le',
+                '-ar', str(SAMPLE_RATE),
+                '-ac', str(CHANNELS),
+                'pipe:1'
+            ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._reader = threading.Thread(target=self._read_decoder, daemon=True)
+            self._reader.start()
+
+    @property
+    def text(self):
+        return ' '.join(self.utterances)
+
+    def feed(self, chunk):
+        """Push a chunk of client audio into the stream"""
+        if self._error:
+            raise self._error
+        if self._decoder is None:
+            self._accept(chunk)
+            return
+        try:
+            self._decoder.stdin.write(chunk)
+            self._decoder.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            raise Exception(f"Audio decoder stopped: {self._decoder_error()}")
+
+    def finish(self):
+        """Flush the decoder and recognizer; return (text, entities)"""
+        if self._decoder is not None:
+            try:
+                self._decoder.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._reader.join()
+            self._decoder.wait()
+            if self._error:
+                raise self._error
+            if self._decoder.returncode != 0 and not self.utterances:
+                raise Exception(f"Audio conversion failed: {self._decoder_error()}")
+
+        with self._lock:
+            self._finalize(json.loads(self.recognizer.FinalResult()))
+        return self.text, self.entities
+
+    def close(self):
+        """Abort the stream, e.g. when the client disconnects"""
+        if self._decoder is not None and self._decoder.poll() is None:
+            self._decoder.kill()
+            self._decoder.wait()
+
+    def _read_decoder(self):
+        try:
+            while True:
+                pcm = self._decoder.stdout.read(PCM_CHUNK_BYTES)
+                if not pcm:
+                    break
+                self._accept(pcm)
+        except Exception as e:
+            self._error = e
+
+    def _decoder_error(self):
+        if self._decoder.poll() is None:
+            return 'decoder still running'
+        return self._decoder.stderr.read().decode(errors='replace').strip()
+
+    def _accept(self, pcm):
+        with self._lock:
+            if self.recognizer.AcceptWaveform(pcm):
+                self._finalize(json.loads(self.recognizer.Result()))
+            else:
+                partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+                if partial:
+                    self.on_event({'type': 'partial', 'text': partial})
+
+    def _finalize(self, result):
+        utterance = digits_from_words(result.get('text', '').strip())
+        if not utterance:
+            return
+        self.utterances.append(utterance)
+        self.entities = self.extract(self.text, self.question_context)
+        self.on_event({
+            'type': 'utterance',
+            'text': utterance,
+            'transcript': self.text,
+            'entities': self.entities,
+        })
@@ -0,0 +1,207 @@
+import atexit
+import contextvars
+import copy
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import metrics
+
+# Non-blocking structured logging
+#
+# Server modules log through the standard `logging` module instead of
+# print(). The root logger gets a QueueLogHandler, which only formats the
+# message and puts the record on a bounded queue; a background thread writes
+# the records to stdout as JSON lines. A slow log pipe therefore delays the
+# writer thread rather than the request, and when the queue is full records
+# are dropped (and counted in log_records_dropped_total) instead of blocking.
+#
+# Every record carries the requestId (X-Request-ID header or a generated id,
+# see start_request) and candidateId of the request that produced it, taken
+# from context variables; use propagate() or context() to carry them onto
+# other threads and run_with_context() into worker processes. Recognized
+# transcripts are logged on their own logger, so LOG_TRANSCRIPTS=false turns
+# them off without touching the other logs.
+#
+# The writer thread is started on the first record in each process, and is
+# stopped (after draining the queue) before a fork so children never inherit
+# it half-way through a write.
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 'json' (one object per line) or 'text' for reading logs in a terminal
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_TRANSCRIPTS = os.getenv('LOG_TRANSCRIPTS', 'true').lower() in ('1', 'true', 'yes')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+TRANSCRIPT_LOGGER = 'transcripts'
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_candidate_id = contextvars.ContextVar('candidate_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'requestId', 'candidateId'}
+
+_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object, including its `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key in ('requestId', 'candidateId'):
+            if getattr(record, key, None) is not None:
+                entry[key] = getattr(record, key)
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class QueueLogHandler(logging.Handler):
+    """Hand records to a background writer thread without ever blocking the caller"""
+
+    def __init__(self, target, maxsize=LOG_QUEUE_SIZE):
+        super().__init__()
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._queue = None
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Everything that depends on the calling thread is resolved here
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if not hasattr(record, 'requestId'):
+            record.requestId = _request_id.get()
+        if not hasattr(record, 'candidateId'):
+            record.candidateId = _candidate_id.get()
+        return record
+
+    def emit(self, record):
+        if self._listener is None or self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+            metrics.LOG_RECORDS_DROPPED.inc()
+        except Exception:
+            self.handleError(record)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # New process (or first use): records queued by the parent are not ours to write
+                self._queue = queue.Queue(self.maxsize)
+                self._listener = None
+                self._pid = os.getpid()
+            if self._listener is None:
+                self._listener = logging.handlers.QueueListener(self._queue, self.target, respect_handler_level=True)
+                self._listener.start()
+
+    def stop(self):
+        """Write out queued records and stop the writer thread (restarted on the next record)"""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+def configure(stream=None):
+    """Install the queue handler on the root logger (once per process)"""
+    global _handler
+    if _handler is not None:
+        return _handler
+    target = logging.StreamHandler(stream or sys.stdout)
+    if LOG_FORMAT == 'json':
+        target.setFormatter(JsonFormatter())
+    else:
+        target.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s [%(requestId)s %(candidateId)s] %(name)s: %(message)s'))
+    _handler = QueueLogHandler(target)
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    logging.getLogger(TRANSCRIPT_LOGGER).setLevel(logging.INFO if LOG_TRANSCRIPTS else logging.CRITICAL + 1)
+    atexit.register(_handler.stop)
+    return _handler
+
+
+def _before_fork():
+    if _handler is not None:
+        _handler.stop()
+
+
+os.register_at_fork(before=_before_fork)
+
+
+def start_request(request_id=None):
+    """Bind a correlation id (generated unless given) to the current request"""
+    request_id = request_id or os.urandom(8).hex()
+    _request_id.set(request_id)
+    _candidate_id.set(None)
+    return request_id
+
+
+def end_request():
+    _request_id.set(None)
+    _candidate_id.set(None)
+
+
+def set_candidate(candidate_id):
+    _candidate_id.set(candidate_id)
+
+
+def current():
+    """Return the (request id, candidate id) bound to the current context"""
+    return _request_id.get(), _candidate_id.get()
+
+
+@contextmanager
+def context(request_id, candidate_id=None):
+    """Bind a request and candidate id for the duration of a block (e.g. in a worker thread)"""
+    request_token = _request_id.set(request_id)
+    candidate_token = _candidate_id.set(candidate_id)
+    try:
+        yield
+    finally:
+        _candidate_id.reset(candidate_token)
+        _request_id.reset(request_token)
+
+
+def propagate(func):
+    """Wrap func to run in a copy of the caller's context, on whichever thread calls it"""
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def run_with_context(bound, func, *args):
+    """Run func(*args) with the ids from current(), e.g. in a pool worker process"""
+    with context(*bound):
+        return func(*args)
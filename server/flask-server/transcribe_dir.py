@@ -0,0 +1,176 @@
+"""Transcribe a directory (or list) of recordings without the HTTP server.
+
+Runs every file through the same pipeline as /process-speech
+(load_pcm, recognize_pcm, then the ENTITY_ENGINE entity extractor, which
+standardizes CTC values with standardize_ctc_value) across a pool of worker processes and
+appends one JSON line per file to --output. Files already present in the
+output are skipped, so an interrupted run resumes where it stopped.
+
+Usage (from server/flask-server):
+    python transcribe_dir.py recordings/ --output results.jsonl --workers 4
+    python transcribe_dir.py --file-list files.txt --output results.jsonl --engine vosk
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from audio_decode import SAMPLE_RATE, SAMPLE_WIDTH, load_pcm
+
+AUDIO_EXTENSIONS = ('.webm', '.wav', '.ogg', '.opus', '.mp3', '.m4a', '.flac', '.mp4')
+
+# Set in each worker process by _init_worker
+_app = None
+_question_context = ''
+
+
+def find_files(inputs, file_list=None, extensions=AUDIO_EXTENSIONS):
+    """Yield audio files under the given directories/files and from a file list"""
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+    if file_list:
+        with (sys.stdin if file_list == '-' else open(file_list, encoding='utf-8')) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line
+
+
+def load_done(output_path, retry_failed=False):
+    """Return files recorded in an earlier run, dropping a partially written last line"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'rb+') as f:
+        good_end = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # Interrupted mid-write
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            good_end += len(line)
+            if record.get('status') == 'processed' or not retry_failed:
+                done.add(record['file'])
+            else:
+                done.discard(record['file'])
+        f.truncate(good_end)
+    return done
+
+
+def _init_worker(question_context):
+    global _app, _question_context
+    # Each worker runs recognition itself; a nested process pool would only add overhead
+    os.environ['ASR_EXECUTION'] = 'inline'
+    import app
+    _app = app
+    _question_context = question_context
+
+
+def process_file(path):
+    """Transcribe one recording in a worker process and return its JSONL record"""
+    record = {'file': path, 'questionContext': _question_context}
+    start = time.perf_counter()
+    try:
+        # Decoded in memory (WAV in-process, else PyAV or FFmpeg pipes), so the
+        # duration comes from the PCM whichever path decoded it
+        with open(path, 'rb') as f:
+            pcm = load_pcm(f.read())
+        record['audioSeconds'] = round(len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH), 3)
+        text, speech = _app.recognize_pcm(pcm, with_stats=True, question_context=_question_context)
+        if speech:
+            record['speech'] = speech
+        record.update({
+            'text': text,
+            'entities': _app.entity_extractor.extract(text, _question_context),
+            'status': 'processed'
+        })
+    except Exception as e:
+        record.update({'status': 'failed', 'error': str(e)})
+    record['elapsed'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def run(files, output_path, workers, question_context, progress_every=10.0):
+    counts = {'processed': 0, 'failed': 0}
+    audio_seconds = 0.0
+    busy_seconds = 0.0
+    start = time.perf_counter()
+    last_report = start
+
+    pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(question_context,))
+    try:
+        with open(output_path, 'a', encoding='utf-8') as out:
+            for record in pool.imap_unordered(process_file, files, chunksize=4):
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+                counts[record['status']] += 1
+                audio_seconds += record.get('audioSeconds', 0.0)
+                busy_seconds += record['elapsed']
+                if record['status'] == 'failed':
+                    print(f"Failed: {record['file']}: {record['error']}")
+
+                now = time.perf_counter()
+                if now - last_report >= progress_every:
+                    last_report = now
+                    done = counts['processed'] + counts['failed']
+                    print(f"{done} files, {done / (now - start):.2f} files/s")
+        pool.close()
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume")
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    elapsed = time.perf_counter() - start
+    total = counts['processed'] + counts['failed']
+    print(f"Processed {counts['processed']}, failed {counts['failed']} in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed else 0:.2f} files/s)")
+    if audio_seconds:
+        # Wall-clock RTF covers the whole run; per-worker RTF is processing time per audio second
+        print(f"Audio {audio_seconds:.1f}s, RTF {elapsed / audio_seconds:.3f} wall-clock, "
+              f"{busy_seconds / audio_seconds:.3f} per worker")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='*', help='directories (searched recursively) or audio files')
+    parser.add_argument('--file-list', help="file with one path per line ('-' for stdin)")
+    parser.add_argument('--output', required=True, help='JSONL results file (appended to on resume)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--question-context', default='full conversation',
+                        help='selects which entities are extracted, as in /process-speech')
+    parser.add_argument('--engine', help='ASR engine (default: ASR_ENGINE)')
+    parser.add_argument('--retry-failed', action='store_true', help='reprocess files that failed in earlier runs')
+    args = parser.parse_args()
+
+    if not args.inputs and not args.file_list:
+        parser.error('give at least one input directory/file or --file-list')
+    if args.engine:
+        os.environ['ASR_ENGINE'] = args.engine
+
+    done = load_done(args.output, args.retry_failed)
+    if done:
+        print(f"Resuming: {len(done)} file(s) already in {args.output}")
+    files = (path for path in find_files(args.inputs, args.file_list) if path not in done)
+
+    try:
+        run(files, args.output, args.workers, args.question_context)
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import metrics
+
+# Offline text-to-speech with a content-addressed audio cache
+#
+# The interview questions the agent asks are a small fixed set, so rendered
+# audio is cached on a hash of the text plus the voice identity (engine,
+# model/voice and speaking rate): a memory tier evicts least recently used
+# clips once its byte budget is exceeded, and a disk tier keeps them across
+# restarts. The standard prompts are rendered at startup, so the first
+# candidate never waits for synthesis. Every engine takes text and returns
+# the bytes of a WAV file.
+
+TTS_ENGINE = os.getenv('TTS_ENGINE', 'pyttsx3').lower()
+TTS_VOICE = os.getenv('TTS_VOICE') or None
+TTS_RATE = int(os.getenv('TTS_RATE', 0)) or None
+TTS_MODEL = os.getenv('TTS_MODEL', 'tts_models/en/ljspeech/tacotron2-DDC')
+# Disk tier default: the user's cache directory, outside the source tree
+TTS_CACHE_DIR = os.path.join(
+    os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'interview-scheduler', 'tts')
+
+# Questions asked in every interview (client/src/pages/VoiceAgent.jsx); more
+# can be listed one per line in TTS_PROMPTS_FILE
+STANDARD_PROMPTS = (
+    "What is your current notice period?",
+    "Can you share your current and expected CTC?",
+    "When are you available for an interview next week?",
+)
+
+log = logging.getLogger(__name__)
+
+
+def _render_to_file(write, suffix='.wav'):
+    """Call write(path) on a temporary file and return its contents"""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        write(path)
+        with open(path, 'rb') as f:
+            audio = f.read()
+    finally:
+        os.remove(path)
+    if not audio:
+        raise Exception("Speech synthesis produced no audio")
+    return audio
+
+
+class Pyttsx3Engine:
+    """System voices (eSpeak, SAPI5, NSSpeechSynthesizer) through pyttsx3"""
+
+    name = 'pyttsx3'
+
+    def __init__(self, voice=TTS_VOICE, rate=TTS_RATE):
+        import pyttsx3
+
+        self.engine = pyttsx3.init()
+        if voice:
+            self.engine.setProperty('voice', voice)
+        if rate:
+            self.engine.setProperty('rate', rate)
+        self.model_id = f"pyttsx3:{self.engine.getProperty('voice')}:{self.engine.getProperty('rate')}"
+        # The driver runs one event loop at a time
+        self._lock = threading.Lock()
+
+    def synthesize(self, text):
+        def write(path):
+            self.engine.save_to_file(text, path)
+            self.engine.runAndWait()
+
+        with self._lock:
+            return _render_to_file(write)
+
+
+class CoquiEngine:
+    """Neural voices from Coqui TTS, loaded once per process"""
+
+    name = 'coqui'
+
+    def __init__(self, model_name=TTS_MODEL):
+        from TTS.api import TTS
+
+        self.tts = TTS(model_name=model_name, progress_bar=False)
+        self.model_id = f"coqui:{model_name}"
+        self._lock = threading.Lock()
+
+    def synthesize(self, text):
+        with self._lock:
+            return _render_to_file(lambda path: self.tts.tts_to_file(text=text, file_path=path))
+
+
+ENGINES = {
+    'pyttsx3': Pyttsx3Engine,
+    'coqui': CoquiEngine,
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(name=None):
+    """Return the process-wide instance of a TTS engine, creating it on first use"""
+    name = (name or TTS_ENGINE).lower()
+    engine = _engines.get(name)
+    if engine is None:
+        with _engines_lock:
+            engine = _engines.get(name)
+            if engine is None:
+                if name not in ENGINES:
+                    raise Exception(f"Unknown TTS engine: {name}")
+                engine = ENGINES[name]()
+                _engines[name] = engine
+    return engine
+
+
+def load_prompts(path=None):
+    """Return the standard prompts plus those listed in TTS_PROMPTS_FILE"""
+    prompts = list(STANDARD_PROMPTS)
+    path = path or os.getenv('TTS_PROMPTS_FILE')
+    if path:
+        with open(path, encoding='utf-8') as f:
+            prompts.extend(line.strip() for line in f if line.strip())
+    return list(dict.fromkeys(prompts))
+
+
+class AudioCache:
+    """Two-tier (memory LRU + optional disk) cache of rendered audio by content hash"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'memoryHits': 0, 'diskHits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def key(text, model_id):
+        digest = hashlib.sha256(model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached audio for `key`, or None"""
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self._counts['hits'] += 1
+                self._counts['memoryHits'] += 1
+                return audio
+
+        audio = self._read_disk(key)
+        with self._lock:
+            if audio is None:
+                self._counts['misses'] += 1
+                return None
+            self._counts['hits'] += 1
+            self._counts['diskHits'] += 1
+            self._store(key, audio)
+            return audio
+
+    def peek(self, key):
+        """Return audio for `key` from the memory tier without counting a hit or miss"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, audio):
+        with self._lock:
+            self._store(key, audio)
+        self._write_disk(key, audio)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'disk': self.disk_dir is not None,
+            })
+            return stats
+
+    def _store(self, key, audio):
+        # Caller holds the lock
+        if len(audio) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key))
+        self._entries[key] = audio
+        self._bytes += len(audio)
+        while self._bytes > self.max_bytes:
+            _, old_audio = self._entries.popitem(last=False)
+            self._bytes -= len(old_audio)
+            self._counts['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.wav")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, audio):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            # Created on the first write, so an unused cache leaves nothing behind
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+        except OSError as e:
+            log.warning(f"Could not write TTS cache entry: {str(e)}")
+
+
+class SpeechSynthesizer:
+    """Renders text with a TTS engine, through an AudioCache"""
+
+    def __init__(self, cache, engine=None):
+        self.cache = cache
+        self.engine_name = engine
+        # Requests for the same uncached text wait for one synthesis
+        self._render_lock = threading.Lock()
+
+    def key(self, text):
+        """Content hash of `text` in the current voice (also used as the ETag)"""
+        return AudioCache.key(text, get_engine(self.engine_name).model_id)
+
+    def render(self, text, key=None):
+        """Return the WAV bytes for `text`, synthesizing it on a cache miss"""
+        key = key or self.key(text)
+        audio = self.cache.get(key)
+        if audio is not None:
+            return audio
+        with self._render_lock:
+            # Another request may have rendered it while this one waited
+            audio = self.cache.peek(key)
+            if audio is None:
+                with metrics.stage('tts_synthesis'):
+                    audio = get_engine(self.engine_name).synthesize(text)
+                self.cache.put(key, audio)
+        return audio
+
+    def prerender(self, prompts):
+        """Render prompts ahead of the first request; returns how many are cached"""
+        for text in prompts:
+            self.render(text)
+        log.info(f"Pre-rendered {len(prompts)} TTS prompt(s)")
+        return len(prompts)
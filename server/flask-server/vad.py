@@ -0,0 +1,74 @@
+import os
+import numpy as np
+
+from audio_decode import SAMPLE_RATE
+
+# Energy-based voice activity detection on 16kHz mono 16-bit PCM
+#
+# The audio is cut into short frames and each frame's level (dBFS) is
+# compared with the recording's own noise floor (a low percentile of all
+# frame levels), so the threshold adapts to the microphone and room. Speech
+# frames are widened by the padding on both sides, which keeps word onsets
+# and short pauses intact; everything else (leading/trailing silence and
+# long pauses) is dropped before recognition.
+
+VAD_ENABLED = os.getenv('VAD_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+VAD_PADDING_MS = int(os.getenv('VAD_PADDING_MS', 300))
+# A frame is speech when it is this many dB above the noise floor...
+VAD_MARGIN_DB = float(os.getenv('VAD_MARGIN_DB', 12))
+# ...and above this absolute level
+VAD_FLOOR_DB = float(os.getenv('VAD_FLOOR_DB', -50))
+
+FRAME_MS = 30
+
+
+def frame_levels(samples, frame_len):
+    """Return the RMS level in dBFS of each complete frame"""
+    count = len(samples) // frame_len
+    frames = samples[:count * frame_len].reshape(count, frame_len).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms / 32768.0 + 1e-10)
+
+
+def speech_frames(levels, margin_db=VAD_MARGIN_DB, floor_db=VAD_FLOOR_DB):
+    """Classify frames as speech (True) or non-speech"""
+    if len(levels) == 0:
+        return np.zeros(0, dtype=bool)
+    noise, loud = np.percentile(levels, [10, 90])
+    if loud - noise < margin_db:
+        # No quiet stretch to compare against (all speech, or all silence/noise)
+        return levels >= floor_db
+    return levels >= max(noise + margin_db, floor_db)
+
+
+def trim_silence(pcm, padding_ms=VAD_PADDING_MS, margin_db=VAD_MARGIN_DB, floor_db=VAD_FLOOR_DB):
+    """Drop non-speech regions from PCM bytes
+
+    Returns the trimmed PCM and stats for the request: audioSeconds,
+    speechSeconds (frames classified as speech), keptSeconds (speech plus
+    padding, i.e. what is sent to the recognizer) and speechRatio.
+    """
+    samples = np.frombuffer(pcm, dtype='<i2')
+    frame_len = SAMPLE_RATE * FRAME_MS // 1000
+    speech = speech_frames(frame_levels(samples, frame_len), margin_db, floor_db)
+
+    pad = -(-padding_ms // FRAME_MS)
+    keep = speech
+    if pad and speech.any():
+        keep = np.convolve(speech, np.ones(2 * pad + 1, dtype=bool), mode='same') > 0
+
+    # Samples past the last complete frame follow that frame's decision
+    tail = len(samples) - len(keep) * frame_len
+    sample_mask = np.repeat(keep, frame_len)
+    if tail:
+        sample_mask = np.concatenate([sample_mask, np.full(tail, bool(keep[-1]) if len(keep) else False)])
+    trimmed = samples[sample_mask]
+
+    audio_seconds = len(samples) / SAMPLE_RATE
+    speech_seconds = int(speech.sum()) * frame_len / SAMPLE_RATE
+    return trimmed.tobytes(), {
+        'audioSeconds': round(audio_seconds, 3),
+        'speechSeconds': round(speech_seconds, 3),
+        'keptSeconds': round(len(trimmed) / SAMPLE_RATE, 3),
+        'speechRatio': round(speech_seconds / audio_seconds, 3) if audio_seconds else 0.0
+    }
@@ -210,54 +210,80 @@ app.get('/conversations/:candidateId', async (req, res) => {
 });
 
 // Processed data from Flask server
-app.post('/process-candidate-data', async (req, res) => {
-  try {
-    const { candidateId, text, entities } = req.body; // Added 'text' parameter
-    
-    // Update candidate with extracted information
-    const candidate = await candidateService.getCandidateById(candidateId);
-    if (!candidate) {
-      return res.status(404).json({ error: 'Candidate not found' });
-    }
+const processCandidateData = async ({ candidateId, text, entities }) => {
+  // Update candidate with extracted information
+  const candidate = await candidateService.getCandidateById(candidateId);
+  if (!candidate) {
+    return { status: 404, body: { error: 'Candidate not found', candidateId } };
+  }
 
-    console.log(`Received processed data for candidate ${candidateId}:`, entities);
+  console.log(`Received processed data for candidate ${candidateId}:`, entities);
 
-    // Create a conversation entry for this interaction
-    if (text) {
-      await conversationService.createConversation({
-        candidateId: candidateId,
-        message: text,
-        sender: 'candidate'
-      });
-    }
+  // Create a conversation entry for this interaction
+  if (text) {
+    await conversationService.createConversation({
+      candidateId: candidateId,
+      message: text,
+      sender: 'candidate'
+    });
+  }
 
-    // Update candidate fields based on extracted entities
-    if (entities && Object.keys(entities).length > 0) {
-      const updateData = {};
-      
-      // Map entity fields to candidate fields
-      if (entities.notice_period) updateData.notice_period = entities.notice_period;
-      if (entities.current_ctc) updateData.current_ctc = entities.current_ctc;
-      if (entities.expected_ctc) updateData.expected_ctc = entities.expected_ctc;
-      if (entities.availability) updateData.availability = entities.availability;
-      
-      // Update candidate record if we have data to update
-      if (Object.keys(updateData).length > 0) {
-        await candidateService.updateCandidate(candidateId, updateData);
-        console.log(`Updated candidate ${candidateId} with data:`, updateData);
-      }
+  // Update candidate fields based on extracted entities
+  if (entities && Object.keys(entities).length > 0) {
+    const updateData = {};
+
+    // Map entity fields to candidate fields
+    if (entities.notice_period) updateData.notice_period = entities.notice_period;
+    if (entities.current_ctc) updateData.current_ctc = entities.current_ctc;
+    if (entities.expected_ctc) updateData.expected_ctc = entities.expected_ctc;
+    if (entities.availability) updateData.availability = entities.availability;
+
+    // Update candidate record if we have data to update
+    if (Object.keys(updateData).length > 0) {
+      await candidateService.updateCandidate(candidateId, updateData);
+      console.log(`Updated candidate ${candidateId} with data:`, updateData);
     }
+  }
 
-    res.json({ 
+  return {
+    status: 200,
+    body: {
       message: 'Candidate data processed successfully',
       candidateId: candidateId
-    });
+    }
+  };
+};
+
+app.post('/process-candidate-data', async (req, res) => {
+  try {
+    const result = await processCandidateData(req.body);
+    res.status(result.status).json(result.body);
   } catch (error) {
     console.error('Error processing candidate data:', error);
     res.status(500).json({ error: error.message });
   }
 });
 
+// Batched processed data from Flask server: { items: [{ candidateId, text, entities }, ...] }
+app.post('/process-candidate-data/batch', async (req, res) => {
+  const { items } = req.body;
+  if (!Array.isArray(items)) {
+    return res.status(400).json({ error: 'items must be an array' });
+  }
+
+  const results = [];
+  for (const item of items) {
+    try {
+      const result = await processCandidateData(item);
+      results.push({ status: result.status, ...result.body });
+    } catch (error) {
+      console.error('Error processing candidate data:', error);
+      results.push({ status: 500, error: error.message, candidateId: item.candidateId });
+    }
+  }
+  res.json({ results });
+});
+
 // Job Applications API endpoints
 app.get('/applications', verifyUser, async (req, res) => {
   try {